@@ -105,12 +105,21 @@ export interface Document {
 
 export interface UploadResponse {
   doc_id: string;
+  job_id: string;
   status: string;
-  chunks_count: number;
+}
+
+export interface DocumentStatus {
+  doc_id: string;
+  job_id: string | null;
+  status: string;
+  percent: number;
+  error: string | null;
+  chunks_count: number | null;
 }
 
 export const documentsApi = {
-  async upload(file: File): Promise<any> {
+  async upload(file: File): Promise<UploadResponse> {
     const formData = new FormData();
     formData.append('file', file);
 
@@ -127,12 +136,21 @@ export const documentsApi = {
     return response.json();
   },
 
-  async list(): Promise<any> {
-    const response = await fetchWithAuth('/documents/');
-    if (!response.ok) {
-      throw new Error('Failed to fetch documents');
-    }
-    return response.json();
+  // The endpoint returns a page at a time; follow next_cursor to the end
+  async list(): Promise<{ documents: Document[] }> {
+    const documents: Document[] = [];
+    let cursor: string | null = null;
+    do {
+      const query: string = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await fetchWithAuth(`/documents/${query}`);
+      if (!response.ok) {
+        throw new Error('Failed to fetch documents');
+      }
+      const data = await response.json();
+      documents.push(...data.documents);
+      cursor = data.next_cursor ?? null;
+    } while (cursor);
+    return { documents };
   },
 
   async get(docId: string): Promise<Document> {
@@ -142,6 +160,14 @@ export const documentsApi = {
     }
     return response.json();
   },
+
+  async status(docId: string): Promise<DocumentStatus> {
+    const response = await fetchWithAuth(`/documents/${docId}/status`);
+    if (!response.ok) {
+      throw new Error('Failed to fetch document status');
+    }
+    return response.json();
+  },
 };
 
 // Essays/Files API
@@ -156,9 +182,18 @@ export interface Essay {
   title?: string;
   outline: OutlineItem[];
   content: Record<string, string>;
+  version?: number;
+  section_versions?: Record<string, number>;
   created_at?: string;
 }
 
+export interface GenerateAllResponse {
+  sections: Record<string, string>;
+  errors: Record<string, string>;
+  versions: Record<string, number>;
+  status: 'success' | 'partial' | 'failed';
+}
+
 export const essaysApi = {
   async generateOutline(documentId: string, topic: string): Promise<Essay> {
     const response = await fetchWithAuth('/files/generate-outline', {
@@ -184,14 +219,90 @@ export const essaysApi = {
     return data.content || data;
   },
 
-    async list(): Promise<Essay[]> {
-    const response = await fetchWithAuth('/files');
+  // Streams the section over SSE, calling onToken as text arrives.
+  // Abort the signal to stop generation; nothing is saved in that case.
+  async streamSection(
+    essayId: string,
+    header: string,
+    documentId: string,
+    onToken: (text: string) => void,
+    signal?: AbortSignal
+  ): Promise<string> {
+    const response = await fetchWithAuth(`/files/${essayId}/generate-section/stream?header=${encodeURIComponent(header)}&document_id=${documentId}`, {
+      method: 'POST',
+      signal,
+    });
+    if (!response.ok || !response.body) {
+      const error = await response.json();
+      throw new Error(error.detail || 'Failed to generate section');
+    }
+
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    let text = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += value;
+      let end;
+      while ((end = buffer.indexOf('\n\n')) !== -1) {
+        const frame = buffer.slice(0, end);
+        buffer = buffer.slice(end + 2);
+        const event = frame.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(frame.match(/^data: (.*)$/m)?.[1] ?? '{}');
+        if (event === 'token') {
+          text += data.text;
+          onToken(data.text);
+        } else if (event === 'error') {
+          throw new Error(data.detail || 'Failed to generate section');
+        }
+      }
+    }
+    return text;
+  },
+
+  async generateAll(essayId: string): Promise<GenerateAllResponse> {
+    const response = await fetchWithAuth(`/files/${essayId}/generate-all`, {
+      method: 'POST',
+    });
     if (!response.ok) {
-      throw new Error('Failed to fetch essays');
+      const error = await response.json();
+      throw new Error(error.detail || 'Failed to generate sections');
     }
     return response.json();
   },
 
+  // Saves an edit of one section. Pass the section's version the edit started
+  // from; a 409 means it changed meanwhile and the essay should be reloaded.
+  async updateSection(essayId: string, header: string, content: string, expectedVersion?: number): Promise<number> {
+    const response = await fetchWithAuth(`/files/${essayId}/sections`, {
+      method: 'PUT',
+      body: JSON.stringify({ header, content, expected_version: expectedVersion ?? null }),
+    });
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.detail?.message || error.detail || 'Failed to save section');
+    }
+    const data = await response.json();
+    return data.version;
+  },
+
+    // A page at a time; the next page's cursor is in the X-Next-Cursor header
+    async list(): Promise<Essay[]> {
+    const essays: Essay[] = [];
+    let cursor: string | null = null;
+    do {
+      const query: string = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await fetchWithAuth(`/files${query}`);
+      if (!response.ok) {
+        throw new Error('Failed to fetch essays');
+      }
+      essays.push(...(await response.json()));
+      cursor = response.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return essays;
+  },
+
   async get(essayId: string): Promise<Essay> {
     const response = await fetchWithAuth(`/files/${essayId}`);
     if (!response.ok) {
@@ -5,17 +5,31 @@ Stage 1: INGESTION
 - Receives multipart/form-data from client
 - Validates PDF file
 - Creates document record in DB
-- Triggers processing pipeline
+- Queues the processing pipeline and reports its progress
+- Retries a failed pipeline from its checkpoints
+- Lists documents a page at a time, and serves raw_text on its own
 """
 
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
 from app.core.security import get_current_user, supabase
+from app.core.executors import run_db
 from app.services.pdf_services import pdf_service
+from app.services.job_services import ingestion_queue, QueueFullError, STAGE_PERCENT
+from app.services.upload_services import UploadTooLarge, spool_upload
+from app.services.pagination_services import InvalidCursor, InvalidFields, after_cursor, page, project
+from app.services.raw_text_services import RangeNotSatisfiable, RawTextStream, parse_range
 from uuid import uuid4
 
 router = APIRouter()
 
-@router.post("/upload")
+# Columns GET /documents/{doc_id} can return (raw_text has its own endpoint)
+DOCUMENT_FIELDS = ("id", "user_id", "file_name", "status", "chunk_count", "digest", "created_at")
+DOCUMENT_DEFAULT_FIELDS = ("id", "user_id", "file_name", "status", "chunk_count", "created_at")
+
+@router.post("/upload", status_code=202)
 async def upload_pdf(
     file: UploadFile = File(...),
     current_user = Depends(get_current_user)
@@ -30,19 +44,20 @@ async def upload_pdf(
         - file: Binary PDF file
         - user_id: Extracted from JWT token
     
-    Response:
+    Response (202, returned before processing starts):
         {
             "doc_id": "uuid",
-            "status": "processing" | "completed" | "failed",
-            "chunks_count": int
+            "job_id": "uuid",
+            "status": "ingested"
         }
     
     Flow:
         1. Validate file is PDF
-        2. Create document record (status: "ingested")
-        3. Read file bytes
-        4. Call pdf_service.process_pdf (async)
-        5. Return response
+        2. Stream the file to disk in chunks, hashing it on the way
+           (413 past UPLOAD_MAX_MB; the bytes are never held in memory)
+        3. Create document record (status: "ingested")
+        4. Queue pdf_service.process_pdf on the ingestion workers
+        5. Return immediately; poll GET /documents/{doc_id}/status
     """
     
     # Validate file type
@@ -53,41 +68,59 @@ async def upload_pdf(
         )
     
     try:
-        # print("Starting PDF upload and processing...")
         # Generate unique document ID
         doc_id = uuid4()
-        # print(f"Generated document ID: {doc_id}")
+        # Spool to where the pipeline keeps the upload (see checkpoint_services)
+        upload = await spool_upload(file, pdf_service.checkpoints.source_path(str(doc_id)))
+        
         # Stage 1: Create document record in DB (status: "ingested")
-        document_record = supabase.table("documents").insert({
+        document_record = await run_db(supabase.table("documents").insert({
             "id": str(doc_id),
             "user_id": current_user.id,
             "file_name": file.filename,
             "status": "ingested"
-        }).execute()
-        
-        # Read file bytes into memory
-        file_bytes = await file.read()
+        }).execute)
         
-        # Stage 2-3: Process PDF (extraction, chunking, embedding)
-        # This is synchronous but wrapped in async function
-        processing_result = await pdf_service.process_pdf(
-            file_bytes=file_bytes,
-            document_id=doc_id,
-            supabase_client=supabase
+        # Stage 2-3: Queue processing (extraction, chunking, embedding)
+        # The pipeline is blocking, so it runs on a worker thread
+        job = ingestion_queue.submit(
+            user_id=current_user.id,
+            document_id=str(doc_id),
+            task=lambda progress: pdf_service.process_pdf(
+                source=upload.path,
+                document_id=doc_id,
+                supabase_client=supabase,
+                progress=progress,
+                sha256=upload.sha256
+            )
         )
         
         return {
             "doc_id": str(doc_id),
-            "status": processing_result["status"],
-            "chunks_count": processing_result["chunks_count"]
+            "job_id": job.id,
+            "status": "ingested"
         }
+    
+    except UploadTooLarge as e:
+        # Nothing was recorded and the partial file is gone
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    except QueueFullError as e:
+        # Nothing was queued, so don't leave an orphan "ingested" record
+        await run_db(supabase.table("documents").delete().eq("id", str(doc_id)).execute)
+        pdf_service.checkpoints.clear(str(doc_id))
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": "30"}
+        )
         
     except Exception as e:
         # If document was created, update its status to failed
         if 'doc_id' in locals():
-            supabase.table("documents").update({
+            await run_db(supabase.table("documents").update({
                 "status": "failed"
-            }).eq("id", str(doc_id)).execute()
+            }).eq("id", str(doc_id)).execute)
         
         raise HTTPException(
             status_code=500,
@@ -95,12 +128,134 @@ async def upload_pdf(
         )
 
 
+@router.get("/{doc_id}/status")
+async def get_document_status(
+    doc_id: str,
+    current_user = Depends(get_current_user)
+):
+    """
+    Ingestion progress for a document
+    
+    Endpoint: GET /documents/{doc_id}/status
+    
+    Response:
+        {
+            "doc_id": "uuid",
+            "job_id": "uuid" | null,
+            "status": "ingested" | "extracted" | "chunked" | "embedding" | "completed" | "failed",
+            "percent": 0-100,
+            "error": str | null,
+            "chunks_count": int | null
+        }
+    
+    Live jobs on this worker report fine-grained progress; otherwise the
+    stored documents.status is mapped to a percentage, and a failed run's
+    error comes from its checkpoint.
+    """
+    job = ingestion_queue.get_by_document(doc_id)
+    if job and job.user_id == current_user.id:
+        return job.to_dict()
+    
+    try:
+        doc_result = await run_db(supabase.table("documents")\
+            .select("id, status, ingest_checkpoint")\
+            .eq("id", doc_id)\
+            .eq("user_id", current_user.id)\
+            .single()\
+            .execute)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    status = doc_result.data["status"]
+    checkpoint = doc_result.data.get("ingest_checkpoint") or {}
+    return {
+        "doc_id": doc_id,
+        "job_id": None,
+        "status": status,
+        "percent": STAGE_PERCENT.get(status, 0),
+        "error": checkpoint.get("error"),
+        "chunks_count": checkpoint.get("chunks_count")
+    }
+
+
+@router.post("/{doc_id}/retry", status_code=202)
+async def retry_document(
+    doc_id: str,
+    current_user = Depends(get_current_user)
+):
+    """
+    Resume a failed ingestion
+    
+    Endpoint: POST /documents/{doc_id}/retry
+    
+    Response (202, returned before processing starts):
+        {
+            "doc_id": "uuid",
+            "job_id": "uuid",
+            "status": "ingested"
+        }
+    
+    The pipeline runs again on the upload saved by the failed run and skips
+    every stage and chunk batch it had finished (see checkpoint_services).
+    409 if the document completed, is still processing, or its upload is
+    no longer saved (it has to be uploaded again).
+    """
+    try:
+        doc_result = await run_db(supabase.table("documents")\
+            .select("id, status")\
+            .eq("id", doc_id)\
+            .eq("user_id", current_user.id)\
+            .single()\
+            .execute)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    job = ingestion_queue.get_by_document(doc_id)
+    if doc_result.data["status"] == "completed":
+        raise HTTPException(status_code=409, detail="Document is already processed")
+    if job and not job.done:
+        raise HTTPException(status_code=409, detail="Document is still processing")
+    if not pdf_service.checkpoints.has_source(doc_id):
+        raise HTTPException(
+            status_code=409,
+            detail="The upload is no longer available, please upload the file again"
+        )
+    
+    try:
+        job = ingestion_queue.submit(
+            user_id=current_user.id,
+            document_id=doc_id,
+            task=lambda progress: pdf_service.retry_pdf(
+                document_id=doc_id,
+                supabase_client=supabase,
+                progress=progress
+            )
+        )
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": "30"}
+        )
+    
+    return {
+        "doc_id": doc_id,
+        "job_id": job.id,
+        "status": "ingested"
+    }
+
+
 @router.get("/")
-async def list_documents(current_user = Depends(get_current_user)):
+async def list_documents(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.LIST_PAGE_SIZE, ge=1, le=settings.LIST_MAX_PAGE_SIZE),
+    current_user = Depends(get_current_user)
+):
     """
-    Get all documents for the current user
+    The current user's documents, newest first, a page at a time
     
-    Endpoint: GET /documents/
+    Endpoint: GET /documents/?limit=50&cursor=...
     
     Response:
         {
@@ -109,33 +264,90 @@ async def list_documents(current_user = Depends(get_current_user)):
                     "id": "uuid",
                     "file_name": "paper.pdf",
                     "status": "completed",
+                    "chunk_count": 42,
                     "created_at": "2026-01-08T12:00:00"
                 },
                 ...
-            ]
+            ],
+            "next_cursor": "opaque" | null
         }
+    
+    Pass next_cursor as cursor for the next page (also sent as the
+    X-Next-Cursor header); null on the last page. 400 for a bad cursor.
     """
     try:
-        result = supabase.table("documents")\
-            .select("id, file_name, status, created_at")\
-            .eq("user_id", current_user.id)\
-            .order("created_at", desc=True)\
-            .execute()
-        
-        return {"documents": result.data}
+        query = after_cursor(
+            supabase.table("documents")
+                .select("id, file_name, status, chunk_count, created_at")
+                .eq("user_id", current_user.id),
+            cursor
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        result = await run_db(query.limit(limit + 1).execute)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    documents, next_cursor = page(result.data, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return {"documents": documents, "next_cursor": next_cursor}
+
+
+@router.get("/{doc_id}/raw_text")
+async def get_raw_text(
+    doc_id: str,
+    request: Request,
+    current_user = Depends(get_current_user)
+):
+    """
+    The document's extracted text, streamed (text/plain, UTF-8)
+    
+    Endpoint: GET /documents/{doc_id}/raw_text
+    
+    Supports a single byte range ("Range: bytes=0-65535", "bytes=65536-",
+    "bytes=-1000"): 206 with Content-Range, or 416 past the end. A range
+    can split a multi-byte character; clients joining ranges get the
+    exact bytes back. Without Range, 200 with the whole text.
+    """
+    bounds = parse_range(request.headers.get("range"))
+    stream = RawTextStream(supabase, doc_id, current_user.id, bounds)
+    try:
+        await stream.open()
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Document not found")
+    except RangeNotSatisfiable as e:
+        raise HTTPException(
+            status_code=416,
+            detail=str(e),
+            headers={"Content-Range": f"bytes */{e.total}"}
+        )
+    
+    headers = {"Accept-Ranges": "bytes", "Content-Length": str(max(0, stream.length))}
+    status_code = 200
+    if bounds is not None:
+        status_code = 206
+        headers["Content-Range"] = f"bytes {stream.start}-{stream.end}/{stream.total}"
+    return StreamingResponse(
+        stream,
+        status_code=status_code,
+        media_type="text/plain; charset=utf-8",
+        headers=headers
+    )
 
 
 @router.get("/{doc_id}")
 async def get_document(
     doc_id: str,
+    fields: Optional[str] = None,
     current_user = Depends(get_current_user)
 ):
     """
     Get a specific document with its chunks count
     
-    Endpoint: GET /documents/{doc_id}
+    Endpoint: GET /documents/{doc_id}?fields=id,status
     
     Response:
         {
@@ -144,30 +356,33 @@ async def get_document(
                 "user_id": "uuid",
                 "file_name": "paper.pdf",
                 "status": "completed",
-                "raw_text": "full text...",
+                "chunk_count": 42,
                 "created_at": "2026-01-08T12:00:00"
             },
             "chunks_count": 42
         }
+    
+    fields picks columns from DOCUMENT_FIELDS (400 otherwise); the default
+    leaves out digest. The text is at GET /documents/{doc_id}/raw_text.
+    chunks_count is stored when ingestion completes (null until then, or
+    when chunk_count is not among the fields).
     """
     try:
-        # Get document
-        doc_result = supabase.table("documents")\
-            .select("*")\
+        columns = project(fields, DOCUMENT_FIELDS, DOCUMENT_DEFAULT_FIELDS)
+    except InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        doc_result = await run_db(supabase.table("documents")\
+            .select(columns)\
             .eq("id", doc_id)\
             .eq("user_id", current_user.id)\
             .single()\
-            .execute()
-        
-        # Get chunks count
-        chunks_result = supabase.table("doc_chunks")\
-            .select("id", count="exact")\
-            .eq("document_id", doc_id)\
-            .execute()
-        
-        return {
-            "document": doc_result.data,
-            "chunks_count": chunks_result.count
-        }
-    except Exception as e:
-        raise HTTPException(status_code=404, detail="Document not found")
\ No newline at end of file
+            .execute)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    return {
+        "document": doc_result.data,
+        "chunks_count": doc_result.data.get("chunk_count")
+    }
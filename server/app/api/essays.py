@@ -1,114 +1,323 @@
+import asyncio
+import json
+from typing import Optional
 from app.core.security import get_current_user, supabase
-from app.services.ai_services import AIService
-from fastapi import APIRouter, Depends, HTTPException
-from app.services.essay_services import get_grounding_context
-from app.schemas.essay import GenerateOutlineRequest
+from app.core.executors import run_db
+from app.core.metrics import span
+from app.services.ai_services import AIService, get_ai_service
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from app.services.essay_services import (
+    SectionConflictError,
+    generate_sections,
+    outline_headers,
+    retrieve_context,
+    save_section,
+    save_sections
+)
+from app.services.pagination_services import InvalidCursor, InvalidFields, after_cursor, page, project
+from app.core.config import settings
+from app.schemas.essay import GenerateOutlineRequest, SectionUpdateRequest
 
 router = APIRouter()
 
+# Columns GET /files/{essay_id} can return
+ESSAY_FIELDS = (
+    "id", "user_id", "doc_id", "title", "status", "outline", "content",
+    "version", "section_versions", "created_at"
+)
+
 @router.post("/{essay_id}/generate-section")
 async def generate_section(
     essay_id: str,
     header: str,
     document_id: str,
-    current_user = Depends(get_current_user)
+    force: bool = False,
+    current_user = Depends(get_current_user),
+    ai: AIService = Depends(get_ai_service)
 ):
     # 1. THE RETRIEVAL (The Librarian)
     # Find the most relevant chunks for this specific header
-    # get_grounding_context steps:
+    # retrieve_context steps:
     #   - Embed the header using AIService.get_embedding
     #   - Vector search against doc_chunks for document_id
     #   - Return top N relevant chunks as context
+    #   - Merge/dedupe the chunks and fit them to the token budget
     # print(f"Generating section for Essay ID: {essay_id}, Header: {header}, Document ID: {document_id}")
-    context = await get_grounding_context(query_text=header, doc_id=document_id)
+    context = await retrieve_context(query_text=header, doc_id=document_id, ai=ai)
     
-    if not context:
+    if not context.text:
         raise HTTPException(status_code=404, detail="No relevant info found in PDF")
 
     # 2. THE GENERATION (The Writer)
-    # Pass those chunks to Gemini to write the prose
-    ai = AIService()
-    section_text = await ai.generate_grounded_section(header=header, context=context)
+    # Pass those chunks to Gemini to write the prose (the same header and
+    # chunks come back from the generation cache, unless force=true)
+    section_text, cached = await ai.write_section(header=header, context=context.text, force=force)
 
     # 3. THE UPDATE
     # Save this text into your 'essays' table so the user sees it on the frontend
-    # (Assuming you have an 'content' JSON column in your essays table)
+    # (only this section is written, see save_sections)
+    try:
+        version = await save_section(essay_id, header, section_text)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Essay not found. Did you use the correct Essay ID?")
+
+    return {
+        "header": header,
+        "content": section_text,
+        "version": version,
+        "context": context.report.to_dict(),
+        "cached": cached,
+        "status": "success"
+    }
+
+def sse_event(event: str, data: dict) -> str:
+    """One Server-Sent Events frame; data is JSON so newlines in text are safe."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/{essay_id}/generate-section/stream")
+async def stream_section(
+    essay_id: str,
+    header: str,
+    document_id: str,
+    force: bool = False,
+    current_user = Depends(get_current_user),
+    ai: AIService = Depends(get_ai_service)
+):
+    """
+    generate-section over Server-Sent Events
 
+    Events:
+        token - {"text": ...} as Gemini produces it
+        done  - {"header": ..., "version": ..., "context": {...}, "status": "success"}
+                once saved; context is the prompt-context token report
+        error - {"detail": ...} if generation or the save fails mid-stream
+
+    Lookup errors (missing essay, no context) are still plain HTTP errors,
+    since they happen before the stream starts. If the client disconnects,
+    the upstream generation is stopped and nothing is saved. A cached
+    section arrives as a single token event (force=true regenerates).
+    """
     try:
-        current_essay = supabase.table("essays").select("content").eq("id", essay_id).single().execute()
+        with span("essay_read"):
+            await run_db(supabase.table("essays") \
+                .select("id") \
+                .eq("id", essay_id) \
+                .eq("user_id", current_user.id) \
+                .single() \
+                .execute)
     except Exception:
         raise HTTPException(status_code=404, detail="Essay not found. Did you use the correct Essay ID?")
-    essay_content = current_essay.data.get("content") or {}
 
-    # Add the new section to our dictionary
-    essay_content[header] = section_text
+    context = await retrieve_context(query_text=header, doc_id=document_id, ai=ai)
+    if not context.text:
+        raise HTTPException(status_code=404, detail="No relevant info found in PDF")
+
+    async def events():
+        parts = []
+        try:
+            async for text in ai.stream_grounded_section(header=header, context=context.text, force=force):
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+            version = await save_section(essay_id, header, "".join(parts))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e) or type(e).__name__})
+            return
+        yield sse_event("done", {
+            "header": header,
+            "version": version,
+            "context": context.report.to_dict(),
+            "status": "success"
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # No proxy buffering, or tokens arrive in one lump at the end
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/{essay_id}/generate-all")
+async def generate_all_sections(
+    essay_id: str,
+    force: bool = False,
+    current_user = Depends(get_current_user),
+    ai: AIService = Depends(get_ai_service)
+):
+    # 1. Load the essay's stored outline and source document
+    try:
+        with span("essay_read"):
+            essay = await run_db(supabase.table("essays") \
+                .select("doc_id, outline") \
+                .eq("id", essay_id) \
+                .eq("user_id", current_user.id) \
+                .single() \
+                .execute)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Essay not found")
+
+    try:
+        headers = outline_headers(essay.data.get("outline"))
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=422, detail="Essay outline could not be read")
+    if not headers:
+        raise HTTPException(status_code=422, detail="Essay has no outline sections")
+
+    # 2. Retrieval + generation for every header concurrently (capped)
+    sections, errors = await generate_sections(
+        headers,
+        doc_id=essay.data["doc_id"],
+        ai=ai,
+        max_concurrency=settings.SECTION_GENERATION_CONCURRENCY,
+        force=force
+    )
 
-    # Update the record in Supabase
-    supabase.table("essays").update({
-        "content": essay_content
-    }).eq("id", essay_id).execute()
+    # 3. One write for all the sections that succeeded
+    versions = {}
+    if sections:
+        try:
+            versions = await save_sections(essay_id, sections)
+        except LookupError:
+            raise HTTPException(status_code=404, detail="Essay not found")
 
     return {
-        "header": header,
-        "content": section_text,
+        "sections": sections,
+        "errors": errors,
+        "versions": versions,
+        "status": "success" if not errors else ("partial" if sections else "failed")
+    }
+
+@router.put("/{essay_id}/sections")
+async def update_section(
+    essay_id: str,
+    payload: SectionUpdateRequest,
+    current_user = Depends(get_current_user)
+):
+    """
+    Saves a user's edit of one section.
+
+    Send the version the edit was based on as expected_version; if someone
+    (or a generation) changed the section since, nothing is written and the
+    response is 409 with the current versions, so the client can reload.
+    """
+    try:
+        with span("essay_read"):
+            await run_db(supabase.table("essays") \
+                .select("id") \
+                .eq("id", essay_id) \
+                .eq("user_id", current_user.id) \
+                .single() \
+                .execute)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Essay not found")
+
+    try:
+        version = await save_section(essay_id, payload.header, payload.content, payload.expected_version)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Essay not found")
+    except SectionConflictError as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": str(e), "versions": e.versions}
+        )
+
+    return {
+        "header": payload.header,
+        "version": version,
         "status": "success"
     }
 
 @router.post("/generate-outline")
 async def create_outline(
     payload: GenerateOutlineRequest,
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    ai: AIService = Depends(get_ai_service)
 ):
     document_id = payload.document_id
     topic = payload.topic
-    # 1. Fetch the 'Skimmed' content (First and last chunks)
-    # This gives the AI the "Big Picture" without loading 500 chunks
-    result = supabase.table("doc_chunks")\
-        .select("content")\
-        .eq("document_id", document_id)\
-        .order("page_number")\
-        .limit(5)\
-        .execute()
-    
-    summary_text = "\n".join([c['content'] for c in result.data])
+    # 1. Fetch the document digest (one representative chunk per topic
+    # cluster, built at ingestion), which gives the AI the "Big Picture"
+    # of the whole document in a bounded-size prompt
+    document = await run_db(supabase.table("documents")\
+        .select("digest")\
+        .eq("id", document_id)\
+        .execute)
+    summary_text = document.data[0].get("digest") if document.data else None
+
+    # Documents ingested before digests existed: the first chunks
+    if not summary_text:
+        result = await run_db(supabase.table("doc_chunks")\
+            .select("content")\
+            .eq("document_id", document_id)\
+            .order("page_number")\
+            .limit(5)\
+            .execute)
+        summary_text = "\n".join([c['content'] for c in result.data])
 
     # 2. Call Gemini to build the JSON blueprint
-    ai = AIService()
     outline_json = await ai.generate_outline(topic, summary_text)
 
     # 3. Create the Essay record in the DB
     # We save the outline so the user can edit it on the frontend
-    essay_record = supabase.table("essays").insert({
+    essay_record = await run_db(supabase.table("essays").insert({
         "user_id": current_user.id,
         "doc_id": document_id,
         "title": topic,
         "outline": outline_json, # Store the structure
         "status": "drafting"
-    }).execute()
+    }).execute)
 
     return essay_record.data[0]
 
 @router.get("")
-async def list_essays(current_user = Depends(get_current_user)):
-    result = supabase.table("essays") \
-        .select("id, doc_id, title, status, created_at") \
-        .eq("user_id", current_user.id) \
-        .order("created_at", desc=True) \
-        .execute()
+async def list_essays(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.LIST_PAGE_SIZE, ge=1, le=settings.LIST_MAX_PAGE_SIZE),
+    current_user = Depends(get_current_user)
+):
+    """
+    The current user's essays, newest first, a page at a time. The body
+    stays a plain list; the next page's cursor is in the X-Next-Cursor
+    header (absent on the last page). 400 for a bad cursor.
+    """
+    try:
+        query = after_cursor(
+            supabase.table("essays")
+                .select("id, doc_id, title, status, created_at")
+                .eq("user_id", current_user.id),
+            cursor
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return result.data
+    result = await run_db(query.limit(limit + 1).execute)
+
+    essays, next_cursor = page(result.data, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return essays
 
 @router.get("/{essay_id}")
 async def get_essay(
     essay_id: str,
+    fields: Optional[str] = None,
     current_user = Depends(get_current_user)
 ):
-    result = supabase.table("essays") \
-        .select("*") \
+    """One essay; fields picks columns from ESSAY_FIELDS (default: all of them)."""
+    try:
+        columns = project(fields, ESSAY_FIELDS, ESSAY_FIELDS)
+    except InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    result = await run_db(supabase.table("essays") \
+        .select(columns) \
         .eq("id", essay_id) \
         .eq("user_id", current_user.id) \
         .single() \
-        .execute()
+        .execute)
 
     if not result.data:
         raise HTTPException(status_code=404, detail="Essay not found")
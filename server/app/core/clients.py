@@ -0,0 +1,52 @@
+"""
+Shared API clients
+
+One genai.Client per process, built lazily with a pooled, keep-alive httpx
+transport. Services take their client from here (or via FastAPI
+dependencies) instead of constructing one per request, so connections and
+TLS sessions are reused. Closed from the app lifespan.
+"""
+
+import threading
+from typing import Optional
+
+import httpx
+from google import genai
+from google.genai import types
+
+from app.core.config import settings
+
+
+class ClientRegistry:
+    def __init__(self):
+        self._genai: Optional[genai.Client] = None
+        self._lock = threading.Lock()
+
+    def genai_client(self) -> genai.Client:
+        if self._genai is None:
+            with self._lock:
+                if self._genai is None:
+                    self._genai = genai.Client(
+                        api_key=settings.GEMINI_API_KEY,
+                        http_options=types.HttpOptions(
+                            timeout=int(settings.GEMINI_TIMEOUT_SECONDS * 1000),
+                            client_args={
+                                "limits": httpx.Limits(
+                                    max_connections=settings.GEMINI_MAX_CONNECTIONS,
+                                    max_keepalive_connections=settings.GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+                                    keepalive_expiry=settings.GEMINI_KEEPALIVE_EXPIRY_SECONDS
+                                )
+                            }
+                        )
+                    )
+        return self._genai
+
+    def close(self) -> None:
+        with self._lock:
+            if self._genai is not None:
+                self._genai.close()
+                self._genai = None
+
+
+# Create singleton instance
+client_registry = ClientRegistry()
@@ -8,4 +8,130 @@ class Settings:
     SUPABASE_ANON_KEY: str = os.getenv("SUPABASE_ANON_KEY")
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
 
+    # Access-token verification (see core/tokens): "local" checks JWTs against
+    # the JWT secret (HS256) or the project's JWKS (ES256/RS256, default URL
+    # derived from SUPABASE_URL) and asks the auth server only when it has no
+    # key; "remote" always asks. Auth server answers are cached (TTL, size)
+    AUTH_VERIFY_MODE: str = os.getenv("AUTH_VERIFY_MODE", "local")
+    SUPABASE_JWT_SECRET: str = os.getenv("SUPABASE_JWT_SECRET", "")
+    AUTH_JWKS_URL: str = os.getenv("AUTH_JWKS_URL", "")
+    AUTH_JWT_AUDIENCE: str = os.getenv("AUTH_JWT_AUDIENCE", "authenticated")
+    AUTH_JWT_ISSUER: str = os.getenv("AUTH_JWT_ISSUER", "")
+    AUTH_CLOCK_SKEW_SECONDS: float = float(os.getenv("AUTH_CLOCK_SKEW_SECONDS", "10"))
+    AUTH_JWKS_TTL_SECONDS: float = float(os.getenv("AUTH_JWKS_TTL_SECONDS", "600"))
+    AUTH_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+    # Thread pools for blocking SDK calls made from async routes (see core/executors)
+    GEMINI_POOL_SIZE: int = int(os.getenv("GEMINI_POOL_SIZE", "16"))
+    GEMINI_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "120"))
+    # Shared genai HTTP connection pool (see core/clients)
+    GEMINI_MAX_CONNECTIONS: int = int(os.getenv("GEMINI_MAX_CONNECTIONS", "32"))
+    GEMINI_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "16"))
+    GEMINI_KEEPALIVE_EXPIRY_SECONDS: float = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY_SECONDS", "60"))
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "32"))
+    DB_TIMEOUT_SECONDS: float = float(os.getenv("DB_TIMEOUT_SECONDS", "30"))
+
+    # Embedding generation (chunks per request, parallel requests, rate limit)
+    EMBED_BATCH_SIZE: int = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+    EMBED_CONCURRENCY: int = int(os.getenv("EMBED_CONCURRENCY", "4"))
+    EMBED_REQUESTS_PER_MINUTE: float = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "100"))
+    EMBED_MAX_RETRIES: int = int(os.getenv("EMBED_MAX_RETRIES", "3"))
+
+    # Bulk inserts into doc_chunks (rows per insert, parallel writers, retries)
+    DB_INSERT_BATCH_SIZE: int = int(os.getenv("DB_INSERT_BATCH_SIZE", "200"))
+    DB_WRITE_CONCURRENCY: int = int(os.getenv("DB_WRITE_CONCURRENCY", "2"))
+    DB_WRITE_MAX_RETRIES: int = int(os.getenv("DB_WRITE_MAX_RETRIES", "3"))
+
+    # PDF text extraction (worker processes, min pages to go parallel, pages per task).
+    # Workers default to the CPUs this process may run on; with fewer than two
+    # extraction is inline. Below ~200 pages the pool's start-up and each
+    # worker's parse of the PDF outweigh the split (see benchmarks/bench_extraction)
+    EXTRACT_WORKERS: int = int(os.getenv("EXTRACT_WORKERS", str(min(
+        4, len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    ))))
+    EXTRACT_PARALLEL_MIN_PAGES: int = int(os.getenv("EXTRACT_PARALLEL_MIN_PAGES", "200"))
+    EXTRACT_PAGES_PER_TASK: int = int(os.getenv("EXTRACT_PAGES_PER_TASK", "20"))
+
+    # Chunking (see services/chunking_services): "semantic", "token" or
+    # "character"; size/overlap in the strategy's unit (0 = its default);
+    # size policy "auto" scales chunk size with page count, "fixed" doesn't
+    CHUNK_STRATEGY: str = os.getenv("CHUNK_STRATEGY", "semantic")
+    CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "0"))
+    CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "0"))
+    CHUNK_SIZE_POLICY: str = os.getenv("CHUNK_SIZE_POLICY", "auto")
+
+    # Content-addressed caches: "memory", "disk", "tiered" or "off"
+    CACHE_DIR: str = os.getenv("CACHE_DIR", ".cache")
+    CONTENT_CACHE_BACKEND: str = os.getenv("CONTENT_CACHE_BACKEND", "memory")
+    CONTENT_CACHE_MAX_ENTRIES: int = int(os.getenv("CONTENT_CACHE_MAX_ENTRIES", "20000"))
+    # Total size of the memory tier (documents are megabytes, embeddings 3 KB)
+    CONTENT_CACHE_MAX_MB: float = float(os.getenv("CONTENT_CACHE_MAX_MB", "64"))
+
+    # Document digest built at ingestion for generate-outline (clusters, total size)
+    DIGEST_MAX_SECTIONS: int = int(os.getenv("DIGEST_MAX_SECTIONS", "12"))
+    DIGEST_MAX_CHARS: int = int(os.getenv("DIGEST_MAX_CHARS", "12000"))
+
+    # Generated sections, keyed by header, instructions and retrieved context
+    # (see services/cache_services): "memory", "disk", "tiered" or "off"
+    GENERATION_CACHE_BACKEND: str = os.getenv("GENERATION_CACHE_BACKEND", "off")
+    GENERATION_CACHE_MAX_ENTRIES: int = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "2000"))
+    GENERATION_CACHE_TTL_SECONDS: float = float(os.getenv("GENERATION_CACHE_TTL_SECONDS", str(7 * 86400)))
+
+    # Sections generated in parallel by /files/{id}/generate-all
+    SECTION_GENERATION_CONCURRENCY: int = int(os.getenv("SECTION_GENERATION_CONCURRENCY", "4"))
+
+    # Query embeddings for retrieval (in-memory, shared across requests)
+    QUERY_EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "5000"))
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: float = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "86400"))
+
+    # Retrieval: "rpc" (match_doc_chunks in Postgres) or "local" (in-process
+    # NumPy index, see services/vector_services) with its memory budget and
+    # dtype ("float32", "float16" or "int8"); below float32, the best
+    # match_count * rescore factor candidates are re-scored at full precision
+    # (1 = off)
+    RETRIEVAL_BACKEND: str = os.getenv("RETRIEVAL_BACKEND", "rpc")
+    VECTOR_INDEX_MAX_MB: float = float(os.getenv("VECTOR_INDEX_MAX_MB", "256"))
+    VECTOR_INDEX_DTYPE: str = os.getenv("VECTOR_INDEX_DTYPE", "float32")
+    VECTOR_RESCORE_FACTOR: int = int(os.getenv("VECTOR_RESCORE_FACTOR", "4"))
+    # Compact copy of each chunk embedding in doc_chunks.embedding_q (see
+    # services/quantization_services): "float16", "int8" or "off"; with the
+    # local backend the full-precision column can be left empty
+    EMBEDDING_COMPACT_DTYPE: str = os.getenv("EMBEDDING_COMPACT_DTYPE", "off")
+    EMBEDDING_STORE_FULL: bool = os.getenv("EMBEDDING_STORE_FULL", "true").lower() in ("1", "true", "yes")
+    # Hybrid retrieval: fuse vector matches with a local BM25 index (see
+    # services/lexical_services); candidates taken from each side before fusing
+    HYBRID_RETRIEVAL: bool = os.getenv("HYBRID_RETRIEVAL", "true").lower() in ("1", "true", "yes")
+    HYBRID_CANDIDATES: int = int(os.getenv("HYBRID_CANDIDATES", "20"))
+    LEXICAL_INDEX_MAX_DOCUMENTS: int = int(os.getenv("LEXICAL_INDEX_MAX_DOCUMENTS", "10000"))
+    LEXICAL_INDEX_MAX_LOADED: int = int(os.getenv("LEXICAL_INDEX_MAX_LOADED", "64"))
+    # Max estimated tokens of grounding context per section, after merging
+    # and deduplicating chunks (see services/context_services); 0 = no limit
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+    # Background ingestion queue (worker threads, queued jobs, jobs per user)
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", "4"))
+    INGEST_MAX_QUEUE_DEPTH: int = int(os.getenv("INGEST_MAX_QUEUE_DEPTH", "100"))
+    INGEST_MAX_JOBS_PER_USER: int = int(os.getenv("INGEST_MAX_JOBS_PER_USER", "5"))
+    # Uploads are streamed to disk in chunks, hashed and size-checked on the
+    # way (see services/upload_services); larger requests get a 413
+    UPLOAD_MAX_MB: float = float(os.getenv("UPLOAD_MAX_MB", "100"))
+    UPLOAD_CHUNK_BYTES: int = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+    # Checkpoints of unfinished ingestions, for POST /documents/{id}/retry
+    # (see services/checkpoint_services); kept this long if never retried
+    INGEST_CHECKPOINT_DIR: str = os.getenv("INGEST_CHECKPOINT_DIR", os.path.join(CACHE_DIR, "ingest"))
+    INGEST_CHECKPOINT_TTL_HOURS: float = float(os.getenv("INGEST_CHECKPOINT_TTL_HOURS", "24"))
+
+    # List endpoints: rows per page by default and at most (see
+    # services/pagination_services); raw_text is streamed in slices of this
+    # many bytes (see services/raw_text_services)
+    LIST_PAGE_SIZE: int = int(os.getenv("LIST_PAGE_SIZE", "50"))
+    LIST_MAX_PAGE_SIZE: int = int(os.getenv("LIST_MAX_PAGE_SIZE", "200"))
+    RAW_TEXT_SLICE_BYTES: int = int(os.getenv("RAW_TEXT_SLICE_BYTES", str(1024 * 1024)))
+
+    # Stage latency histograms and pipeline counters on GET /metrics (see
+    # core/metrics); timing headers add a Server-Timing header per response
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+    METRICS_TIMING_HEADERS: bool = os.getenv("METRICS_TIMING_HEADERS", "false").lower() in ("1", "true", "yes")
+
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""
+Async I/O layer for the blocking Gemini and Supabase clients
+
+Both SDK clients used here are synchronous. Calling them directly inside an
+`async def` route blocks the event loop, so one slow Gemini generation stalls
+every other request on the worker. All such calls go through run_gemini() /
+run_db() instead, which run them on dedicated, bounded thread pools:
+
+    response = await run_gemini(client.models.generate_content, model=..., contents=...)
+    result = await run_db(supabase.table("essays").select("*").eq("id", essay_id).execute)
+
+Query builders are cheap to construct on the loop; only .execute() (the
+network call) is handed to the pool.
+
+Streaming SDK calls (blocking generators) are consumed the same way:
+
+    async for chunk in stream_gemini(client.models.generate_content_stream, model=..., contents=...):
+        ...
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Optional
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY
+
+EXECUTOR_WAIT_SECONDS = REGISTRY.histogram(
+    "executor_queue_wait_seconds", "Time a blocking call waited for a pool thread", ("pool",)
+)
+EXECUTOR_CALLS = REGISTRY.counter(
+    "executor_calls_total", "Blocking calls run on each pool", ("pool",)
+)
+EXECUTOR_TIMEOUTS = REGISTRY.counter(
+    "executor_timeouts_total", "Blocking calls abandoned after the pool's timeout", ("pool",)
+)
+
+
+class BoundedExecutor:
+    """
+    A named thread pool with a per-call timeout.
+
+    At most `max_workers` calls run at once; extra calls wait in the pool's
+    queue without blocking the event loop.
+    """
+
+    def __init__(self, name: str, max_workers: int, timeout: Optional[float]):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout if timeout and timeout > 0 else None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._wait = EXECUTOR_WAIT_SECONDS.labels(name)
+        self._calls = EXECUTOR_CALLS.labels(name)
+        self._timeouts = EXECUTOR_TIMEOUTS.labels(name)
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=self.name
+            )
+        return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Runs fn(*args, **kwargs) on the pool and awaits the result
+
+        Raises:
+            asyncio.TimeoutError: if the call takes longer than the timeout.
+                The thread itself cannot be interrupted and finishes in the
+                background, but the request is released.
+        """
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+
+        def call():
+            # A full pool shows up as wait time here, not as a slow upstream
+            self._wait.observe(time.perf_counter() - submitted)
+            return fn(*args, **kwargs)
+
+        self._calls.inc()
+        future = loop.run_in_executor(self.pool, call)
+        try:
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts.inc()
+            raise
+
+    async def stream(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> AsyncIterator[Any]:
+        """
+        Iterates a blocking generator fn(*args, **kwargs) on the pool and
+        yields its items on the loop
+
+        If the consumer stops early (break, cancellation, client disconnect)
+        the producer thread stops at its next item and closes the generator,
+        which for SDK streams closes the upstream response. The timeout
+        applies to the wait for each item, not the whole stream.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        submitted = time.perf_counter()
+
+        def put(kind: str, value: Any = None) -> None:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
+            except RuntimeError:
+                # Loop already closed; nobody is listening
+                stop.set()
+
+        def produce() -> None:
+            self._wait.observe(time.perf_counter() - submitted)
+            iterator = None
+            try:
+                iterator = fn(*args, **kwargs)
+                for item in iterator:
+                    if stop.is_set():
+                        break
+                    put("item", item)
+            except BaseException as e:
+                put("error", e)
+            else:
+                put("end")
+            finally:
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+
+        self._calls.inc()
+        loop.run_in_executor(self.pool, produce)
+        try:
+            while True:
+                try:
+                    kind, value = await asyncio.wait_for(queue.get(), timeout or self.timeout)
+                except asyncio.TimeoutError:
+                    self._timeouts.inc()
+                    raise
+                if kind == "end":
+                    return
+                if kind == "error":
+                    raise value
+                yield value
+        finally:
+            stop.set()
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+gemini_executor = BoundedExecutor(
+    "gemini-io",
+    max_workers=settings.GEMINI_POOL_SIZE,
+    timeout=settings.GEMINI_TIMEOUT_SECONDS
+)
+db_executor = BoundedExecutor(
+    "supabase-io",
+    max_workers=settings.DB_POOL_SIZE,
+    timeout=settings.DB_TIMEOUT_SECONDS
+)
+
+
+async def run_gemini(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Runs a blocking Gemini SDK call off the event loop."""
+    return await gemini_executor.run(fn, *args, **kwargs)
+
+
+def stream_gemini(fn: Callable[..., Any], *args, **kwargs) -> AsyncIterator[Any]:
+    """Iterates a blocking Gemini SDK stream off the event loop."""
+    return gemini_executor.stream(fn, *args, **kwargs)
+
+
+async def run_db(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Runs a blocking Supabase call (usually a builder's .execute) off the event loop."""
+    return await db_executor.run(fn, *args, **kwargs)
+
+
+def shutdown_executors() -> None:
+    gemini_executor.shutdown()
+    db_executor.shutdown()
@@ -0,0 +1,423 @@
+"""
+Metrics - Stage latencies and pipeline counters in the Prometheus text format
+
+A slow generate-section could be spent embedding the query, in
+match_doc_chunks, in the essay write or in Gemini, and a slow ingestion in
+any process_pdf stage; nothing told us which. Everything here is in-process
+(no client library, no background thread) and costs a few microseconds per
+span, so it stays on in production:
+
+- span(stage): Times a block into rag_stage_seconds{stage}, and into the
+  current request's Server-Timing header when METRICS_TIMING_HEADERS is on
+- TimedIterator: Times only the producing side of an iterator, for stages
+  fused into one stream (extraction feeding chunking, embedding feeding
+  storage)
+- REGISTRY.counter / .histogram: Labelled series, each with its own lock
+- REGISTRY.collect: Series read from existing state (queue depth, cache
+  counters) only when /metrics is scraped
+- MetricsMiddleware: http_request_duration_seconds by route template, plus
+  the Server-Timing header
+
+Labels are fixed names (stages, pools, route templates), never ids or text,
+so the number of series stays bounded.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from app.core.config import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; from a cache hit (~1 ms) to a long generation or ingestion
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+T = TypeVar("T")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class CounterSeries:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class HistogramSeries:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Metric:
+    """A named family of series, one per combination of label values."""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """The series for these label values (created on first use)."""
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def _items(self) -> List[Tuple[Tuple, object]]:
+        with self._lock:
+            return list(self._series.items())
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_series(self) -> CounterSeries:
+        return CounterSeries()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Unlabelled counters only."""
+        self.labels().inc(amount)
+
+    def value(self, *values) -> float:
+        series = self._series.get(values)
+        return series.value if series is not None else 0.0
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, values)} {_number(series.value)}"
+            for values, series in self._items()
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_series(self) -> HistogramSeries:
+        return HistogramSeries(self.bounds)
+
+    def observe(self, value: float) -> None:
+        """Unlabelled histograms only."""
+        self.labels().observe(value)
+
+    def count(self, *values) -> int:
+        series = self._series.get(values)
+        return sum(series.counts) if series is not None else 0
+
+    def totals(self) -> Dict[Tuple, Tuple[int, float]]:
+        """Label values → (count, sum) for every series."""
+        totals = {}
+        for values, series in self._items():
+            with series._lock:
+                totals[values] = (sum(series.counts), series.sum)
+        return totals
+
+    def render(self) -> List[str]:
+        lines = []
+        for values, series in self._items():
+            with series._lock:
+                counts = list(series.counts)
+                total = series.sum
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}")
+        return lines
+
+
+class Collected(Metric):
+    """
+    Series computed at scrape time: fn() returns a number, or (with
+    labelnames) a dict of label-value tuple → number.
+    """
+
+    def __init__(self, name: str, kind: str, help: str, fn: Callable, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.kind = kind
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        try:
+            result = self.fn()
+        except Exception:
+            return []
+        if not self.labelnames:
+            return [f"{self.name} {_number(result)}"]
+        return [
+            f"{self.name}{_labels(self.labelnames, values)} {_number(value)}"
+            for values, value in result.items()
+        ]
+
+
+class Registry:
+    """
+    Every metric of the process. Defining a metric twice (a module reloaded,
+    two services sharing a name) returns the existing one.
+    """
+
+    def __init__(self, enabled: bool = True):
+        # Off: spans, TimedIterator and the middleware do nothing, and
+        # GET /metrics is a 404; counters still count (they're one add)
+        self.enabled = enabled
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None and not isinstance(metric, Collected):
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def collect(self, name: str, kind: str, help: str, fn: Callable, labelnames: Sequence[str] = ()) -> Collected:
+        return self._register(Collected(name, kind, help, fn, labelnames))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            samples = metric.render()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {_escape(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry(enabled=settings.METRICS_ENABLED)
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "rag_stage_seconds", "Time spent in each pipeline stage", ("stage",)
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "rag_stage_errors_total", "Stages that ended in an exception", ("stage",)
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to complete a request, by route template",
+    ("method", "route", "status")
+)
+
+# Stage name → seconds for the request being handled (None outside requests)
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Adds one timing of stage; repeated stages of a request add up."""
+    if not REGISTRY.enabled:
+        return
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+class span:
+    """
+    Times the block as one run of stage:
+
+        with span("match_rpc"):
+            response = await run_db(...)
+
+    Works around awaits too: only the block's wall time is measured,
+    whatever else the loop does meanwhile. (A class rather than a
+    @contextmanager generator: a few times cheaper per use.)
+    """
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self) -> "span":
+        if REGISTRY.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if not self.start:
+            return
+        if exc_type is not None and issubclass(exc_type, Exception):
+            STAGE_ERRORS.labels(self.stage).inc()
+        record_stage(self.stage, time.perf_counter() - self.start)
+
+
+class TimedIterator:
+    """
+    Wraps an iterator and records, as one run of stage, only the time spent
+    inside its __next__ (producing items), not the consumer's time between
+    items. Recorded once, when the iterator is exhausted, fails or is closed.
+    """
+
+    def __init__(self, items: Iterable[T], stage: str):
+        self.iterator = iter(items)
+        self.stage = stage
+        self.elapsed = 0.0
+        self._recorded = False
+
+    def __iter__(self) -> "TimedIterator":
+        return self
+
+    def __next__(self) -> T:
+        start = time.perf_counter()
+        try:
+            item = next(self.iterator)
+        except StopIteration:
+            self.elapsed += time.perf_counter() - start
+            self._record()
+            raise
+        except Exception:
+            self.elapsed += time.perf_counter() - start
+            if REGISTRY.enabled:
+                STAGE_ERRORS.labels(self.stage).inc()
+            self._record()
+            raise
+        self.elapsed += time.perf_counter() - start
+        return item
+
+    def _record(self) -> None:
+        if not self._recorded:
+            self._recorded = True
+            record_stage(self.stage, self.elapsed)
+
+    def close(self) -> None:
+        close = getattr(self.iterator, "close", None)
+        if close is not None:
+            close()
+        self._record()
+
+
+def route_template(scope) -> str:
+    """
+    The matched route's path with its parameters put back as {name}
+    (/files/{essay_id}/generate-section), or "unmatched" for 404s, so
+    scanners probing random paths can't add series.
+    """
+    if scope.get("endpoint") is None:
+        return "unmatched"
+    params = {str(value): name for name, value in (scope.get("path_params") or {}).items()}
+    if not params:
+        return scope["path"]
+    return "/".join(
+        "{" + params[segment] + "}" if segment in params else segment
+        for segment in scope["path"].split("/")
+    )
+
+
+def server_timing(timings: Dict[str, float], total: float) -> str:
+    """Server-Timing header value, durations in milliseconds."""
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: records http_request_duration_seconds for every request,
+    labelled with the matched route's template (/files/{essay_id}/...), not
+    the raw path. With timing_headers, responses carry a Server-Timing
+    header of the stages run so far and the time to the first byte; for
+    streamed responses that is everything before the stream starts.
+    """
+
+    def __init__(self, app, timing_headers: bool = settings.METRICS_TIMING_HEADERS):
+        self.app = app
+        self.timing_headers = timing_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not REGISTRY.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        status = 500
+
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.timing_headers:
+                    value = server_timing(timings, time.perf_counter() - start)
+                    headers = [*message.get("headers", ()), (b"server-timing", value.encode("latin-1"))]
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            _request_timings.reset(token)
+            HTTP_SECONDS.labels(scope["method"], route_template(scope), str(status)).observe(
+                time.perf_counter() - start
+            )
@@ -1,9 +1,26 @@
 from fastapi import Header, HTTPException, Depends
 from supabase import create_client, Client
 from app.core.config import settings
+from app.core.tokens import TokenVerifier, default_jwks_url
 
 supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
 
+# Verifies tokens locally when it can, otherwise asks the auth server
+# (cached); see core/tokens. `supabase` is looked up per call, so tests and
+# benchmarks can swap the client.
+token_verifier = TokenVerifier(
+    remote=lambda token: supabase.auth.get_user(token),
+    mode=settings.AUTH_VERIFY_MODE,
+    jwt_secret=settings.SUPABASE_JWT_SECRET,
+    jwks_url=default_jwks_url(),
+    audience=settings.AUTH_JWT_AUDIENCE,
+    issuer=settings.AUTH_JWT_ISSUER,
+    leeway=settings.AUTH_CLOCK_SKEW_SECONDS,
+    jwks_ttl=settings.AUTH_JWKS_TTL_SECONDS,
+    cache_ttl=settings.AUTH_CACHE_TTL_SECONDS,
+    cache_max_entries=settings.AUTH_CACHE_MAX_ENTRIES
+)
+
 async def get_current_user(authorization: str = Header(None)):
     if not authorization:
         raise HTTPException(status_code=401, detail="Missing authorization header")
@@ -11,9 +28,6 @@ async def get_current_user(authorization: str = Header(None)):
     try:
         # Expected format: "Bearer <token>"
         token = authorization.split(" ")[1]
-        user = supabase.auth.get_user(token)
-        if not user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return user.user
+        return await token_verifier.verify(token)
     except Exception:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
\ No newline at end of file
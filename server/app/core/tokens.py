@@ -0,0 +1,278 @@
+"""
+Access-token verification for get_current_user
+
+Every authenticated request used to call supabase.auth.get_user(token), a
+network round-trip to the auth server, so opening the dashboard paid several
+of them before any real work.
+
+Flow:
+1. Local: Supabase access tokens are JWTs. HS256 tokens are checked against
+   the project's JWT secret; ES256/RS256 tokens against the project's JWKS
+   signing keys, fetched once and cached (refetched after AUTH_JWKS_TTL_SECONDS,
+   or early for an unknown key id, at most once per JWKS_MIN_REFRESH_SECONDS).
+   Signature, exp/nbf (with AUTH_CLOCK_SKEW_SECONDS leeway) and audience
+   (plus issuer, if AUTH_JWT_ISSUER is set) are verified; no network call.
+2. Remote fallback: If no key is available (no secret configured, JWKS
+   unreachable, unknown algorithm) or AUTH_VERIFY_MODE=remote, the auth
+   server validates the token. Its answer is cached for
+   AUTH_CACHE_TTL_SECONDS, never past the token's own exp, in an LRU of at
+   most AUTH_CACHE_MAX_ENTRIES tokens (keyed by a hash, not the token).
+   Concurrent requests with the same uncached token share one call.
+
+A token that fails verification locally (bad signature, expired) is rejected
+without asking the auth server. A revoked session is seen at the latest when
+its access token expires (local) or the cache entry does (remote).
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+import httpx
+import jwt
+
+from app.core.config import settings
+from app.core.executors import run_db
+
+# Unknown key ids trigger a JWKS refetch at most this often
+JWKS_MIN_REFRESH_SECONDS = 30.0
+
+ASYMMETRIC_ALGORITHMS = ("ES256", "RS256")
+
+
+class InvalidToken(Exception):
+    """The token is malformed, expired, or not signed by the project."""
+
+
+class AuthenticatedUser(NamedTuple):
+    """The user behind a locally verified token (the fields routes use)."""
+    id: str
+    email: Optional[str]
+    role: Optional[str]
+    claims: Dict[str, Any]
+
+    @classmethod
+    def from_claims(cls, claims: Dict[str, Any]) -> "AuthenticatedUser":
+        return cls(claims["sub"], claims.get("email"), claims.get("role"), claims)
+
+
+class SigningKeys:
+    """The project's JWKS, cached by key id."""
+
+    def __init__(self, url: str, ttl: float):
+        self.url = url
+        self.ttl = ttl
+        self.fetches = 0
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    async def _refresh(self) -> None:
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+        jwk_set = jwt.PyJWKSet.from_dict(response.json())
+        self._keys = {key.key_id: key for key in jwk_set.keys}
+        self._fetched_at = time.monotonic()
+        self.fetches += 1
+
+    async def get(self, kid: Optional[str]):
+        """The key for kid, or None if the JWKS (even refetched) doesn't have it."""
+        age = time.monotonic() - self._fetched_at
+        key = self._keys.get(kid)
+        if key is not None and age < self.ttl:
+            return key
+        async with self._lock:
+            age = time.monotonic() - self._fetched_at
+            key = self._keys.get(kid)
+            # Another request refreshed while this one waited
+            if key is not None and age < self.ttl:
+                return key
+            if age >= self.ttl or (key is None and age >= JWKS_MIN_REFRESH_SECONDS):
+                try:
+                    await self._refresh()
+                except (httpx.HTTPError, ValueError, jwt.PyJWKSetError):
+                    # Keep serving the old keys; the caller falls back if none
+                    pass
+            return self._keys.get(kid)
+
+
+class ClaimsCache:
+    """LRU of verified users by token hash, each entry valid until its deadline."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            deadline, user = entry
+            if time.time() >= deadline:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key: str, user, deadline: float) -> None:
+        with self._lock:
+            self._entries[key] = (deadline, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class TokenVerifier:
+    """
+    Args:
+        remote: Blocking call validating a token on the auth server; returns
+            an object with .user (supabase.auth.get_user's response)
+        mode: "local" (with remote fallback) or "remote"
+        jwt_secret: Project JWT secret for HS256 tokens ("" = none)
+        jwks_url: Project JWKS endpoint for ES256/RS256 tokens ("" = none)
+        issuer: Required iss claim ("" = not checked; the signature already
+            ties the token to the project)
+    """
+
+    def __init__(
+        self,
+        remote: Callable[[str], Any],
+        mode: str = "local",
+        jwt_secret: str = "",
+        jwks_url: str = "",
+        audience: str = "authenticated",
+        issuer: str = "",
+        leeway: float = 10,
+        jwks_ttl: float = 600,
+        cache_ttl: float = 60,
+        cache_max_entries: int = 10000
+    ):
+        if mode not in ("local", "remote"):
+            raise ValueError(f"Unknown token verification mode: {mode}")
+        self.remote = remote
+        self.mode = mode
+        self.jwt_secret = jwt_secret
+        self.signing_keys = SigningKeys(jwks_url, jwks_ttl) if jwks_url else None
+        self.audience = audience or None
+        self.issuer = issuer or None
+        self.leeway = leeway
+        self.cache_ttl = cache_ttl
+        self.cache = ClaimsCache(cache_max_entries)
+        self.local_verifications = 0
+        self.remote_verifications = 0
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    async def _key_for(self, header: Dict) -> Optional[Any]:
+        """Stage 1: The verification key for the token's algorithm, if we have one."""
+        algorithm = header.get("alg")
+        if algorithm == "HS256":
+            return self.jwt_secret or None
+        if algorithm in ASYMMETRIC_ALGORITHMS and self.signing_keys is not None:
+            jwk = await self.signing_keys.get(header.get("kid"))
+            return jwk.key if jwk is not None else None
+        return None
+
+    def _decode(self, token: str, key, algorithm: str) -> Dict[str, Any]:
+        try:
+            return jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.leeway,
+                options={"require": ["exp", "sub"], "verify_aud": self.audience is not None}
+            )
+        except jwt.PyJWTError as e:
+            raise InvalidToken(str(e)) from e
+
+    async def verify(self, token: str):
+        """
+        Returns the authenticated user (AuthenticatedUser, or the auth
+        server's user object on the remote path).
+
+        Raises:
+            InvalidToken: the token is not valid
+        """
+        if not token:
+            raise InvalidToken("Empty token")
+
+        if self.mode == "local":
+            try:
+                header = jwt.get_unverified_header(token)
+            except jwt.PyJWTError as e:
+                raise InvalidToken(str(e)) from e
+            key = await self._key_for(header)
+            if key is not None:
+                claims = self._decode(token, key, header["alg"])
+                self.local_verifications += 1
+                return AuthenticatedUser.from_claims(claims)
+
+        return await self._verify_remote(token)
+
+    async def _verify_remote(self, token: str):
+        """Stage 2: Auth server validation, cached and shared between concurrent requests."""
+        cache_key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        user = self.cache.get(cache_key)
+        if user is not None:
+            return user
+
+        pending = self._pending.get(cache_key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        pending = asyncio.get_running_loop().create_future()
+        self._pending[cache_key] = pending
+        try:
+            response = await run_db(self.remote, token)
+            self.remote_verifications += 1
+            user = getattr(response, "user", None)
+            if user is None:
+                raise InvalidToken("Auth server rejected the token")
+            self.cache.set(cache_key, user, self._cache_deadline(token))
+            pending.set_result(user)
+            return user
+        except BaseException as e:
+            pending.set_exception(e if isinstance(e, InvalidToken) else InvalidToken(str(e)))
+            # Mark retrieved so a failure nobody else awaited isn't logged
+            pending.exception()
+            raise
+        finally:
+            self._pending.pop(cache_key, None)
+
+    def _cache_deadline(self, token: str) -> float:
+        """now + cache_ttl, but never past the token's exp."""
+        deadline = time.time() + self.cache_ttl
+        try:
+            expires = jwt.decode(token, options={"verify_signature": False}).get("exp")
+        except jwt.PyJWTError:
+            expires = None
+        if isinstance(expires, (int, float)):
+            deadline = min(deadline, float(expires))
+        return deadline
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "local_verifications": self.local_verifications,
+            "remote_verifications": self.remote_verifications,
+            "cached_tokens": len(self.cache),
+            "jwks_fetches": self.signing_keys.fetches if self.signing_keys else 0,
+        }
+
+
+def default_jwks_url() -> str:
+    if settings.AUTH_JWKS_URL:
+        return settings.AUTH_JWKS_URL
+    if settings.SUPABASE_URL:
+        return f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+    return ""
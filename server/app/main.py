@@ -1,8 +1,31 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.api import auth, documents, essays
+from app.core.clients import client_registry
+from app.core.executors import shutdown_executors
+from app.core.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware
+from app.services.job_services import ingestion_queue
+from app.services.pdf_services import pdf_service
+from app.services.upload_services import MULTIPART_SLACK_BYTES, BodySizeLimit, max_upload_bytes
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="AI Essay Writer")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Stop ingestion workers after their current job
+    ingestion_queue.shutdown()
+    pdf_service.shutdown()
+    shutdown_executors()
+    client_registry.close()
+
+app = FastAPI(title="AI Essay Writer", lifespan=lifespan)
+
+@app.exception_handler(asyncio.TimeoutError)
+async def upstream_timeout(request: Request, exc: asyncio.TimeoutError):
+    # Raised by run_gemini / run_db when an upstream call exceeds its timeout
+    return JSONResponse(status_code=504, content={"detail": "Upstream service timed out"})
 
 origins = [
     "http://localhost:8080",
@@ -10,18 +33,38 @@ origins = [
     "https://paperflow-ashen.vercel.app",
 ]
 
+# Reject oversized uploads while they stream in, not after they are spooled.
+# Added before CORS so CORS wraps it and its 413 carries the CORS headers
+app.add_middleware(
+    BodySizeLimit,
+    max_bytes=max_upload_bytes() + MULTIPART_SLACK_BYTES,
+    paths=["/documents/upload"],
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Read by browser clients: list pagination and raw_text ranges
+    expose_headers=["X-Next-Cursor", "Content-Range", "Accept-Ranges"],
 )
 
+# Outermost, so request timings include the other middleware
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(documents.router, prefix="/documents", tags=["Documents"])
 app.include_router(essays.router, prefix="/files", tags=["Files"])
 
 @app.get("/")
 async def health():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Prometheus text format; stage latencies, token/chunk/call counters
+    if not REGISTRY.enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
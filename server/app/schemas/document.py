@@ -13,6 +13,7 @@ class DocumentResponse(DocumentBase):
     id: UUID
     user_id: UUID
     status: str
+    chunk_count: Optional[int] = None  # Stored when ingestion completes
     created_at: datetime
 
     class Config:
@@ -20,7 +21,8 @@ class DocumentResponse(DocumentBase):
 
 class DocChunkBase(BaseModel):
     content: str
-    page_number: Optional[int] = None
+    page_number: Optional[int] = None  # First page the chunk covers
+    page_end: Optional[int] = None     # Last page (differs when it spans a page break)
 
 class DocChunkCreate(DocChunkBase):
     document_id: UUID
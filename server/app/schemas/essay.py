@@ -31,4 +31,10 @@ class GenerateOutlineRequest(BaseModel):
 
 class GenerateSectionRequest(BaseModel):
     header: str
-    document_id: str
\ No newline at end of file
+    document_id: str
+
+class SectionUpdateRequest(BaseModel):
+    header: str
+    content: str
+    # Version of the section the edit started from; None skips the check
+    expected_version: Optional[int] = None
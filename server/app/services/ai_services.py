@@ -1,26 +1,72 @@
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Optional, Tuple
 from google import genai
 from google.genai import types
-from app.core.config import settings
+from app.core.clients import client_registry
+from app.core.executors import run_gemini, stream_gemini
+from app.core.metrics import REGISTRY, record_stage, span
+from app.services.cache_services import GenerationCache, generation_cache, query_embedding_cache
+from app.services.chunking_services import estimate_tokens
+
+GENERATION_MODEL = "gemini-2.5-flash"
+
+GEMINI_CALLS = REGISTRY.counter(
+    "gemini_calls_total", "Gemini API calls by operation and outcome", ("operation", "outcome")
+)
+GEMINI_TOKENS = REGISTRY.counter(
+    "gemini_tokens_total",
+    "Gemini generation tokens (usage metadata, or estimated when a response has none)",
+    ("operation", "kind")
+)
+
+
+def record_usage(operation: str, prompt: str, text: str, usage) -> Tuple[int, int]:
+    """Counts one generation's prompt, output and thinking tokens; returns (prompt, output)."""
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    thinking_tokens = getattr(usage, "thoughts_token_count", None)
+    if prompt_tokens is None:
+        prompt_tokens = estimate_tokens(prompt)
+    if output_tokens is None:
+        output_tokens = estimate_tokens(text or "")
+    GEMINI_TOKENS.labels(operation, "prompt").inc(prompt_tokens)
+    GEMINI_TOKENS.labels(operation, "output").inc(output_tokens)
+    if thinking_tokens:
+        GEMINI_TOKENS.labels(operation, "thinking").inc(thinking_tokens)
+    return prompt_tokens, output_tokens
+
 
 class AIService:
-    def __init__(self):
-        self.client = genai.Client(
-            api_key=settings.GEMINI_API_KEY
-        )
+    def __init__(self, client: Optional[genai.Client] = None, cache: Optional[GenerationCache] = None):
+        # Shared, pooled client unless one is injected (e.g. a fake in benchmarks)
+        self.client = client or client_registry.genai_client()
+        self.generation_cache = cache or generation_cache
 
-    def get_embedding(self, text: str):
-        """Turns text into a 768-dimension vector."""
-        result = self.client.models.embed_content(
-            model="gemini-embedding-001",
-            contents=text,
-            config=types.EmbedContentConfig(task_type="RETRIEVAL_QUERY")
-        )
-        return result.embeddings[0].values
+    async def get_embedding(self, text: str):
+        """Turns text into a 768-dimension vector (cached, see QueryEmbeddingCache)."""
 
-    async def generate_grounded_section(self, header: str, context: str, user_instructions: str = ""):
-        """Writes a specific section using ONLY the provided context."""
+        async def embed():
+            try:
+                result = await run_gemini(
+                    self.client.models.embed_content,
+                    model="gemini-embedding-001",
+                    contents=text,
+                    config=types.EmbedContentConfig(task_type="RETRIEVAL_QUERY")
+                )
+            except Exception:
+                GEMINI_CALLS.labels("embed_query", "error").inc()
+                raise
+            GEMINI_CALLS.labels("embed_query", "ok").inc()
+            return result.embeddings[0].values
 
-        prompt = f"""
+        return await query_embedding_cache.get_or_compute(
+            "gemini-embedding-001", "RETRIEVAL_QUERY", text, embed
+        )
+
+    @staticmethod
+    def _section_prompt(header: str, context: str, user_instructions: str = "") -> str:
+        return f"""
         You are an expert academic writer. Your task is to write the section: "{header}" 
         based strictly on the provided research context.
 
@@ -38,11 +84,110 @@ class AIService:
         4. Do not mention "Based on the context" or "According to the text"; just write the content.
         """
 
-        response = self.client.models.generate_content(
-            model="gemini-2.5-flash",
+    async def _generate(self, operation: str, prompt: str, **kwargs) -> Tuple[str, Tuple[int, int]]:
+        """One generate_content call, timed and counted as operation; also returns its (prompt, output) tokens."""
+        with span(operation):
+            try:
+                response = await run_gemini(
+                    self.client.models.generate_content,
+                    model=GENERATION_MODEL,
+                    contents=prompt,
+                    **kwargs
+                )
+            except Exception:
+                GEMINI_CALLS.labels(operation, "error").inc()
+                raise
+        GEMINI_CALLS.labels(operation, "ok").inc()
+        tokens = record_usage(operation, prompt, response.text, getattr(response, "usage_metadata", None))
+        return response.text, tokens
+
+    async def generate_grounded_section(self, header: str, context: str, user_instructions: str = ""):
+        """Writes a specific section using ONLY the provided context (cached, see write_section)."""
+
+        text, _ = await self.write_section(header, context, user_instructions)
+        return text
+
+    def _cached_section(self, key: str, force: bool) -> Optional[str]:
+        """The stored text for key, unless force (which is counted as a bypass)."""
+        if force:
+            if self.generation_cache.enabled:
+                self.generation_cache.record_bypass()
+            return None
+        return self.generation_cache.get(key)
+
+    async def write_section(
+        self,
+        header: str,
+        context: str,
+        user_instructions: str = "",
+        force: bool = False
+    ) -> Tuple[str, bool]:
+        """
+        generate_grounded_section through the generation cache: the same
+        header, instructions and context give back the stored text without
+        calling Gemini. force generates anyway and replaces the stored text.
+
+        Returns:
+            (text, whether it came from the cache)
+        """
+        key = self.generation_cache.key(GENERATION_MODEL, header, user_instructions, context)
+        cached = self._cached_section(key, force)
+        if cached is not None:
+            return cached, True
+
+        start = time.perf_counter()
+        text, (prompt_tokens, output_tokens) = await self._generate(
+            "generate", self._section_prompt(header, context, user_instructions)
+        )
+        self.generation_cache.put(key, text, prompt_tokens, output_tokens, time.perf_counter() - start)
+        return text, False
+
+    async def stream_grounded_section(
+        self,
+        header: str,
+        context: str,
+        user_instructions: str = "",
+        force: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        Same as generate_grounded_section, but yields the text as Gemini
+        produces it. Closing the iterator early stops the upstream stream.
+        A cached section is yielded in one piece; a stream that completes
+        is cached (one closed early is not).
+        """
+
+        key = self.generation_cache.key(GENERATION_MODEL, header, user_instructions, context)
+        cached = self._cached_section(key, force)
+        if cached is not None:
+            yield cached
+            return
+
+        prompt = self._section_prompt(header, context, user_instructions)
+        stream = stream_gemini(
+            self.client.models.generate_content_stream,
+            model=GENERATION_MODEL,
             contents=prompt
         )
-        return response.text
+        parts, usage = [], None
+        start = time.perf_counter()
+        with span("generate_stream"):
+            try:
+                async with aclosing(stream):
+                    async for chunk in stream:
+                        # Usage arrives with the last chunk
+                        usage = getattr(chunk, "usage_metadata", None) or usage
+                        if chunk.text:
+                            if not parts:
+                                record_stage("first_token", time.perf_counter() - start)
+                            parts.append(chunk.text)
+                            yield chunk.text
+            except Exception:
+                GEMINI_CALLS.labels("generate_stream", "error").inc()
+                raise
+        GEMINI_CALLS.labels("generate_stream", "ok").inc()
+        text = "".join(parts)
+        prompt_tokens, output_tokens = record_usage("generate_stream", prompt, text, usage)
+        self.generation_cache.put(key, text, prompt_tokens, output_tokens, time.perf_counter() - start)
 
     async def generate_outline(self, topic: str, pdf_summary: str):
         """Generates a structured JSON outline for the essay."""
@@ -67,11 +212,20 @@ class AIService:
         The outline should have 5-7 logical sections.
         """
 
-        response = self.client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
+        outline, _ = await self._generate(
+            "generate_outline",
+            prompt,
             config=types.GenerateContentConfig(
                 response_mime_type="application/json"
             )
         )
-        return response.text
\ No newline at end of file
+        return outline
+
+_ai_service: Optional[AIService] = None
+
+def get_ai_service() -> AIService:
+    """FastAPI dependency: the process-wide AIService."""
+    global _ai_service
+    if _ai_service is None:
+        _ai_service = AIService()
+    return _ai_service
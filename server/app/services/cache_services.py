@@ -0,0 +1,542 @@
+"""
+Cache Service - Content-addressed caches for ingestion and retrieval
+
+Backends (pluggable, all store bytes):
+- MemoryBackend: In-process LRU, bounded by entry count and total bytes
+- DiskBackend: Persistent SQLite file, survives restarts
+- TieredBackend: Memory in front of disk; disk hits are promoted
+
+ContentCache sits on top of a backend and caches:
+- Documents, keyed by the SHA-256 of the PDF bytes → raw_text + chunk metadata
+- Embeddings, keyed by (model, task_type, SHA-256 of the chunk text) → vector
+
+so a repeat upload skips extraction and embedding, and a partly overlapping
+document only embeds the chunks that are new.
+
+QueryEmbeddingCache (retrieval path) keeps query vectors in memory with a
+TTL and coalesces concurrent lookups of the same query into one API call.
+
+GenerationCache (opt-in) keeps generated section text, keyed by (model,
+header, user instructions, SHA-256 of the assembled context), so a section
+regenerated from the same retrieved chunks is answered without Gemini.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY
+
+
+class CacheBackend:
+    """Interface: a bytes key-value store. Implementations must be thread-safe."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """
+    LRU of at most max_entries values and, if max_bytes is set, at most
+    max_bytes of values in total. One cached document can be megabytes
+    where an embedding is 3 KB, so a count alone does not bound memory.
+    A value larger than max_bytes is not kept.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: Optional[int] = None):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes if max_bytes and max_bytes > 0 else None
+        self.nbytes = 0
+        self._data: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            if self.max_bytes is not None and len(value) > self.max_bytes:
+                return
+            self._data[key] = value
+            self.nbytes += len(value)
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self.nbytes > self.max_bytes
+            ):
+                _, evicted = self._data.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class DiskBackend(CacheBackend):
+    """
+    SQLite-backed store. Oldest entries (by last write) are pruned once the
+    table grows past max_entries.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("pragma journal_mode=wal")
+        self._conn.execute(
+            "create table if not exists cache ("
+            " key text primary key, value blob not null, updated_at real not null)"
+        )
+        self._conn.execute("create index if not exists cache_updated on cache (updated_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute("select value from cache where key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._conn.execute(
+                "insert or replace into cache (key, value, updated_at) values (?, ?, ?)",
+                (key, value, time.time())
+            )
+            self._writes += 1
+            # Pruning scans the index, so only do it every so often
+            if self._writes % 1000 == 0:
+                self._conn.execute(
+                    "delete from cache where key in ("
+                    " select key from cache order by updated_at desc limit -1 offset ?)",
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("delete from cache where key = ?", (key,))
+            self._conn.commit()
+
+
+class TieredBackend(CacheBackend):
+    def __init__(self, memory: MemoryBackend, disk: DiskBackend):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.memory.get(key)
+        if value is None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        self.disk.delete(key)
+
+
+def make_backend(
+    kind: str,
+    name: str,
+    max_entries: int,
+    max_bytes: Optional[int] = None
+) -> Optional[CacheBackend]:
+    """
+    Builds a backend from config: "memory", "disk", "tiered" or "off" (None).
+    Disk files live in settings.CACHE_DIR/<name>.sqlite3. max_bytes bounds
+    the memory tier only.
+    """
+    kind = (kind or "off").lower()
+    if kind == "off":
+        return None
+    if kind == "memory":
+        return MemoryBackend(max_entries, max_bytes)
+
+    disk = DiskBackend(os.path.join(settings.CACHE_DIR, f"{name}.sqlite3"), max_entries * 10)
+    if kind == "disk":
+        return disk
+    if kind == "tiered":
+        return TieredBackend(MemoryBackend(max_entries, max_bytes), disk)
+    raise ValueError(f"Unknown cache backend: {kind}")
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hits: int = 0, misses: int = 0) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def to_dict(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def content_hash(data) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read a chunk at a time."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentCache:
+    def __init__(self, backend: Optional[CacheBackend]):
+        self.backend = backend
+        self.document_stats = CacheStats()
+        self.embedding_stats = CacheStats()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    # Documents: {"raw_text": str, "chunks": [chunk dicts without embeddings]}
+
+    def get_document(self, key: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        value = self.backend.get(f"doc:{key}")
+        self.document_stats.record(hits=value is not None, misses=value is None)
+        return json.loads(zlib.decompress(value)) if value is not None else None
+
+    def put_document(self, key: str, document: Dict) -> None:
+        if self.enabled:
+            self.backend.set(f"doc:{key}", zlib.compress(json.dumps(document).encode("utf-8")))
+
+    # Embeddings: stored as float32 arrays (3 KB per 768-dim vector)
+
+    @staticmethod
+    def _embedding_key(model: str, task_type: str, text: str) -> str:
+        return f"emb:{model}:{task_type}:{content_hash(text)}"
+
+    def get_embeddings(self, model: str, task_type: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Returns one vector (or None on a miss) per text, in order."""
+        if not self.enabled:
+            return [None] * len(texts)
+
+        results: List[Optional[List[float]]] = []
+        for text in texts:
+            value = self.backend.get(self._embedding_key(model, task_type, text))
+            results.append(array("f", value).tolist() if value is not None else None)
+
+        hits = sum(r is not None for r in results)
+        self.embedding_stats.record(hits=hits, misses=len(results) - hits)
+        return results
+
+    def put_embeddings(self, model: str, task_type: str, texts: List[str], embeddings: List[List[float]]) -> None:
+        if not self.enabled:
+            return
+        for text, embedding in zip(texts, embeddings):
+            self.backend.set(self._embedding_key(model, task_type, text), array("f", embedding).tobytes())
+
+    def stats(self) -> Dict:
+        return {
+            "documents": self.document_stats.to_dict(),
+            "embeddings": self.embedding_stats.to_dict(),
+        }
+
+
+class TTLCache:
+    """Thread-safe LRU of Python objects whose entries expire after ttl seconds."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form, so "Introduction " == "introduction"."""
+    return " ".join(text.split()).casefold()
+
+
+class QueryEmbeddingCache:
+    """
+    Cache for query embeddings on the retrieval path, keyed by
+    (model, task_type, normalized text).
+
+    get_or_compute() coalesces concurrent misses: while one request is
+    fetching a key, others asking for it await the same result instead of
+    making their own API call.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.cache = TTLCache(max_entries, ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.latency_saved = 0.0
+        self._miss_latency_total = 0.0
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def _avg_miss_latency(self) -> float:
+        return self._miss_latency_total / self.misses if self.misses else 0.0
+
+    def _record_hit(self, coalesced: bool = False) -> None:
+        with self._lock:
+            self.hits += 1
+            self.coalesced += coalesced
+            self.latency_saved += self._avg_miss_latency()
+
+    async def get_or_compute(
+        self,
+        model: str,
+        task_type: str,
+        text: str,
+        compute: Callable[[], Awaitable[List[float]]]
+    ) -> List[float]:
+        key = (model, task_type, normalize_query(text))
+
+        value = self.cache.get(key)
+        if value is not None:
+            self._record_hit()
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._record_hit(coalesced=True)
+            # shield: one waiter being cancelled must not cancel the fetch
+            return await asyncio.shield(task)
+
+        # The fetch runs as its own task, not as part of this request, so
+        # this caller being cancelled (client disconnected) does not cancel
+        # it for the requests coalesced onto it; it still fills the cache
+        task = asyncio.ensure_future(self._compute(key, compute))
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: Tuple, compute: Callable[[], Awaitable[List[float]]]) -> List[float]:
+        start = time.perf_counter()
+        value = await compute()
+        with self._lock:
+            self.misses += 1
+            self._miss_latency_total += time.perf_counter() - start
+        self.cache.set(key, value)
+        return value
+
+    def _finish(self, key: Tuple, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark retrieved so a failure nobody else awaited isn't logged
+            task.exception()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "avg_miss_latency_ms": round(self._avg_miss_latency() * 1000, 2),
+            "latency_saved_seconds": round(self.latency_saved, 3),
+        }
+
+
+class GenerationCache:
+    """
+    Generated section text on a backend (memory LRU, disk, or both), with
+    a TTL checked on read. Each entry remembers what producing it cost
+    (tokens, seconds), and every hit adds that to the saved totals.
+
+    Callers that must not reuse a stored answer ("regenerate") skip get()
+    and call record_bypass(); their put() replaces the entry.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], ttl_seconds: float):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.expired = 0
+        self.saved_prompt_tokens = 0
+        self.saved_output_tokens = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def key(model: str, header: str, user_instructions: str, context: str) -> str:
+        fields = json.dumps([model, header, user_instructions or "", content_hash(context)])
+        return f"gen:{content_hash(fields)}"
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        value = self.backend.get(key)
+        entry = json.loads(zlib.decompress(value)) if value is not None else None
+        if entry is not None and time.time() - entry["created_at"] > self.ttl_seconds:
+            self.backend.delete(key)
+            entry = None
+            with self._lock:
+                self.expired += 1
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_prompt_tokens += entry.get("prompt_tokens", 0)
+            self.saved_output_tokens += entry.get("output_tokens", 0)
+            self.saved_seconds += entry.get("seconds", 0.0)
+        return entry["text"]
+
+    def put(self, key: str, text: str, prompt_tokens: int = 0, output_tokens: int = 0, seconds: float = 0.0) -> None:
+        if not self.enabled or not text:
+            return
+        entry = {
+            "text": text,
+            "created_at": time.time(),
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "seconds": round(seconds, 4),
+        }
+        self.backend.set(key, zlib.compress(json.dumps(entry).encode("utf-8")))
+
+    def record_bypass(self) -> None:
+        with self._lock:
+            self.bypasses += 1
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "expired": self.expired,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "saved_prompt_tokens": self.saved_prompt_tokens,
+            "saved_output_tokens": self.saved_output_tokens,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+
+# Create singleton instances
+query_embedding_cache = QueryEmbeddingCache(
+    settings.QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+    settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS
+)
+content_cache = ContentCache(
+    make_backend(
+        settings.CONTENT_CACHE_BACKEND,
+        "content",
+        settings.CONTENT_CACHE_MAX_ENTRIES,
+        int(settings.CONTENT_CACHE_MAX_MB * 1024 * 1024)
+    )
+)
+generation_cache = GenerationCache(
+    make_backend(settings.GENERATION_CACHE_BACKEND, "generations", settings.GENERATION_CACHE_MAX_ENTRIES),
+    settings.GENERATION_CACHE_TTL_SECONDS
+)
+REGISTRY.collect(
+    "query_embedding_cache_requests_total", "counter",
+    "Query embedding lookups by result (coalesced: joined an in-flight miss)",
+    lambda: {
+        ("hit",): query_embedding_cache.hits - query_embedding_cache.coalesced,
+        ("coalesced",): query_embedding_cache.coalesced,
+        ("miss",): query_embedding_cache.misses,
+    },
+    ("result",)
+)
+REGISTRY.collect(
+    "generation_cache_requests_total", "counter",
+    "Section generation cache lookups by result (bypass: forced regeneration)",
+    lambda: {
+        ("hit",): generation_cache.hits,
+        ("miss",): generation_cache.misses,
+        ("bypass",): generation_cache.bypasses,
+    },
+    ("result",)
+)
+REGISTRY.collect(
+    "generation_cache_saved_tokens_total", "counter",
+    "Gemini tokens not spent thanks to generation cache hits",
+    lambda: {
+        ("prompt",): generation_cache.saved_prompt_tokens,
+        ("output",): generation_cache.saved_output_tokens,
+    },
+    ("kind",)
+)
+REGISTRY.collect(
+    "generation_cache_saved_seconds_total", "counter",
+    "Generation time not spent thanks to generation cache hits",
+    lambda: generation_cache.saved_seconds
+)
@@ -0,0 +1,238 @@
+"""
+Checkpoint Service - Lets a failed ingestion resume where it stopped
+
+process_pdf used to start from scratch every time: a Gemini quota error at
+chunk 800 of 1000 threw away the extraction and 800 embeddings, the document
+was marked failed and had to be uploaded again, and the rows already
+inserted stayed behind next to the new upload's.
+
+Checkpoints of one document, in pipeline order:
+- source: The uploaded PDF, so a retry needs no re-upload
+- chunked: raw_text + chunks (extraction and chunking run as one stream,
+  so they finish together)
+- embedded batch N: Vectors of chunks [N*B, (N+1)*B), B = DB_INSERT_BATCH_SIZE
+- stored batch N: Those rows are in doc_chunks (one upsert per batch)
+
+The files (source, chunks, embedded batches) live in
+INGEST_CHECKPOINT_DIR/<document id>/ and are written atomically. The stored
+batches are recorded in documents.ingest_checkpoint, next to the status.
+Rows carry chunk_index and are upserted on (document_id, chunk_index), so a
+batch stored again (its checkpoint was lost in a crash) replaces itself
+instead of adding duplicates.
+
+A document's directory is removed once it completes; checkpoints of
+documents nobody retries expire after INGEST_CHECKPOINT_TTL_HOURS.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+
+from app.core.config import settings
+
+
+class CheckpointMissing(Exception):
+    """Raised when a retry finds no saved upload for the document."""
+
+
+class IngestCheckpoint:
+    """
+    Progress of one document's ingestion (persisted as documents.ingest_checkpoint)
+
+    key ties the checkpoint to the PDF bytes and chunking settings; stored
+    rows only line up with chunks made from the same key and batch size.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        batch_size: int,
+        chunks_count: Optional[int] = None,
+        embedded: Iterable[int] = (),
+        stored: Iterable[int] = (),
+        error: Optional[str] = None
+    ):
+        self.key = key
+        self.batch_size = batch_size
+        self.chunks_count = chunks_count
+        self.embedded = set(embedded)
+        self.stored = set(stored)
+        self.error = error
+        self._lock = threading.Lock()
+
+    @property
+    def batch_count(self) -> int:
+        if not self.chunks_count:
+            return 0
+        return (self.chunks_count + self.batch_size - 1) // self.batch_size
+
+    def batch_range(self, batch: int) -> range:
+        start = batch * self.batch_size
+        return range(start, min(start + self.batch_size, self.chunks_count or 0))
+
+    @property
+    def stage(self) -> str:
+        if self.chunks_count is None:
+            return "started"
+        if len(self.stored) >= self.batch_count:
+            return "stored"
+        return "embedding" if self.embedded or self.stored else "chunked"
+
+    def matches(self, key: str, batch_size: int) -> bool:
+        return self.key == key and self.batch_size == batch_size
+
+    def mark_embedded(self, batch: int) -> None:
+        with self._lock:
+            self.embedded.add(batch)
+
+    def mark_stored(self, batch: int) -> None:
+        with self._lock:
+            self.stored.add(batch)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "key": self.key,
+                "batch_size": self.batch_size,
+                "stage": self.stage,
+                "chunks_count": self.chunks_count,
+                "embedded_batches": sorted(self.embedded),
+                "stored_batches": sorted(self.stored),
+                "error": self.error,
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "IngestCheckpoint":
+        return cls(
+            data["key"],
+            data["batch_size"],
+            data.get("chunks_count"),
+            data.get("embedded_batches", ()),
+            data.get("stored_batches", ()),
+            data.get("error")
+        )
+
+
+class CheckpointStore:
+    """
+    Per-document checkpoint files:
+        <root>/<document id>/source.pdf
+        <root>/<document id>/chunks.<key>.json.z
+        <root>/<document id>/embedded.<batch>.f32
+    """
+
+    def __init__(self, root: str = settings.INGEST_CHECKPOINT_DIR, ttl_hours: float = settings.INGEST_CHECKPOINT_TTL_HOURS):
+        self.root = root
+        self.ttl_seconds = ttl_hours * 3600
+
+    def _dir(self, document_id: str) -> str:
+        return os.path.join(self.root, str(document_id))
+
+    def _write(self, document_id: str, name: str, data: bytes) -> None:
+        """Write-then-rename, so a crash never leaves a half-written checkpoint."""
+        directory = self._dir(document_id)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, os.path.join(directory, name))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _read(self, document_id: str, name: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self._dir(document_id), name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    # Source: the uploaded PDF
+
+    def source_path(self, document_id: str) -> str:
+        """Where the upload is kept; upload_pdf spools straight to it."""
+        return os.path.join(self._dir(document_id), "source.pdf")
+
+    def has_source(self, document_id: str) -> bool:
+        return os.path.exists(self.source_path(document_id))
+
+    def save_source(self, document_id: str, source: Union[bytes, str]) -> None:
+        """Keeps the upload (bytes, or a file to copy) unless it's already kept."""
+        if self.has_source(document_id):
+            return
+        if isinstance(source, str):
+            directory = self._dir(document_id)
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".source.pdf.")
+            os.close(fd)
+            shutil.copyfile(source, temp_path)
+            os.replace(temp_path, self.source_path(document_id))
+        else:
+            self._write(document_id, "source.pdf", source)
+
+    # Chunked: {"raw_text": str, "chunks": [chunk dicts]}, as in the content cache
+
+    def save_document(self, document_id: str, key: str, document: Dict) -> None:
+        data = zlib.compress(json.dumps(document).encode("utf-8"))
+        self._write(document_id, f"chunks.{key.replace(':', '.')}.json.z", data)
+
+    def load_document(self, document_id: str, key: str) -> Optional[Dict]:
+        data = self._read(document_id, f"chunks.{key.replace(':', '.')}.json.z")
+        return json.loads(zlib.decompress(data)) if data is not None else None
+
+    # Embedded batches: the batch's vectors back to back as float32
+
+    def save_embeddings(self, document_id: str, batch: int, vectors) -> None:
+        packed = np.ascontiguousarray(vectors, dtype=np.float32)
+        self._write(document_id, f"embedded.{batch}.f32", packed.tobytes())
+
+    def load_embeddings(self, document_id: str, batch: int, count: int) -> Optional[np.ndarray]:
+        """The batch's vectors as a (count, dim) float32 array, or None."""
+        data = self._read(document_id, f"embedded.{batch}.f32")
+        if data is None or count <= 0:
+            return None
+        flat = np.frombuffer(data, dtype=np.float32)
+        if len(flat) % count:
+            return None
+        return flat.reshape(count, -1)
+
+    def clear(self, document_id: str) -> None:
+        """Drops every checkpoint of the document (it completed, or starts over)."""
+        shutil.rmtree(self._dir(document_id), ignore_errors=True)
+
+    def clear_batches(self, document_id: str) -> None:
+        """Drops chunk and embedding checkpoints, keeping the source."""
+        directory = self._dir(document_id)
+        if not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            if name != "source.pdf":
+                os.unlink(os.path.join(directory, name))
+
+    def prune(self) -> int:
+        """Removes checkpoints untouched for longer than the TTL; returns how many."""
+        if not os.path.isdir(self.root):
+            return 0
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+# Create singleton instance
+checkpoint_store = CheckpointStore()
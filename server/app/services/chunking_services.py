@@ -0,0 +1,445 @@
+"""
+Chunking Service - Pluggable, single-pass text chunking
+
+Replaces the fixed RecursiveCharacterTextSplitter(1000, 100), which re-split
+oversized pieces recursively, counted characters only, and cut sentences
+wherever a 1000-char window happened to end.
+
+Flow:
+1. Segment: One regex pass turns the text into units (words or sentences,
+   with heading lines on their own), each tagged with how good a break
+   before it is (section start > paragraph start > none)
+2. Measure: Each unit's size is computed once, in characters or estimated
+   tokens
+3. Pack: Greedy over running sizes; a chunk closes when the next unit
+   would overflow it, or early at a section/paragraph break once it is full
+   enough. Each close is a binary search, not a walk over units. The next
+   chunk starts with the trailing units that fit in the overlap (never
+   across a heading)
+
+Chunks come back as (start, end) spans into the input text, so callers
+get offsets for free instead of searching for each chunk.
+
+Strategies (CHUNK_STRATEGY):
+- character: word units, sized in characters (closest to the old splitter)
+- token: word units, sized in estimated tokens
+- semantic: sentence units, sized in tokens, headings start new chunks
+
+ChunkingPolicy picks the chunk size per document ("auto" scales it with
+page count, so long documents get fewer, larger chunks).
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+Span = Tuple[int, int]
+
+# Break strength before a unit
+NO_BREAK, PARAGRAPH_BREAK, SECTION_BREAK = 0, 1, 2
+
+_LINE_RE = re.compile(r"[^\n]*\n?")
+_BLANK_LINE_RE = re.compile(r"\n[^\S\n]*\n")
+# End of sentence: terminal punctuation (plus closing quotes/brackets), then
+# whitespace, then something that starts a sentence. "e.g. the" stays whole.
+_SENTENCE_END_RE = re.compile(r"[.!?][\"')\]]*\s+(?=[A-Z0-9\"'(\[])")
+_NUMBERED_HEADING_RE = re.compile(r"^(\d+(\.\d+)*\.?|[IVXLC]+\.|[A-Z]\.)\s+\S")
+
+
+# Character class flags for code points below 128
+_SPACE, _WORD = 1, 2
+_ASCII_CLASSES = np.array(
+    [(_SPACE if chr(c).isspace() else 0) | (_WORD if chr(c).isalnum() or c == ord("_") else 0) for c in range(128)],
+    dtype=np.uint8
+)
+
+
+def _char_classes(text: str):
+    """
+    Per-character (is_space, is_word) masks, matching the regex classes \\s
+    and \\w. One vectorized pass instead of a match object per word.
+    """
+    if text.isascii():
+        classes = _ASCII_CLASSES[np.frombuffer(text.encode("ascii"), dtype=np.uint8)]
+    else:
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        classes = _ASCII_CLASSES[np.minimum(codes, 127)]
+        # Few distinct non-ASCII characters per document: classify each once
+        wide = codes > 127
+        unique, inverse = np.unique(codes[wide], return_inverse=True)
+        flags = np.array([
+            (_SPACE if chr(c).isspace() else 0) | (_WORD if chr(c).isalnum() else 0)
+            for c in unique.tolist()
+        ], dtype=np.uint8)
+        classes[wide] = flags[inverse]
+    return (classes & _SPACE).astype(bool), (classes & _WORD).astype(bool)
+
+
+def _token_costs(text: str) -> np.ndarray:
+    """
+    Estimated tokens per character position: each word run costs one token
+    per ~4 characters (counted at its last character), each punctuation
+    mark one.
+    """
+    is_space, is_word = _char_classes(text)
+    costs = (~is_space & ~is_word).astype(np.int64)
+    if len(text):
+        edges = np.diff(np.concatenate(([False], is_word, [False])).astype(np.int8))
+        run_starts = np.flatnonzero(edges == 1)
+        run_ends = np.flatnonzero(edges == -1)
+        costs[run_ends - 1] += (run_ends - run_starts + 3) // 4
+    return costs
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local estimate of model tokens (no tokenizer call): a word piece per ~4
+    characters, one per punctuation mark. Close to Gemini's count on English
+    prose; only used for sizing.
+    """
+    return int(_token_costs(text).sum())
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Longest prefix of text within max_tokens (estimated), cut after a
+    sentence if one ends in its second half, otherwise between words.
+    """
+    if max_tokens <= 0:
+        return ""
+    running = np.cumsum(_token_costs(text))
+    if not len(running) or running[-1] <= max_tokens:
+        return text
+    limit = int(np.searchsorted(running, max_tokens, side="right"))
+    sentence_ends = [m.start() + 1 for m in _SENTENCE_END_RE.finditer(text, 0, limit + 1)]
+    if sentence_ends and sentence_ends[-1] >= limit // 2:
+        return text[:sentence_ends[-1]]
+    cut = text.rfind(" ", 0, limit + 1)
+    return text[:cut if cut > 0 else limit].rstrip()
+
+
+def is_heading(line: str) -> bool:
+    """Short line without sentence punctuation that is numbered, title-cased or upper-case."""
+    line = line.strip()
+    if not (3 <= len(line) <= 80) or line[-1] in ".,;:!?" or not any(c.isalpha() for c in line):
+        return False
+    if _NUMBERED_HEADING_RE.match(line):
+        return True
+    words = [w for w in line.split() if w[0].isalpha()]
+    if not words or len(words) > 10:
+        return False
+    if line.isupper():
+        return True
+    capitalized = sum(w[0].isupper() for w in words if len(w) > 3)
+    long_words = sum(len(w) > 3 for w in words)
+    return long_words > 0 and capitalized == long_words
+
+
+class Units(NamedTuple):
+    """Segmented text: unit i is text[starts[i]:ends[i]], with breaks[i] before it."""
+    starts: np.ndarray
+    ends: np.ndarray
+    breaks: np.ndarray
+
+    @classmethod
+    def from_lists(cls, starts: List[int], ends: List[int], breaks: List[int]) -> "Units":
+        return cls(
+            np.array(starts, dtype=np.int64),
+            np.array(ends, dtype=np.int64),
+            np.array(breaks, dtype=np.int8)
+        )
+
+
+class Chunker:
+    """
+    Base engine: subclasses only decide how text is segmented into units.
+
+    Args:
+        chunk_size: Max chunk size, in `unit` ("chars" or "tokens")
+        overlap: Size of trailing context repeated at the next chunk's start
+        unit: How sizes are measured
+    """
+
+    name = "base"
+
+    def __init__(self, chunk_size: int, overlap: int, unit: str = "chars"):
+        if unit not in ("chars", "tokens"):
+            raise ValueError(f"Unknown chunk size unit: {unit}")
+        self.chunk_size = max(1, chunk_size)
+        self.overlap = max(0, min(overlap, self.chunk_size // 2))
+        self.unit = unit
+        # A paragraph break this far into a chunk is a good place to end it
+        self.paragraph_fill = int(self.chunk_size * 0.75)
+        # ...and a heading ends the chunk unless it is nearly empty
+        self.section_fill = int(self.chunk_size * 0.25)
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.name}:{self.unit}:{self.chunk_size}:{self.overlap}"
+
+    @property
+    def approx_chars(self) -> int:
+        """Rough chunk length in characters (for sizing buffers)."""
+        return self.chunk_size * (4 if self.unit == "tokens" else 1)
+
+    def size(self, text: str) -> int:
+        return len(text) if self.unit == "chars" else estimate_tokens(text)
+
+    def segment(self, text: str) -> Units:
+        raise NotImplementedError
+
+    def _word_units(self, text: str, start: int, end: int, brk: int) -> Units:
+        """Words of text[start:end]; words longer than a chunk are cut into pieces."""
+        is_space, _ = _char_classes(text[start:end])
+        edges = np.diff(np.concatenate(([True], is_space, [True])).astype(np.int8))
+        starts = np.flatnonzero(edges == -1) + start
+        ends = np.flatnonzero(edges == 1) + start
+        breaks = np.zeros(len(starts), dtype=np.int8)
+        if not len(starts):
+            return Units(starts, ends, breaks)
+        breaks[0] = brk
+
+        # Blank line between words: paragraph break before the next word
+        blank = np.array([m.end() for m in _BLANK_LINE_RE.finditer(text, start, end)], dtype=np.int64)
+        after = np.searchsorted(starts, blank)
+        after = after[after < len(starts)]
+        breaks[after] = np.maximum(breaks[after], PARAGRAPH_BREAK)
+
+        # A token is at least one character, so short words always fit
+        long_words = [
+            i for i in np.flatnonzero(ends - starts > self.chunk_size)
+            if self.size(text[starts[i]:ends[i]]) > self.chunk_size
+        ]
+        if not long_words:
+            return Units(starts, ends, breaks)
+
+        step = self.chunk_size if self.unit == "chars" else self.chunk_size * 4
+        out_starts, out_ends, out_breaks = [], [], []
+        previous = 0
+        for i in long_words:
+            out_starts.extend(starts[previous:i].tolist())
+            out_ends.extend(ends[previous:i].tolist())
+            out_breaks.extend(breaks[previous:i].tolist())
+            for piece in range(int(starts[i]), int(ends[i]), step):
+                out_starts.append(piece)
+                out_ends.append(min(piece + step, int(ends[i])))
+                out_breaks.append(int(breaks[i]) if piece == starts[i] else NO_BREAK)
+            previous = i + 1
+        out_starts.extend(starts[previous:].tolist())
+        out_ends.extend(ends[previous:].tolist())
+        out_breaks.extend(breaks[previous:].tolist())
+        return Units.from_lists(out_starts, out_ends, out_breaks)
+
+    def _cumulative_sizes(self, text: str, units: Units):
+        """
+        (begin, finish) with size(units i..j) == finish[j] - begin[i]: the
+        character offsets themselves, or running token counts from one
+        vectorized pass over the text.
+        """
+        if self.unit == "chars":
+            return units.starts, units.ends
+        running = np.concatenate(([0], np.cumsum(_token_costs(text))))
+        return running[units.starts], running[units.ends]
+
+    def split(self, text: str) -> List[Span]:
+        """Stage 2-3: (start, end) spans of the chunks of text, in order."""
+        units = self.segment(text)
+        n = len(units.starts)
+        if not n:
+            return []
+
+        # Running sizes are non-decreasing, so every "how far can this chunk
+        # go" question is a binary search: O(log n) per chunk, not per unit.
+        # Plain lists + bisect: NumPy's per-call overhead dominates scalar lookups
+        begin, finish = (values.tolist() for values in self._cumulative_sizes(text, units))
+        starts, ends = units.starts, units.ends
+        section_starts = np.flatnonzero(units.breaks == SECTION_BREAK).tolist()
+        paragraph_starts = np.flatnonzero(units.breaks >= PARAGRAPH_BREAK).tolist()
+
+        def first_break_from(candidates: List[int], first: int, fill: int) -> int:
+            """First break j where units first..j-1 already reach fill."""
+            filled = bisect_left(finish, begin[first] + fill)
+            k = bisect_left(candidates, max(first + 1, filled + 1))
+            return candidates[k] if k < len(candidates) else n
+
+        spans: List[Span] = []
+        first = 0
+        while True:
+            # Chunk is units first..j-1: the earliest of overflowing, a heading
+            # past section_fill, or a paragraph break past paragraph_fill
+            overflow = bisect_right(finish, begin[first] + self.chunk_size)
+            j = min(
+                max(overflow, first + 1),
+                first_break_from(section_starts, first, self.section_fill),
+                first_break_from(paragraph_starts, first, self.paragraph_fill)
+            )
+            if j >= n:
+                break
+            spans.append((int(starts[first]), int(ends[j - 1])))
+
+            # Next chunk: trailing units that fit in the overlap, unless a
+            # new section starts here...
+            next_first = j
+            if units.breaks[j] != SECTION_BREAK and self.overlap:
+                carried = bisect_left(begin, finish[j - 1] - self.overlap)
+                next_first = min(max(carried, first + 1), j)
+            # ...and only as many as still leave room for unit j
+            fits = bisect_left(begin, finish[j] - self.chunk_size)
+            first = min(max(next_first, fits), j)
+
+        spans.append((int(starts[first]), int(ends[-1])))
+        return spans
+
+
+class CharacterChunker(Chunker):
+    """Word boundaries, character sizes; prefers paragraph breaks."""
+
+    name = "character"
+
+    def segment(self, text: str) -> Units:
+        return self._word_units(text, 0, len(text), NO_BREAK)
+
+
+class TokenChunker(Chunker):
+    """Word boundaries, sized in estimated tokens."""
+
+    name = "token"
+
+    def __init__(self, chunk_size: int, overlap: int, unit: str = "tokens"):
+        super().__init__(chunk_size, overlap, unit)
+
+    def segment(self, text: str) -> Units:
+        return self._word_units(text, 0, len(text), NO_BREAK)
+
+
+class SemanticChunker(Chunker):
+    """
+    Sentence units within paragraphs; heading lines start a new section.
+    Sentences longer than a chunk fall back to word units.
+    """
+
+    name = "semantic"
+
+    def __init__(self, chunk_size: int, overlap: int, unit: str = "tokens"):
+        super().__init__(chunk_size, overlap, unit)
+
+    def _sentence_units(self, text: str, start: int, end: int, brk: int, out: List[List[int]]) -> None:
+        """Appends the sentences of text[start:end] to out (starts, ends, breaks)."""
+        pos = start
+        boundaries = [m.end() for m in _SENTENCE_END_RE.finditer(text, start, end)] + [end]
+        for boundary in boundaries:
+            # Trim surrounding whitespace off the sentence
+            s, e = pos, boundary
+            while s < e and text[s].isspace():
+                s += 1
+            while e > s and text[e - 1].isspace():
+                e -= 1
+            pos = boundary
+            if s == e:
+                continue
+            if e - s <= self.chunk_size or self.size(text[s:e]) <= self.chunk_size:
+                out[0].append(s)
+                out[1].append(e)
+                out[2].append(brk)
+            else:
+                words = self._word_units(text, s, e, brk)
+                for column, values in zip(out, words):
+                    column.extend(values.tolist())
+            brk = NO_BREAK
+
+    def segment(self, text: str) -> Units:
+        out: List[List[int]] = [[], [], []]
+        block_start: Optional[int] = None
+        block_brk = SECTION_BREAK
+
+        def flush(end: int) -> None:
+            nonlocal block_start
+            if block_start is not None:
+                self._sentence_units(text, block_start, end, block_brk, out)
+                block_start = None
+
+        for m in _LINE_RE.finditer(text):
+            line = m.group().rstrip("\n")
+            if not line.strip():
+                # Blank line: the paragraph (if any) ends here
+                if block_start is not None:
+                    flush(m.start())
+                    block_brk = PARAGRAPH_BREAK
+                continue
+            if is_heading(line):
+                flush(m.start())
+                out[0].append(m.start() + len(line) - len(line.lstrip()))
+                out[1].append(m.start() + len(line.rstrip()))
+                out[2].append(SECTION_BREAK)
+                # The text under a heading stays with it
+                block_brk = NO_BREAK
+                continue
+            if block_start is None:
+                block_start = m.start()
+        flush(len(text))
+        return Units.from_lists(*out)
+
+
+STRATEGIES = {
+    "character": (CharacterChunker, "chars"),
+    "token": (TokenChunker, "tokens"),
+    "semantic": (SemanticChunker, "tokens"),
+}
+
+# Default size and overlap per unit when CHUNK_SIZE / CHUNK_OVERLAP are unset
+DEFAULT_SIZES = {"chars": (1000, 100), "tokens": (300, 30)}
+
+
+class ChunkingPolicy:
+    """
+    Chooses the chunker for a document
+
+    Args:
+        strategy: "character", "token" or "semantic"
+        chunk_size / overlap: Base sizes in the strategy's unit (0 = default)
+        size_policy: "fixed", or "auto" to scale the size with page count:
+            short documents get finer chunks (more precise retrieval), long
+            ones coarser chunks (fewer chunks to embed and store)
+    """
+
+    # (max pages, size multiplier), first match wins
+    AUTO_SCALE = ((10, 0.75), (150, 1.0), (600, 1.5), (None, 2.0))
+
+    def __init__(self, strategy: str, chunk_size: int = 0, overlap: int = 0, size_policy: str = "auto"):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown chunking strategy: {strategy}")
+        if size_policy not in ("fixed", "auto"):
+            raise ValueError(f"Unknown chunk size policy: {size_policy}")
+        self.chunker_class, self.unit = STRATEGIES[strategy]
+        default_size, default_overlap = DEFAULT_SIZES[self.unit]
+        self.chunk_size = chunk_size or default_size
+        self.overlap = overlap or default_overlap
+        self.size_policy = size_policy
+
+    @property
+    def cache_key(self) -> str:
+        """Same policy + same PDF bytes → same chunks (page count comes from the bytes)."""
+        return f"{self.chunker_class.name}:{self.unit}:{self.chunk_size}:{self.overlap}:{self.size_policy}"
+
+    @classmethod
+    def from_settings(cls) -> "ChunkingPolicy":
+        return cls(
+            settings.CHUNK_STRATEGY,
+            settings.CHUNK_SIZE,
+            settings.CHUNK_OVERLAP,
+            settings.CHUNK_SIZE_POLICY
+        )
+
+    def chunker(self, page_count: Optional[int] = None) -> Chunker:
+        scale = 1.0
+        if self.size_policy == "auto" and page_count is not None:
+            scale = next(s for limit, s in self.AUTO_SCALE if limit is None or page_count <= limit)
+        return self.chunker_class(
+            int(self.chunk_size * scale),
+            int(self.overlap * scale),
+            self.unit
+        )
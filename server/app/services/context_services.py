@@ -0,0 +1,194 @@
+"""
+Context Service - Turns retrieved chunks into a compact, bounded prompt context
+
+get_grounding_context used to join its top chunks as they came back. Chunks
+next to each other in the document repeat their overlap, hybrid retrieval
+can return the same passage twice, and nothing bounded the size, so every
+section paid Gemini for duplicate tokens.
+
+Flow:
+1. merge: Chunks where one continues the other (the chunker's carried
+   overlap: a suffix of one is a prefix of the next) or contains the other
+   become one passage
+2. dedupe: A passage whose word shingles mostly appear in a better-ranked
+   passage is dropped
+3. budget: Passages are taken best-ranked first until CONTEXT_TOKEN_BUDGET
+   (estimated tokens, headers included); the first one that doesn't fit is
+   cut at a sentence boundary if enough room is left, later ones dropped
+4. order: Kept passages are put in page order, labelled with their pages
+
+Every call returns a report: tokens of the naive join vs. the assembled
+context, so the saving is visible per request.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set
+
+from app.core.config import settings
+from app.services.chunking_services import estimate_tokens, truncate_to_tokens
+
+SEPARATOR = "\n\n---\n\n"
+
+# Shortest suffix/prefix match taken as real overlap rather than coincidence
+MIN_OVERLAP_CHARS = 20
+# Shingle containment above which a passage counts as a near-duplicate
+DUPLICATE_THRESHOLD = 0.8
+SHINGLE_WORDS = 4
+# Don't bother trimming a passage into less than this many tokens
+MIN_PASSAGE_TOKENS = 40
+
+
+class ContextReport(NamedTuple):
+    chunks: int         # chunks retrieved
+    passages: int       # passages in the assembled context
+    tokens_before: int  # estimated tokens of the plain join of all chunks
+    tokens_after: int   # estimated tokens of the assembled context
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def to_dict(self) -> Dict:
+        return {**self._asdict(), "tokens_saved": self.tokens_saved}
+
+
+class AssembledContext(NamedTuple):
+    text: str
+    report: ContextReport
+
+
+class Passage:
+    """Contiguous document text built from one or more chunks."""
+
+    def __init__(self, content: str, first_page, last_page, rank: int):
+        self.content = content
+        self.first_page = first_page
+        self.last_page = last_page
+        self.rank = rank  # best retrieval rank among its chunks (0 = best)
+
+    @property
+    def header(self) -> str:
+        if self.last_page is None or self.last_page == self.first_page:
+            return f"[Source: Page {self.first_page}]"
+        return f"[Source: Pages {self.first_page}-{self.last_page}]"
+
+    def render(self) -> str:
+        return f"{self.header}\n{self.content}"
+
+    def absorb(self, other: "Passage", content: str) -> None:
+        pages = [p for p in (self.first_page, self.last_page, other.first_page, other.last_page) if p is not None]
+        self.content = content
+        self.first_page = min(pages) if pages else None
+        self.last_page = max(pages) if pages else None
+        self.rank = min(self.rank, other.rank)
+
+
+def format_chunk(chunk: Dict) -> str:
+    """The plain, per-chunk block get_grounding_context used to send."""
+    return f"[Source: Page {chunk['page_number']}]\n{chunk['content']}"
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is a prefix of right (0 if too short)."""
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    # Earliest match in left = longest overlap
+    i = left.find(probe, max(0, len(left) - len(right)))
+    while i >= 0:
+        if right.startswith(left[i:]):
+            return len(left) - i
+        i = left.find(probe, i + 1)
+    return 0
+
+
+def _merge(passages: List[Passage]) -> List[Passage]:
+    """Stage 1: Merges passages that overlap or contain one another until none do."""
+    merged = True
+    while merged:
+        merged = False
+        for a in passages:
+            for b in passages:
+                if a is b:
+                    continue
+                if b.content in a.content:
+                    a.absorb(b, a.content)
+                elif (shared := _overlap(a.content, b.content)):
+                    a.absorb(b, a.content + b.content[shared:])
+                else:
+                    continue
+                passages.remove(b)
+                merged = True
+                break
+            if merged:
+                break
+    return passages
+
+
+def _shingles(text: str) -> Set[tuple]:
+    words = text.lower().split()
+    if len(words) <= SHINGLE_WORDS:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def _dedupe(passages: List[Passage]) -> List[Passage]:
+    """Stage 2: Drops passages mostly contained in a better-ranked kept passage."""
+    kept: List[Passage] = []
+    kept_shingles: List[Set[tuple]] = []
+    for passage in sorted(passages, key=lambda p: p.rank):
+        shingles = _shingles(passage.content)
+        if any(len(shingles & other) >= DUPLICATE_THRESHOLD * len(shingles) for other in kept_shingles):
+            continue
+        kept.append(passage)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def _fit(passages: List[Passage], budget: int) -> List[Passage]:
+    """Stage 3: Best-ranked passages that fit in budget tokens (0 = no limit)."""
+    if budget <= 0:
+        return passages
+    separator_tokens = estimate_tokens(SEPARATOR)
+    fitted: List[Passage] = []
+    used = 0
+    for passage in sorted(passages, key=lambda p: p.rank):
+        cost = estimate_tokens(passage.render()) + (separator_tokens if fitted else 0)
+        if used + cost <= budget:
+            fitted.append(passage)
+            used += cost
+            continue
+        room = budget - used - estimate_tokens(passage.header) - (separator_tokens if fitted else 0)
+        if room >= MIN_PASSAGE_TOKENS:
+            content = truncate_to_tokens(passage.content, room)
+            if content:
+                fitted.append(Passage(content, passage.first_page, passage.last_page, passage.rank))
+        break
+    return fitted
+
+
+def assemble_context(chunks: Sequence[Dict], token_budget: Optional[int] = None) -> AssembledContext:
+    """
+    Args:
+        chunks: Retrieval rows (content, page_number, optional page_end), best first
+        token_budget: Max estimated tokens; defaults to CONTEXT_TOKEN_BUDGET, 0 = none
+
+    Returns:
+        AssembledContext(text, report)
+    """
+    budget = settings.CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    tokens_before = estimate_tokens(SEPARATOR.join(format_chunk(c) for c in chunks)) if chunks else 0
+
+    passages = [
+        Passage(c["content"], c.get("page_number"), c.get("page_end") or c.get("page_number"), rank)
+        for rank, c in enumerate(chunks)
+        if c.get("content")
+    ]
+    passages = _fit(_dedupe(_merge(passages)), budget)
+
+    # Stage 4: reading order
+    passages.sort(key=lambda p: (p.first_page is None, p.first_page or 0, p.rank))
+    text = SEPARATOR.join(p.render() for p in passages)
+    return AssembledContext(
+        text,
+        ContextReport(len(chunks), len(passages), tokens_before, estimate_tokens(text) if text else 0)
+    )
@@ -0,0 +1,119 @@
+"""
+Digest Service - A bounded, representative summary of a document for outlining
+
+generate-outline used to see only the first 5 chunks, so outlines of long
+documents ignored everything after the introduction. The digest is built
+once at ingestion from the chunk embeddings already computed there:
+
+Flow:
+1. Cluster the normalized chunk embeddings (spherical k-means, at most
+   DIGEST_MAX_SECTIONS clusters)
+2. Per cluster, pick the chunk closest to the centroid as its representative
+3. Order representatives by page, trim each to an equal share of
+   DIGEST_MAX_CHARS, and label them with their page and the share of the
+   document their cluster covers
+
+The result is stored in documents.digest and sent to Gemini as the
+outline's research summary: bounded in size however long the document is,
+and with no extra work per request.
+"""
+
+from typing import Dict, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+
+
+def spherical_kmeans(
+    vectors: np.ndarray,
+    k: int,
+    iterations: int = 25,
+    seed: int = 0
+) -> np.ndarray:
+    """
+    Cluster labels for L2-normalized rows (cosine similarity), with
+    k-means++ seeding. Deterministic for a given seed.
+    """
+    n = len(vectors)
+    rng = np.random.default_rng(seed)
+
+    # k-means++: each next center is drawn proportional to its distance
+    centers = [vectors[rng.integers(n)]]
+    distances = 1.0 - vectors @ centers[0]
+    for _ in range(1, k):
+        weights = np.clip(distances.astype(np.float64), 0.0, None)
+        total = weights.sum()
+        index = rng.choice(n, p=weights / total) if total > 0 else rng.integers(n)
+        centers.append(vectors[index])
+        distances = np.minimum(distances, 1.0 - vectors @ vectors[index])
+    centers = np.array(centers)
+
+    labels = np.full(n, -1)
+    for _ in range(iterations):
+        new_labels = np.argmax(vectors @ centers.T, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = vectors[labels == c]
+            # An empty cluster keeps its old center
+            if len(members):
+                center = members.sum(axis=0)
+                centers[c] = center / (np.linalg.norm(center) or 1.0)
+    return labels
+
+
+def _trim(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > 0 else max_chars] + " …"
+
+
+def build_digest(
+    chunks: Sequence[Dict],
+    embeddings: Sequence[Sequence[float]],
+    max_sections: int = settings.DIGEST_MAX_SECTIONS,
+    max_chars: int = settings.DIGEST_MAX_CHARS
+) -> str:
+    """
+    Args:
+        chunks: Chunk dicts (content, page_number) in document order
+        embeddings: One vector per chunk, same order
+
+    Returns:
+        The digest text ("" for a document without chunks)
+    """
+    if not len(chunks):
+        return ""
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors = vectors / norms
+
+    # Stage 1-2: one representative per cluster
+    k = min(max_sections, len(chunks))
+    labels = spherical_kmeans(vectors, k) if k < len(chunks) else np.arange(len(chunks))
+
+    picks = []
+    for c in np.unique(labels):
+        members = np.flatnonzero(labels == c)
+        centroid = vectors[members].mean(axis=0)
+        best = members[np.argmax(vectors[members] @ centroid)]
+        picks.append((int(best), len(members)))
+
+    # Stage 3: in reading order, equal share of the character budget each
+    picks.sort(key=lambda pick: (chunks[pick[0]].get("page_number") or 0, pick[0]))
+    per_section = max(200, max_chars // len(picks))
+    sections = []
+    for index, members in picks:
+        share = round(100 * members / len(chunks))
+        sections.append(
+            f"[Page {chunks[index].get('page_number')}, ~{share}% of the document]\n"
+            f"{_trim(chunks[index]['content'], per_section)}"
+        )
+    return "\n\n".join(sections)
+
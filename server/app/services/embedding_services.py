@@ -0,0 +1,182 @@
+"""
+Embedding Service - Batched, concurrent embedding generation
+
+Flow:
+1. Split texts into batches of `batch_size` chunks (one API request each)
+2. Send batches concurrently, capped at `concurrency` in-flight requests
+3. Throttle request starts through a token bucket (requests per minute)
+4. Retry a failed batch with exponential backoff, without touching the others
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Tuple
+
+from google.genai import types
+from app.core.config import settings
+from app.core.metrics import REGISTRY
+
+GEMINI_CALLS = REGISTRY.counter(
+    "gemini_calls_total", "Gemini API calls by operation and outcome", ("operation", "outcome")
+)
+EMBED_TEXTS = REGISTRY.counter(
+    "embedding_texts_total", "Texts sent to Gemini for embedding at ingestion"
+)
+
+
+class EmbeddingBatchError(Exception):
+    """Raised when a batch still fails after all of its retries."""
+
+    def __init__(self, batch_index: int, cause: Exception):
+        self.batch_index = batch_index
+        self.cause = cause
+        super().__init__(f"Embedding batch {batch_index} failed: {cause}")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter
+
+    Tokens refill continuously at `rate` per second up to `capacity`.
+    acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+
+                wait = (tokens - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class EmbeddingEngine:
+    """
+    Sends many chunks per embed_content request and runs requests in parallel.
+
+    The genai client is synchronous, so batches run on a small thread pool
+    sized by `concurrency`.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str = "gemini-embedding-001",
+        task_type: str = "RETRIEVAL_DOCUMENT",
+        batch_size: int = settings.EMBED_BATCH_SIZE,
+        concurrency: int = settings.EMBED_CONCURRENCY,
+        requests_per_minute: float = settings.EMBED_REQUESTS_PER_MINUTE,
+        max_retries: int = settings.EMBED_MAX_RETRIES,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0
+    ):
+        self.client = client
+        self.model = model
+        self.task_type = task_type
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = TokenBucket(
+            rate=requests_per_minute / 60.0,
+            capacity=self.concurrency
+        )
+
+    def _embed_batch(self, batch_index: int, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds one batch, retrying only this batch on failure
+        """
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                result = self.client.models.embed_content(
+                    model=self.model,
+                    contents=texts,
+                    config=types.EmbedContentConfig(task_type=self.task_type)
+                )
+                embeddings = [e.values for e in result.embeddings]
+                if len(embeddings) != len(texts):
+                    raise ValueError(
+                        f"expected {len(texts)} embeddings, got {len(embeddings)}"
+                    )
+                GEMINI_CALLS.labels("embed_batch", "ok").inc()
+                EMBED_TEXTS.inc(len(texts))
+                return embeddings
+            except Exception as e:
+                GEMINI_CALLS.labels("embed_batch", "error").inc()
+                if attempt >= self.max_retries:
+                    raise EmbeddingBatchError(batch_index, e) from e
+
+                # Exponential backoff with jitter so parallel retries spread out
+                delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                attempt += 1
+
+    def embed_batches(self, texts: List[str]) -> Iterator[Tuple[int, List[List[float]]]]:
+        """
+        Yields (start_index, embeddings) per batch, in input order.
+
+        At most 2 x concurrency batches are queued at a time, so callers can
+        consume (e.g. store) finished batches while later ones are in flight.
+        """
+        batches = [
+            texts[start:start + self.batch_size]
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        if not batches:
+            return
+
+        max_pending = self.concurrency * 2
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = []
+            next_batch = 0
+
+            try:
+                while next_batch < len(batches) or pending:
+                    while next_batch < len(batches) and len(pending) < max_pending:
+                        future = executor.submit(
+                            self._embed_batch, next_batch, batches[next_batch]
+                        )
+                        pending.append((next_batch * self.batch_size, future))
+                        next_batch += 1
+
+                    start, future = pending.pop(0)
+                    yield start, future.result()
+            finally:
+                # Do not start queued batches if the consumer stopped early
+                for _, future in pending:
+                    future.cancel()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds all texts and returns vectors in the same order
+        """
+        embeddings: List[List[float]] = []
+        for _, batch_embeddings in self.embed_batches(texts):
+            embeddings.extend(batch_embeddings)
+        return embeddings
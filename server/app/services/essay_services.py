@@ -1,36 +1,203 @@
+import asyncio
+import json
 from app.core.security import supabase
-from app.services.ai_services import AIService
+from typing import Dict, List, Optional, Tuple
+from app.services.ai_services import AIService, get_ai_service
+from app.core.executors import run_db
+from app.core.config import settings
+from app.core.metrics import REGISTRY, span
+from app.services.vector_services import vector_index
+from app.services.lexical_services import lexical_index, reciprocal_rank_fusion
+from app.services.context_services import AssembledContext, assemble_context
 
-async def get_grounding_context(query_text: str, doc_id: str, match_count: int = 4):
+RETRIEVED_CHUNKS = REGISTRY.counter(
+    "rag_chunks_retrieved_total", "Chunks retrieved for grounding, before merging"
+)
+CONTEXT_TOKENS = REGISTRY.counter(
+    "rag_context_tokens_total",
+    "Estimated grounding context tokens before and after merging and budgeting",
+    ("kind",)
+)
+
+async def retrieve_context(
+    query_text: str,
+    doc_id: str,
+    match_count: int = 4,
+    ai: Optional[AIService] = None
+) -> AssembledContext:
     """
     Step-by-step Librarian Logic:
     1. Translate text to math (Embedding)
     2. Search the database neighbors (RPC call)
-    3. Package the facts into a string (Synthesis)
+       + keyword search (local BM25), fused by rank
+    3. Package the facts into a string (Synthesis): overlapping chunks
+       merged, near-duplicates dropped, fitted to CONTEXT_TOKEN_BUDGET
+
+    Returns:
+        The context text plus a report of the tokens it saved
     """
     
-    # Step 1: Initialize AI Service and get the 'Math Fingerprint' (Vector)
-    ai = AIService()
-    query_vector = ai.get_embedding(query_text)
+    # Step 1: Use the shared AI Service and get the 'Math Fingerprint' (Vector)
+    ai = ai or get_ai_service()
+    with span("embed_query"):
+        query_vector = await ai.get_embedding(query_text)
 
     # Step 2: Call the SQL function (RPC) we created in Supabase
     # This performs the mathematical similarity search
-    response = supabase.rpc("match_doc_chunks", {
-        "query_embedding": query_vector,
-        "filter_document_id": str(doc_id),
-        "match_threshold": 0.4, # 40% similarity or higher
-        "match_count": match_count
-    }).execute()
-
-    # Step 3: Check if we found anything
-    if not response.data:
-        return ""
-
-    # Step 4: Synthesis - Combine the chunks into a single research block
-    # We add metadata like [Source: Page X] so the AI knows where it came from
-    context_parts = []
-    for chunk in response.data:
-        context_parts.append(f"[Source: Page {chunk['page_number']}]\n{chunk['content']}")
-
-    # Join with a clear separator
-    return "\n\n---\n\n".join(context_parts)
\ No newline at end of file
+    # (or search the in-process index, which loads the document once)
+    # With hybrid retrieval each side returns a wider candidate list first
+    candidates = max(match_count, settings.HYBRID_CANDIDATES) if settings.HYBRID_RETRIEVAL else match_count
+    if settings.RETRIEVAL_BACKEND == "local":
+        with span("vector_search"):
+            matches = await vector_index.search(
+                doc_id,
+                query_vector,
+                match_threshold=0.4,
+                match_count=candidates
+            )
+    else:
+        with span("match_rpc"):
+            response = await run_db(supabase.rpc("match_doc_chunks", {
+                "query_embedding": query_vector,
+                "filter_document_id": str(doc_id),
+                "match_threshold": 0.4, # 40% similarity or higher
+                "match_count": candidates
+            }).execute)
+        matches = response.data
+
+    # Exact terms (headers, proper nouns) that embeddings miss; no remote call
+    if settings.HYBRID_RETRIEVAL:
+        with span("lexical_search"):
+            keyword_matches = await lexical_index.search(doc_id, query_text, limit=candidates)
+            matches = reciprocal_rank_fusion([matches, keyword_matches], limit=match_count)
+
+    # Step 3: Synthesis - Combine the chunks into a single research block
+    # with [Source: Page X] labels so the AI knows where it came from
+    # (empty text if nothing matched)
+    with span("assemble_context"):
+        context = assemble_context(matches or [])
+    RETRIEVED_CHUNKS.inc(context.report.chunks)
+    CONTEXT_TOKENS.labels("before").inc(context.report.tokens_before)
+    CONTEXT_TOKENS.labels("after").inc(context.report.tokens_after)
+    return context
+
+
+async def get_grounding_context(
+    query_text: str,
+    doc_id: str,
+    match_count: int = 4,
+    ai: Optional[AIService] = None
+) -> str:
+    """retrieve_context, text only ("" if nothing relevant was found)."""
+    context = await retrieve_context(query_text, doc_id, match_count, ai)
+    return context.text
+
+
+class SectionConflictError(Exception):
+    """A section changed since the writer read it (optimistic version check failed)."""
+
+    def __init__(self, versions: Dict[str, int]):
+        self.versions = versions
+        super().__init__("Section was modified by another writer")
+
+
+async def save_sections(
+    essay_id: str,
+    sections: Dict[str, str],
+    expected_versions: Optional[Dict[str, int]] = None
+) -> Dict[str, int]:
+    """
+    Merges sections (header → text) into essays.content in one atomic RPC
+
+    Only the given sections are sent and written (see
+    migrations/002_essay_section_patch.sql), so concurrent writers of other
+    sections are never overwritten. With expected_versions, the write only
+    happens if those sections are still at the versions the caller read.
+
+    Returns:
+        header → new version for every section written
+
+    Raises:
+        LookupError: if the essay does not exist
+        SectionConflictError: if an expected version no longer matches
+    """
+    with span("essay_write"):
+        result = await run_db(supabase.rpc("patch_essay_sections", {
+            "p_essay_id": str(essay_id),
+            "p_sections": sections,
+            "p_expected_versions": expected_versions
+        }).execute)
+
+    outcome = result.data or {}
+    if outcome.get("status") == "not_found":
+        raise LookupError("Essay not found")
+    if outcome.get("status") == "conflict":
+        raise SectionConflictError(outcome.get("versions") or {})
+    return outcome.get("versions") or {}
+
+
+async def save_section(
+    essay_id: str,
+    header: str,
+    section_text: str,
+    expected_version: Optional[int] = None
+) -> int:
+    """Stores one section (see save_sections); returns its new version."""
+    versions = await save_sections(
+        essay_id,
+        {header: section_text},
+        None if expected_version is None else {header: expected_version}
+    )
+    return versions[header]
+
+
+def outline_headers(outline) -> List[str]:
+    """
+    Pulls the section headers out of a stored outline.
+    generate_outline stores Gemini's JSON text, so accept a string, the
+    parsed {"outline": [...]} object, or the bare list.
+    """
+    if isinstance(outline, str):
+        outline = json.loads(outline)
+    if isinstance(outline, dict):
+        outline = outline.get("outline") or []
+    return [item["header"] for item in outline if isinstance(item, dict) and item.get("header")]
+
+
+async def generate_sections(
+    headers: List[str],
+    doc_id: str,
+    ai: Optional[AIService] = None,
+    max_concurrency: int = 4,
+    force: bool = False
+) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Retrieval + grounded generation for many headers at once
+
+    Each header runs the same steps as a single generate-section call;
+    at most max_concurrency of them are in flight at a time. One failing
+    header does not stop the others. force bypasses the generation cache.
+
+    Returns:
+        (sections, errors): header → generated text, header → error message
+    """
+    ai = ai or get_ai_service()
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def one(header: str) -> str:
+        async with semaphore:
+            context = await get_grounding_context(query_text=header, doc_id=doc_id, ai=ai)
+            if not context:
+                raise LookupError("No relevant info found in PDF")
+            text, _ = await ai.write_section(header=header, context=context, force=force)
+            return text
+
+    results = await asyncio.gather(*(one(h) for h in headers), return_exceptions=True)
+
+    sections, errors = {}, {}
+    for header, result in zip(headers, results):
+        if isinstance(result, BaseException):
+            errors[header] = str(result) or type(result).__name__
+        else:
+            sections[header] = result
+    return sections, errors
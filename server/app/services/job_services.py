@@ -0,0 +1,221 @@
+"""
+Job Service - Background ingestion queue for uploaded PDFs
+
+Flow:
+1. submit(): Queues a pipeline run for a user (rejects when queues are full)
+2. Worker threads pick jobs round-robin across users, so one user uploading
+   many PDFs cannot starve everyone else
+3. The pipeline reports (stage, percent) through a progress callback
+4. get() / get_by_document(): Read job state for the progress endpoint
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Optional
+from uuid import uuid4
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY
+
+# Progress shown for each documents.status value when no live job is known
+# (e.g. after a restart, or when another worker process ran the job)
+STAGE_PERCENT = {
+    "ingested": 0,
+    "extracted": 15,
+    "chunked": 25,
+    "embedding": 25,
+    "completed": 100,
+    "failed": 100,
+}
+
+ProgressCallback = Callable[[str, float], None]
+
+
+class QueueFullError(Exception):
+    """Raised when the global or per-user queue depth limit is reached."""
+
+
+class IngestionJob:
+    def __init__(self, user_id: str, document_id: str, task: Callable[[ProgressCallback], Dict]):
+        self.id = str(uuid4())
+        self.user_id = user_id
+        self.document_id = document_id
+        self.task = task
+        self.stage = "ingested"
+        self.percent = 0.0
+        self.error: Optional[str] = None
+        self.result: Optional[Dict] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    @property
+    def done(self) -> bool:
+        return self.stage in ("completed", "failed")
+
+    def update(self, stage: str, percent: float) -> None:
+        self.stage = stage
+        self.percent = round(min(100.0, max(0.0, percent)), 1)
+        self.updated_at = time.time()
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "doc_id": self.document_id,
+            "status": self.stage,
+            "percent": self.percent,
+            "error": self.error,
+            "chunks_count": (self.result or {}).get("chunks_count"),
+        }
+
+
+class IngestionQueue:
+    """
+    Bounded thread pool fed from per-user FIFO queues.
+
+    The pipeline is dominated by Gemini/Supabase round-trips, so threads are
+    enough; CPU-heavy extraction can still hand off to its own process pool.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.INGEST_WORKERS,
+        max_queue_depth: int = settings.INGEST_MAX_QUEUE_DEPTH,
+        max_jobs_per_user: int = settings.INGEST_MAX_JOBS_PER_USER,
+        finished_job_ttl: float = 3600.0
+    ):
+        self.workers = max(1, workers)
+        self.max_queue_depth = max_queue_depth
+        self.max_jobs_per_user = max_jobs_per_user
+        self.finished_job_ttl = finished_job_ttl
+
+        self._cond = threading.Condition()
+        # user_id -> queued jobs; dict order is the round-robin order
+        self._user_queues: "OrderedDict[str, Deque[IngestionJob]]" = OrderedDict()
+        self._active_per_user: Dict[str, int] = {}
+        self._queued = 0
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._jobs_by_document: Dict[str, str] = {}
+        self._threads = []
+        self._shutdown = False
+
+    def _ensure_started(self) -> None:
+        # Threads start lazily so importing the module has no side effects
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f"ingest-worker-{i}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _prune_finished(self) -> None:
+        cutoff = time.time() - self.finished_job_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.done and job.updated_at < cutoff
+        ]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if self._jobs_by_document.get(job.document_id) == job_id:
+                del self._jobs_by_document[job.document_id]
+
+    def submit(self, user_id: str, document_id: str, task: Callable[[ProgressCallback], Dict]) -> IngestionJob:
+        """
+        Queues task(progress) to run in the background
+
+        Raises:
+            QueueFullError: if the server-wide or the user's limit is reached
+        """
+        job = IngestionJob(user_id, document_id, task)
+
+        with self._cond:
+            if self._shutdown:
+                raise QueueFullError("Ingestion queue is shutting down")
+            if self._queued >= self.max_queue_depth:
+                raise QueueFullError("Too many documents are being processed, try again shortly")
+            if self._active_per_user.get(user_id, 0) >= self.max_jobs_per_user:
+                raise QueueFullError(
+                    f"You already have {self.max_jobs_per_user} documents processing"
+                )
+
+            self._prune_finished()
+            self._ensure_started()
+
+            self._user_queues.setdefault(user_id, deque()).append(job)
+            self._active_per_user[user_id] = self._active_per_user.get(user_id, 0) + 1
+            self._queued += 1
+            self._jobs[job.id] = job
+            self._jobs_by_document[document_id] = job.id
+            self._cond.notify()
+
+        return job
+
+    def _next_job(self) -> Optional[IngestionJob]:
+        with self._cond:
+            while not self._user_queues and not self._shutdown:
+                self._cond.wait()
+            if self._shutdown:
+                return None
+
+            # Take one job from the user at the head, then move them to the back
+            user_id, queue = next(iter(self._user_queues.items()))
+            job = queue.popleft()
+            del self._user_queues[user_id]
+            if queue:
+                self._user_queues[user_id] = queue
+            self._queued -= 1
+            return job
+
+    def _worker_loop(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+
+            try:
+                job.result = job.task(job.update)
+                job.update("completed", 100)
+            except Exception as e:
+                job.error = str(e)
+                job.update("failed", job.percent)
+            finally:
+                with self._cond:
+                    remaining = self._active_per_user.get(job.user_id, 1) - 1
+                    if remaining > 0:
+                        self._active_per_user[job.user_id] = remaining
+                    else:
+                        self._active_per_user.pop(job.user_id, None)
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def get_by_document(self, document_id: str) -> Optional[IngestionJob]:
+        with self._cond:
+            job_id = self._jobs_by_document.get(document_id)
+            return self._jobs.get(job_id) if job_id else None
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return self._queued
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stops workers after their current job; queued jobs are dropped."""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+# Create singleton instance
+ingestion_queue = IngestionQueue()
+REGISTRY.collect(
+    "ingest_queue_depth", "gauge", "Ingestion jobs waiting for a worker",
+    ingestion_queue.queue_depth
+)
@@ -0,0 +1,294 @@
+"""
+Lexical Service - Per-document BM25 index for hybrid retrieval
+
+Embeddings are weak on exact terms: a header like "Methodology" or a
+proper noun often matches the wrong chunks. A BM25 keyword index over the
+same chunks catches those, and reciprocal rank fusion merges both rankings.
+
+Flow:
+1. build: At ingestion, tokenize each chunk → term postings (chunk index,
+   term frequency) plus chunk lengths
+2. store: Serialized as packed uint32/uint16 arrays + zlib into a local
+   SQLite file (CACHE_DIR/lexical.sqlite3), with an in-memory LRU of
+   loaded indexes in front
+3. search: Scores only the chunks that contain a query term; no remote call
+4. reciprocal_rank_fusion: Merges the vector and BM25 rankings
+
+Documents ingested before this existed (or on another host) are backfilled
+once from doc_chunks on first use.
+"""
+
+import asyncio
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.cache_services import DiskBackend
+from app.services.storage_services import fetch_chunks
+
+_TOKEN_RE = re.compile(r"\w+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in into is it its of on or "
+    "that the their them then there these they this to was were which will with "
+    "we our not can also been more such than other".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords or single characters."""
+    return [
+        token for token in _TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """
+    Postings for one document's chunks.
+
+    Term t's postings are docs[starts[t]:starts[t + 1]] (chunk indices) and
+    the matching tfs; terms[t] is the term text.
+    """
+
+    def __init__(
+        self,
+        chunks: List[Dict],
+        terms: List[str],
+        starts: np.ndarray,
+        docs: np.ndarray,
+        tfs: np.ndarray,
+        lengths: np.ndarray,
+        k1: float = 1.2,
+        b: float = 0.75
+    ):
+        self.chunks = chunks  # [{"content": ..., "page_number": ...}]
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.starts = starts
+        self.docs = docs
+        self.tfs = tfs
+        self.lengths = lengths
+        self.avg_length = float(lengths.mean()) if len(lengths) else 0.0
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, chunks: Iterable[Dict]) -> "BM25Index":
+        """Stage 1: chunks are dicts with at least content and page_number."""
+        chunks = [{"content": c["content"], "page_number": c.get("page_number")} for c in chunks]
+        postings: Dict[str, List] = {}
+        lengths = []
+        for i, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk["content"]))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((i, tf))
+
+        terms = sorted(postings)
+        starts = [0]
+        docs, tfs = [], []
+        for term in terms:
+            for doc, tf in postings[term]:
+                docs.append(doc)
+                tfs.append(min(tf, 65535))
+            starts.append(len(docs))
+
+        return cls(
+            chunks,
+            terms,
+            np.array(starts, dtype=np.uint32),
+            np.array(docs, dtype=np.uint32),
+            np.array(tfs, dtype=np.uint16),
+            np.array(lengths, dtype=np.uint32)
+        )
+
+    def to_bytes(self) -> bytes:
+        """Stage 2: [meta length][meta JSON][starts][docs][tfs][lengths], zlib'd."""
+        meta = json.dumps({
+            "chunks": self.chunks,
+            "terms": self.terms,
+            "sizes": [len(self.starts), len(self.docs), len(self.lengths)],
+        }).encode("utf-8")
+        body = b"".join((
+            struct.pack("<I", len(meta)),
+            meta,
+            self.starts.astype("<u4").tobytes(),
+            self.docs.astype("<u4").tobytes(),
+            self.tfs.astype("<u2").tobytes(),
+            self.lengths.astype("<u4").tobytes(),
+        ))
+        return zlib.compress(body)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BM25Index":
+        body = zlib.decompress(data)
+        (meta_len,) = struct.unpack_from("<I", body)
+        meta = json.loads(body[4:4 + meta_len])
+        n_starts, n_postings, n_chunks = meta["sizes"]
+
+        offset = 4 + meta_len
+        arrays = []
+        for dtype, count in (("<u4", n_starts), ("<u4", n_postings), ("<u2", n_postings), ("<u4", n_chunks)):
+            arrays.append(np.frombuffer(body, dtype=dtype, count=count, offset=offset))
+            offset += count * np.dtype(dtype).itemsize
+        return cls(meta["chunks"], meta["terms"], *arrays)
+
+    def search(self, query: str, limit: int) -> List[Dict]:
+        """
+        Stage 3: BM25 over the chunks containing at least one query term,
+        best first. Rows are shaped like the vector search results, with a
+        "score" instead of "similarity".
+        """
+        if not self.chunks or limit <= 0:
+            return []
+
+        n = len(self.chunks)
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.term_ids.get(term)
+            if t is None:
+                continue
+            start, end = self.starts[t], self.starts[t + 1]
+            docs = self.docs[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            df = end - start
+            idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self.lengths[docs] / self.avg_length)
+            scores[docs] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        top = matched[np.argsort(-scores[matched], kind="stable")[:limit]]
+        return [
+            {
+                "content": self.chunks[i]["content"],
+                "page_number": self.chunks[i]["page_number"],
+                "score": float(scores[i]),
+            }
+            for i in top
+        ]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[Dict]], limit: int, k: int = 60) -> List[Dict]:
+    """
+    Stage 4: Merges ranked lists of chunk rows by sum(1 / (k + rank)).
+
+    Rows are matched on their content (the vector and BM25 sides have no
+    shared id); the first list's row wins when both have a chunk.
+    """
+    scores: Dict[str, float] = {}
+    rows: Dict[str, Dict] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            key = row["content"]
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            rows.setdefault(key, row)
+    ordered = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [{**rows[key], "fused_score": scores[key]} for key in ordered]
+
+
+class LexicalIndexStore:
+    """
+    BM25 indexes by document id: a local SQLite file plus an LRU of
+    deserialized indexes (max_loaded documents).
+    """
+
+    def __init__(self, path: str, max_entries: int, max_loaded: int, supabase_client=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_loaded = max(1, max_loaded)
+        self.supabase_client = supabase_client
+        self.backfills = 0
+        self._loaded: "OrderedDict[str, BM25Index]" = OrderedDict()
+        self._backend: Optional[DiskBackend] = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self) -> DiskBackend:
+        # Opened on first use so importing the app doesn't create files
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = DiskBackend(self.path, self.max_entries)
+        return self._backend
+
+    @property
+    def client(self):
+        if self.supabase_client is None:
+            from app.core.security import supabase
+            return supabase
+        return self.supabase_client
+
+    def _remember(self, doc_id: str, index: BM25Index) -> None:
+        with self._lock:
+            self._loaded[doc_id] = index
+            self._loaded.move_to_end(doc_id)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+
+    def put(self, doc_id, chunks: Iterable[Dict]) -> BM25Index:
+        """Builds and stores the index for a document (blocking; ingestion workers)."""
+        doc_id = str(doc_id)
+        index = BM25Index.build(chunks)
+        self.backend.set(doc_id, index.to_bytes())
+        self._remember(doc_id, index)
+        return index
+
+    def _loaded_index(self, doc_id: str) -> Optional[BM25Index]:
+        with self._lock:
+            index = self._loaded.get(doc_id)
+            if index is not None:
+                self._loaded.move_to_end(doc_id)
+            return index
+
+    def get(self, doc_id) -> Optional[BM25Index]:
+        """The stored index for a document, or None (blocking on an LRU miss)."""
+        doc_id = str(doc_id)
+        index = self._loaded_index(doc_id)
+        if index is not None:
+            return index
+        data = self.backend.get(doc_id)
+        if data is None:
+            return None
+        index = BM25Index.from_bytes(data)
+        self._remember(doc_id, index)
+        return index
+
+    async def search(self, doc_id, query: str, limit: int) -> List[Dict]:
+        # Only an LRU hit is answered on the loop; the SQLite read and
+        # decompression, or a backfill's build and write, run on a thread
+        index = self._loaded_index(str(doc_id))
+        if index is None:
+            index = await asyncio.to_thread(self.get, doc_id)
+        if index is None:
+            # One-time backfill for documents ingested without an index
+            rows = await fetch_chunks(self.client, doc_id, "content, page_number")
+            if not rows:
+                return []
+            index = await asyncio.to_thread(self.put, doc_id, rows)
+            self.backfills += 1
+        return index.search(query, limit)
+
+    def invalidate(self, doc_id) -> None:
+        doc_id = str(doc_id)
+        with self._lock:
+            self._loaded.pop(doc_id, None)
+        self.backend.delete(doc_id)
+
+
+# Create singleton instance
+lexical_index = LexicalIndexStore(
+    os.path.join(settings.CACHE_DIR, "lexical.sqlite3"),
+    max_entries=settings.LEXICAL_INDEX_MAX_DOCUMENTS,
+    max_loaded=settings.LEXICAL_INDEX_MAX_LOADED
+)
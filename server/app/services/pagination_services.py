@@ -0,0 +1,92 @@
+"""
+Pagination Service - Cursor pages and column projection for list/detail reads
+
+The list endpoints used to return every row of a user, and the detail
+endpoints select("*") (for documents, that includes the whole raw_text).
+
+Flow:
+1. after_cursor: Orders a select newest first, by (created_at desc, id
+   desc); given a cursor, keeps only the rows after it in that order
+   (one PostgREST or filter, served by the (user_id, created_at, id)
+   indexes of migration 006)
+2. The endpoint reads limit + 1 rows
+3. page: Returns the first limit rows, plus the cursor of the last one if
+   the extra row showed there is another page
+
+A cursor is the last row's (created_at, id) as base64url JSON, opaque to
+clients. Unlike an offset, rows created while a client pages through do
+not shift later pages.
+
+project turns a comma-separated fields parameter into a select() column
+list, checked against the endpoint's allowlist.
+"""
+
+import base64
+import binascii
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not produced by page() (tampered, truncated, or from another endpoint)."""
+
+
+class InvalidFields(ValueError):
+    """A requested field is not in the endpoint's allowlist."""
+
+
+def encode_cursor(row: Dict) -> str:
+    data = json.dumps([row["created_at"], str(row["id"])], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(row_id, str):
+        raise InvalidCursor("Invalid cursor")
+    return created_at, row_id
+
+
+def _quote(value: str) -> str:
+    """A PostgREST filter value in double quotes (timestamps contain ':' and '+')."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def after_cursor(query, cursor: Optional[str] = None):
+    """
+    Newest-first order for a select, and with a cursor only the rows after
+    it. Raises InvalidCursor before anything is sent.
+    """
+    query = query.order("created_at", desc=True).order("id", desc=True)
+    if cursor:
+        created_at, row_id = map(_quote, decode_cursor(cursor))
+        query = query.or_(f"created_at.lt.{created_at},and(created_at.eq.{created_at},id.lt.{row_id})")
+    return query
+
+
+def page(rows: List[Dict], limit: int) -> Tuple[List[Dict], Optional[str]]:
+    """Splits limit + 1 fetched rows into (page, next cursor or None)."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1])
+
+
+def project(fields: Optional[str], allowed: Sequence[str], default: Sequence[str]) -> str:
+    """
+    The select() column list for a fields parameter ("id,status"), or the
+    default columns without one. Raises InvalidFields for anything else.
+    """
+    if not fields:
+        return ", ".join(default)
+    requested = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in allowed]
+    if unknown or not requested:
+        raise InvalidFields(
+            f"Unknown field(s): {', '.join(unknown) or '(none given)'}; allowed: {', '.join(allowed)}"
+        )
+    return ", ".join(requested)
@@ -2,105 +2,382 @@
 PDF Processing Service - Handles extraction, chunking, and embedding generation
 
 Flow:
-1. extract_text_from_pdf: Reads PDF binary → Returns text + page mapping
-2. chunk_text: Splits text → Returns chunks with metadata
-3. generate_embeddings: Sends chunks to Gemini → Returns vector embeddings
-4. process_pdf: Orchestrates all steps → Stores everything in DB
+1. iter_pages: Reads PDF binary → Yields (page_number, page_text) in order,
+   extracting page ranges in parallel worker processes for large files
+2. chunk_pages: Splits the page stream → Yields chunks with metadata while
+   extraction is still running
+3. embed_chunks: Reuses cached embeddings, sends the rest to Gemini
+4. embed_and_store: Embeds and upserts fixed batches, checkpointing each
+5. process_pdf: Orchestrates all steps → Stores everything in DB, and
+   builds the document's BM25 index for hybrid retrieval and its digest
+   for outlining
+   (a PDF seen before skips steps 1-2 via the content cache; a failed run
+   resumes from its checkpoints, see checkpoint_services)
 """
 
+import mmap
+import os
+import tempfile
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from pypdf import PdfReader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from postgrest.types import ReturnMethod
 from google import genai                          # CHANGED
-from google.genai import types                    # CHANGED
 from io import BytesIO
-from typing import List, Dict, Tuple
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple, Union
 from app.core.config import settings
+from app.core.clients import client_registry
+from app.core.metrics import REGISTRY, TimedIterator, record_stage, span
+from app.services.embedding_services import EmbeddingEngine
+from app.services.chunking_services import Chunker, ChunkingPolicy, Span
+from app.services.storage_services import ChunkWriter
+from app.services.cache_services import ContentCache, content_cache, content_hash, file_hash
+from app.services.checkpoint_services import (
+    CheckpointMissing, CheckpointStore, IngestCheckpoint, checkpoint_store
+)
+from app.services.vector_services import vector_index
+from app.services.lexical_services import lexical_index
+from app.services.digest_services import build_digest
+from app.services.quantization_services import embedding_columns
 from uuid import UUID
+from bisect import bisect_right
 
-class PDFProcessingService:
+# Text between pages in the joined document text
+PAGE_SEPARATOR = "\n\n"
+
+INGEST_DOCUMENTS = REGISTRY.counter(
+    "ingest_documents_total", "process_pdf runs by outcome", ("outcome",)
+)
+INGEST_CHUNKS = REGISTRY.counter(
+    "ingest_chunks_total", "Chunks produced by ingestion, by where they came from", ("source",)
+)
+
+
+class PageBoundaryIndex:
+    """
+    Sorted start offsets of each page in the joined document text.
+    page_at(offset) is a binary search instead of a scan over every page.
+    """
+    
     def __init__(self):
-        self.client = genai.Client(
-            api_key=settings.GEMINI_API_KEY
-        )
-        # Initialize text splitter with specified parameters
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=100,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
+        self._starts: List[int] = []
+        self._pages: List[int] = []
+    
+    def __len__(self) -> int:
+        return len(self._starts)
+    
+    def add_page(self, page_number: int, start_offset: int) -> None:
+        # Pages arrive in order, so appending keeps the list sorted
+        self._starts.append(start_offset)
+        self._pages.append(page_number)
+    
+    def page_at(self, offset: int) -> int:
+        if not self._starts:
+            return 1
+        i = bisect_right(self._starts, offset) - 1
+        return self._pages[max(i, 0)]
+
+
+@contextmanager
+def open_pdf(source: Union[bytes, str]) -> Iterator[PdfReader]:
+    """
+    PdfReader over PDF bytes, or over a read-only memory map of a PDF file
+
+    Given a path, pypdf would read the whole file into a BytesIO; through
+    the map only the parts it parses are paged in, from the page cache
+    (shared, and reclaimable under memory pressure).
+    """
+    if not isinstance(source, str):
+        yield PdfReader(BytesIO(source))
+        return
+    with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield PdfReader(mapped)
+
+
+def count_pages(source: Union[bytes, str]) -> int:
+    """Page count from the PDF's page tree, without extracting any text."""
+    with open_pdf(source) as reader:
+        return len(reader.pages)
+
+
+# Per worker process: the PDF it opened last, kept for its next page range.
+# Opening parses the xref and page tree, which costs about as much as
+# extracting a dozen pages of a large file, so it is done once per worker
+# and document rather than once per task.
+_worker_pdf: Dict = {}
+
+
+def _worker_reader(path: str) -> PdfReader:
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if _worker_pdf.get("key") != key:
+        _close_worker_pdf()
+        f = open(path, "rb")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _worker_pdf.update(key=key, file=f, map=mapped, reader=PdfReader(mapped))
+    return _worker_pdf["reader"]
+
+
+def _close_worker_pdf() -> None:
+    mapped, f = _worker_pdf.pop("map", None), _worker_pdf.pop("file", None)
+    _worker_pdf.clear()
+    try:
+        if mapped is not None:
+            mapped.close()
+    except BufferError:
+        # A buffer into the map is still alive; it is unmapped when collected
+        pass
+    if f is not None:
+        f.close()
+
+
+def _extract_page_range(path: str, start: int, end: int) -> List[str]:
+    """
+    Worker-process helper: extracts pages [start, end) from a PDF on disk.
+    Module-level so it can be pickled into the process pool.
+    """
+    reader = _worker_reader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+class PDFProcessingService:
+    def __init__(
+        self,
+        cache: Optional[ContentCache] = None,
+        client: Optional[genai.Client] = None,
+        checkpoints: Optional[CheckpointStore] = None
+    ):
+        # Same pooled client as AIService (see core/clients)
+        self.client = client or client_registry.genai_client()
+        # Batched, concurrent embedding requests (see embedding_services)
+        self.embedding_engine = EmbeddingEngine(
+            self.client,
+            task_type="RETRIEVAL_DOCUMENT"
         )
+        # Chunking strategy and per-document sizing (see chunking_services)
+        self.chunking_policy = ChunkingPolicy.from_settings()
+        self.chunker = self.chunking_policy.chunker()
+        # Created on first large PDF, shared by all ingestion workers
+        self._extract_pool: Optional[ProcessPoolExecutor] = None
+        # Documents by PDF hash, embeddings by chunk-text hash
+        self.content_cache = cache or content_cache
+        # Resumable ingestion: source, chunks and embedded batches per document
+        self.checkpoints = checkpoints or checkpoint_store
+    
+    def _get_extract_pool(self) -> ProcessPoolExecutor:
+        if self._extract_pool is None:
+            self._extract_pool = ProcessPoolExecutor(max_workers=settings.EXTRACT_WORKERS)
+        return self._extract_pool
+    
+    def shutdown(self) -> None:
+        if self._extract_pool is not None:
+            self._extract_pool.shutdown(wait=False, cancel_futures=True)
+            self._extract_pool = None
     
-    def extract_text_from_pdf(self, file_bytes: bytes) -> Tuple[str, Dict[int, str]]:
+    def iter_pages(self, source: Union[bytes, str]) -> Iterator[Tuple[int, str]]:
+        """
+        Stage 2: EXTRACTION (streaming)
+        Yields (page_number, page_text) in page order
+        
+        Small PDFs are read inline. Larger ones are split into page ranges
+        extracted by a process pool; at most 2 x workers ranges are in flight,
+        so finished text is handed on (and freed) instead of piling up.
+        
+        Args:
+            source: Raw PDF bytes, or a path to the PDF on disk
+        """
+        with open_pdf(source) as reader:
+            total_pages = len(reader.pages)
+            
+            if total_pages < settings.EXTRACT_PARALLEL_MIN_PAGES or settings.EXTRACT_WORKERS <= 1:
+                for page_num, page in enumerate(reader.pages, start=1):
+                    yield page_num, page.extract_text() or ""
+                return
+        
+        # Workers open the file themselves; the parent's parse is closed
+        
+        temp_path = None
+        if isinstance(source, str):
+            path = source
+        else:
+            # Hand workers a path rather than pickling the bytes into every task
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+                tmp.write(source)
+                temp_path = path = tmp.name
+        
+        try:
+            pool = self._get_extract_pool()
+            step = settings.EXTRACT_PAGES_PER_TASK
+            ranges = [(start, min(start + step, total_pages)) for start in range(0, total_pages, step)]
+            max_pending = settings.EXTRACT_WORKERS * 2
+            pending = []
+            next_range = 0
+            
+            while next_range < len(ranges) or pending:
+                while next_range < len(ranges) and len(pending) < max_pending:
+                    start, end = ranges[next_range]
+                    pending.append((start, pool.submit(_extract_page_range, path, start, end)))
+                    next_range += 1
+                
+                start, future = pending.pop(0)
+                for offset, page_text in enumerate(future.result()):
+                    yield start + offset + 1, page_text
+        finally:
+            for _, future in pending:
+                future.cancel()
+            if temp_path:
+                os.unlink(temp_path)
+    
+    def extract_text_from_pdf(self, source: Union[bytes, str]) -> Tuple[str, Dict[int, str]]:
         """
         Stage 2: EXTRACTION
         Reads PDF binary and extracts text with page information
         
         Args:
-            file_bytes: Raw PDF file content
+            source: Raw PDF bytes, or a path to the PDF on disk
             
         Returns:
             Tuple of (full_text, page_content_map)
             - full_text: All text concatenated
             - page_content_map: Dict mapping page_number → page_text
         """
-        pdf_file = BytesIO(file_bytes)
-        reader = PdfReader(pdf_file)
-        
-        full_text = ""
         page_content_map = {}
+        page_texts = []
         
-        for page_num, page in enumerate(reader.pages, start=1):
-            page_text = page.extract_text() or ""
+        for page_num, page_text in self.iter_pages(source):
             page_content_map[page_num] = page_text
-            full_text += page_text + "\n\n"
+            page_texts.append(page_text)
         
-        return full_text.strip(), page_content_map
+        # One join instead of repeated += (which copies the text every page)
+        return PAGE_SEPARATOR.join(page_texts).strip(), page_content_map
     
-    def chunk_text(self, text: str, page_content_map: Dict[int, str]) -> List[Dict]:
+    def chunk_text(
+        self,
+        text: str,
+        page_content_map: Dict[int, str],
+        chunker: Optional[Chunker] = None
+    ) -> List[Dict]:
         """
         Stage 3: CHUNKING
-        Splits text into overlapping chunks and tracks which page each chunk came from
+        Splits text into overlapping chunks and tracks which pages each chunk came from
         
         Args:
-            text: Full document text
+            text: Full document text, as returned by extract_text_from_pdf
             page_content_map: Mapping of page numbers to page content
+            chunker: Defaults to the service's chunker
             
         Returns:
-            List of chunk dictionaries with 'content' and 'page_number'
+            List of chunk dictionaries with 'content', 'page_number' (first
+            page), 'page_end' (last page), 'start_offset' and 'end_offset'
         """
-        chunks = self.text_splitter.split_text(text)
+        # extract_text_from_pdf strips the joined pages, which shifts offsets
+        joined = PAGE_SEPARATOR.join(page_content_map[n] for n in sorted(page_content_map))
+        shift = len(joined) - len(joined.lstrip())
         
-        chunked_data = []
-        for chunk in chunks:
-            # Find which page this chunk primarily belongs to
-            page_num = self._find_chunk_page(chunk, page_content_map)
-            
-            chunked_data.append({
-                "content": chunk,
-                "page_number": page_num
-            })
+        page_index = PageBoundaryIndex()
+        offset = -shift
+        for page_num in sorted(page_content_map):
+            page_index.add_page(page_num, offset)
+            offset += len(page_content_map[page_num]) + len(PAGE_SEPARATOR)
         
-        return chunked_data
+        spans = (chunker or self.chunker).split(text)
+        return list(self._attribute_chunks(spans, text, 0, page_index))
     
-    def _find_chunk_page(self, chunk: str, page_content_map: Dict[int, str]) -> int:
+    def chunk_pages(
+        self,
+        pages: Iterable[Tuple[int, str]],
+        page_content_map: Dict[int, str],
+        chunker: Optional[Chunker] = None
+    ) -> Iterator[Dict]:
         """
-        Helper: Determines which page a chunk belongs to
-        Uses substring matching to find the best page
+        Stage 3: CHUNKING (streaming)
+        Chunks a page stream as it arrives, filling page_content_map on the way
+        
+        Text is buffered until it spans a window of ~20 chunks, split, and all
+        but the last chunk are emitted; the last one is carried over since it
+        may continue on the next page.
+        
+        Offsets are positions in PAGE_SEPARATOR.join(all pages), and page
+        attribution is a binary search over the page start offsets.
+        
+        Args:
+            pages: Iterable of (page_number, page_text), e.g. iter_pages()
+            page_content_map: Dict to record page_number → page_text into
+            chunker: Defaults to the service's chunker
+            
+        Yields:
+            Chunk dictionaries with 'content', 'page_number' (first page),
+            'page_end' (last page), 'start_offset' and 'end_offset'
         """
-        # Take first 100 chars of chunk as identifier
-        chunk_identifier = chunk[:100]
+        chunker = chunker or self.chunker
+        window = chunker.approx_chars * 20
+        page_index = PageBoundaryIndex()
+        buffer_parts: List[str] = []
+        buffer_len = 0
+        buffer_offset = 0   # offset of the buffer's first char in the document
+        text_len = 0        # document length so far, including separators
         
-        for page_num, page_text in page_content_map.items():
-            if chunk_identifier in page_text:
-                return page_num
+        for page_num, page_text in pages:
+            page_content_map[page_num] = page_text
+            if page_index:
+                text_len += len(PAGE_SEPARATOR)
+            page_index.add_page(page_num, text_len)
+            text_len += len(page_text)
+            
+            buffer_parts.append(page_text)
+            buffer_len += len(page_text) + len(PAGE_SEPARATOR)
+            
+            if buffer_len < window:
+                continue
+            
+            buffer = PAGE_SEPARATOR.join(buffer_parts)
+            spans = chunker.split(buffer)
+            if not spans:
+                continue
+            
+            tail_start = spans[-1][0]
+            yield from self._attribute_chunks(spans[:-1], buffer, buffer_offset, page_index)
+            
+            buffer_parts = [buffer[tail_start:]]
+            buffer_len = len(buffer_parts[0])
+            buffer_offset += tail_start
         
-        # Default to page 1 if not found
-        return 1
+        buffer = PAGE_SEPARATOR.join(buffer_parts)
+        spans = chunker.split(buffer) if buffer.strip() else []
+        yield from self._attribute_chunks(spans, buffer, buffer_offset, page_index)
+    
+    def _attribute_chunks(
+        self,
+        spans: List[Span],
+        text: str,
+        base_offset: int,
+        page_index: "PageBoundaryIndex"
+    ) -> Iterator[Dict]:
+        """
+        Helper: Turns chunk spans of text into chunk dicts with the pages they span
+        
+        The chunker returns (start, end) positions, so no searching is needed.
+        """
+        for span_start, span_end in spans:
+            start = base_offset + span_start
+            end = base_offset + span_end
+            yield {
+                "content": text[span_start:span_end],
+                "page_number": page_index.page_at(start),
+                "page_end": page_index.page_at(end - 1),
+                "start_offset": start,
+                "end_offset": end
+            }
     
     def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
         Stage 3 (continued): EMBEDDING GENERATION
-        Generates vector embeddings using Gemini's text-embedding-004 model
+        Generates vector embeddings using Gemini's gemini-embedding-001 model
+        
+        Chunks are sent in batches (many chunks per request), several batches
+        run concurrently, and a failed batch is retried on its own.
         
         Args:
             texts: List of text chunks to embed
@@ -108,73 +385,305 @@ class PDFProcessingService:
         Returns:
             List of embeddings (each embedding is a list of 768 floats)
         """
-        embeddings = []
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        for indices, vectors in self.embed_chunks(texts):
+            for i, vector in zip(indices, vectors):
+                embeddings[i] = vector
+        return embeddings
+    
+    def embed_chunks(self, texts: List[str]) -> Iterator[Tuple[List[int], List[List[float]]]]:
+        """
+        Yields (indices, embeddings) as embeddings become available
         
-        for text in texts:
-            # Use Gemini's embedding model
-            result = self.client.models.embed_content(
-                model="gemini-embedding-001",
-                contents=text,
-                config=types.EmbedContentConfig(task_type="RETRIEVAL_DOCUMENT")
-            )
-            embeddings.append(result.embeddings[0].values)
+        Cached vectors come first, in one group. Only texts the cache has
+        never seen are sent to Gemini, each distinct text once, and their
+        vectors are cached as each batch returns.
+        """
+        engine = self.embedding_engine
+        cached = self.content_cache.get_embeddings(engine.model, engine.task_type, texts)
         
-        return embeddings
+        hit_indices = [i for i, vector in enumerate(cached) if vector is not None]
+        if hit_indices:
+            yield hit_indices, [cached[i] for i in hit_indices]
+        
+        # Group the misses by text so repeated chunks are embedded once
+        missing: Dict[str, List[int]] = {}
+        for i, vector in enumerate(cached):
+            if vector is None:
+                missing.setdefault(texts[i], []).append(i)
+        unique_texts = list(missing)
+        
+        for start, vectors in engine.embed_batches(unique_texts):
+            batch_texts = unique_texts[start:start + len(vectors)]
+            self.content_cache.put_embeddings(engine.model, engine.task_type, batch_texts, vectors)
+            
+            indices, batch_vectors = [], []
+            for text, vector in zip(batch_texts, vectors):
+                for i in missing[text]:
+                    indices.append(i)
+                    batch_vectors.append(vector)
+            yield indices, batch_vectors
     
-    async def process_pdf(
+    def _resume_checkpoint(self, supabase_client, document_id: str, document_key: str) -> IngestCheckpoint:
+        """
+        Helper: The document's checkpoint from an earlier run, or a fresh one
+
+        A checkpoint for other bytes, chunking settings or batch size can't
+        be matched up with the rows it stored, so those rows are deleted and
+        ingestion starts over.
+        """
+        batch_size = settings.DB_INSERT_BATCH_SIZE
+        result = supabase_client.table("documents") \
+            .select("ingest_checkpoint") \
+            .eq("id", document_id) \
+            .execute()
+        saved = result.data[0].get("ingest_checkpoint") if result.data else None
+        
+        if saved:
+            checkpoint = IngestCheckpoint.from_dict(saved)
+            if checkpoint.matches(document_key, batch_size):
+                checkpoint.error = None
+                return checkpoint
+            supabase_client.table("doc_chunks").delete().eq("document_id", document_id).execute()
+            self.checkpoints.clear_batches(document_id)
+        return IngestCheckpoint(document_key, batch_size)
+    
+    def _save_checkpoint(self, supabase_client, document_id: str, checkpoint: IngestCheckpoint) -> None:
+        """
+        Helper: Records progress on the document row
+        
+        Best effort: if this write is lost, the next run stores the batch
+        again, which the upsert makes harmless.
+        """
+        try:
+            supabase_client.table("documents").update({
+                "ingest_checkpoint": checkpoint.to_dict()
+            }).eq("id", document_id).execute()
+        except Exception:
+            pass
+    
+    def embed_and_store(
+        self,
+        document_id: str,
+        chunks_data: List[Dict],
+        checkpoint: IngestCheckpoint,
+        supabase_client,
+        report: Callable[[str, float], None]
+    ) -> np.ndarray:
+        """
+        Stage 3: EMBEDDING + STORAGE (checkpointed)
+        
+        Chunks are grouped into fixed batches of checkpoint.batch_size. A
+        batch stored by an earlier run is skipped; one embedded by an earlier
+        run is stored without calling Gemini. Every other chunk is embedded
+        (concurrently, see embed_chunks), and as soon as all of a batch's
+        vectors are in, they are checkpointed and the batch is upserted in
+        the background while later batches are embedded.
+        
+        Vectors are held in one float32 (chunks, dim) array, allocated once
+        the dimension is known, and written to doc_chunks as compact text
+        (see quantization_services).
+        
+        Returns:
+            One vector per chunk, in order (for the digest)
+        """
+        checkpoint.chunks_count = len(chunks_data)
+        vectors = np.zeros((len(chunks_data), 0), dtype=np.float32)
+        filled = np.zeros(len(chunks_data), dtype=bool)
+        
+        def put(rows, values) -> None:
+            nonlocal vectors
+            values = np.asarray(values, dtype=np.float32)
+            if values.size == 0:
+                return
+            if vectors.shape[1] == 0:
+                vectors = np.zeros((len(chunks_data), values.shape[-1]), dtype=np.float32)
+            vectors[rows] = values
+            filled[rows] = True
+        
+        for batch in range(checkpoint.batch_count):
+            chunk_range = checkpoint.batch_range(batch)
+            saved = self.checkpoints.load_embeddings(document_id, batch, len(chunk_range))
+            if saved is not None:
+                put(slice(chunk_range.start, chunk_range.stop), saved)
+                checkpoint.mark_embedded(batch)
+        
+        def batch_rows(batch: int) -> List[Dict]:
+            return [
+                {
+                    "document_id": document_id,
+                    "chunk_index": i,
+                    "content": chunks_data[i]["content"],
+                    **embedding_columns(vectors[i]),
+                    "page_number": chunks_data[i]["page_number"],
+                    "page_end": chunks_data[i]["page_end"]
+                }
+                for i in checkpoint.batch_range(batch)
+            ]
+        
+        def batch_written(batch: int) -> None:
+            checkpoint.mark_stored(batch)
+            self._save_checkpoint(supabase_client, document_id, checkpoint)
+        
+        # Vectors of batches stored by a worker that didn't leave its files
+        # here are embedded again (for the digest), but not stored again
+        missing = np.flatnonzero(~filled).tolist()
+        remaining = [0] * checkpoint.batch_count
+        for i in missing:
+            remaining[i // checkpoint.batch_size] += 1
+        done = len(chunks_data) - len(missing)
+        
+        with ChunkWriter(
+            supabase_client,
+            batch_size=checkpoint.batch_size,
+            upsert_on="document_id,chunk_index",
+            on_batch_written=batch_written
+        ) as writer:
+            for batch in range(checkpoint.batch_count):
+                if remaining[batch] == 0 and batch not in checkpoint.stored:
+                    writer.write_batch(batch_rows(batch), batch)
+            
+            # Embedding time is the time spent waiting on this stream; the
+            # stores it hands off are timed by the writer ("store")
+            embedded = TimedIterator(self.embed_chunks([chunks_data[i]["content"] for i in missing]), "embed")
+            for indices, embeddings in embedded:
+                rows = [missing[j] for j in indices]
+                put(rows, embeddings)
+                for i in rows:
+                    batch = i // checkpoint.batch_size
+                    remaining[batch] -= 1
+                    if remaining[batch] == 0:
+                        chunk_range = checkpoint.batch_range(batch)
+                        self.checkpoints.save_embeddings(
+                            document_id, batch, vectors[chunk_range.start:chunk_range.stop]
+                        )
+                        checkpoint.mark_embedded(batch)
+                        if batch not in checkpoint.stored:
+                            writer.write_batch(batch_rows(batch), batch)
+                done += len(indices)
+                report("embedding", 25 + 70 * done / max(1, len(chunks_data)))
+        
+        return vectors
+    
+    def process_pdf(
         self, 
-        file_bytes: bytes, 
+        source: Union[bytes, str], 
         document_id: UUID,
-        supabase_client
+        supabase_client,
+        progress: Optional[Callable[[str, float], None]] = None,
+        sha256: Optional[str] = None
     ) -> Dict:
         """
         ORCHESTRATOR: Manages the entire PDF processing pipeline
         
+        Blocking: runs on an ingestion worker thread (see job_services),
+        never directly on the event loop.
+        
+        Resumable: each stage is checkpointed (see checkpoint_services), and
+        a run for a document that failed before picks up after its last
+        stored batch. Running it again never duplicates doc_chunks rows.
+        
         Flow:
-        1. Extract text from PDF
+        1. Extract text from PDF and chunk it (streamed, see chunk_pages),
+           unless an earlier run checkpointed the chunks or this exact PDF
+           is in the content cache
         2. Update document record with raw_text
-        3. Chunk the text
-        4. Generate embeddings for each chunk
-        5. Store chunks + embeddings in doc_chunks table
+        3. Generate embeddings in batches for chunks not already embedded
+        4. Upsert chunks + embeddings into doc_chunks (overlapping step 3),
+           skipping batches an earlier run stored
+        5. Build the document digest from those embeddings, and mark the
+           document completed with its chunk_count
         
         Args:
-            file_bytes: Raw PDF content
+            source: Path to the PDF on disk (read through a memory map, see
+                open_pdf), or raw PDF bytes
             document_id: UUID of the document record
             supabase_client: Supabase client for DB operations
+            progress: Optional callback(stage, percent) for status polling
+            sha256: Hex digest of the PDF, if already known (spool_upload
+                hashes while streaming the upload to disk)
             
         Returns:
             Dict with processing results
         """
+        report = progress or (lambda stage, percent: None)
+        doc_id = str(document_id)
+        checkpoint: Optional[IngestCheckpoint] = None
+        started = time.perf_counter()
+        
         try:
-            # Stage 2: Extract text
-            raw_text, page_content_map = self.extract_text_from_pdf(file_bytes)
+            # Same bytes + same chunking settings → same text and chunks
+            if sha256 is None:
+                sha256 = file_hash(source) if isinstance(source, str) else content_hash(source)
+            document_key = f"{sha256}:{self.chunking_policy.cache_key}"
+            self.checkpoints.save_source(doc_id, source)
+            self.checkpoints.prune()
+            checkpoint = self._resume_checkpoint(supabase_client, doc_id, document_key)
+            
+            document = self.checkpoints.load_document(doc_id, document_key)
+            chunks_source = "checkpoint"
+            if document is None:
+                document = self.content_cache.get_document(document_key)
+                chunks_source = "cache"
+                if document:
+                    self.checkpoints.save_document(doc_id, document_key, document)
+            
+            if document:
+                raw_text = document["raw_text"]
+                chunks_data = document["chunks"]
+            else:
+                # Stage 2-3: Extract and chunk as a stream, so chunking runs
+                # while worker processes are still extracting later pages
+                # Chunk size for this document follows from its length
+                # (timed apart: chunking is the stream's time minus extraction's)
+                chunks_source = "extracted"
+                chunk_started = time.perf_counter()
+                chunker = self.chunking_policy.chunker(count_pages(source))
+                page_content_map: Dict[int, str] = {}
+                pages = TimedIterator(self.iter_pages(source), "extract")
+                chunks_data = list(self.chunk_pages(pages, page_content_map, chunker))
+                record_stage("chunk", time.perf_counter() - chunk_started - pages.elapsed)
+                raw_text = PAGE_SEPARATOR.join(
+                    page_content_map[page_num] for page_num in sorted(page_content_map)
+                ).strip()
+                document = {"raw_text": raw_text, "chunks": chunks_data}
+                self.content_cache.put_document(document_key, document)
+                self.checkpoints.save_document(doc_id, document_key, document)
+            checkpoint.chunks_count = len(chunks_data)
+            INGEST_CHUNKS.labels(chunks_source).inc(len(chunks_data))
+            
+            # Keyword index for hybrid retrieval (local, see lexical_services)
+            lexical_index.put(document_id, chunks_data)
             
-            # Update document with raw_text
+            # Update document with raw_text (not echoed back: the row also
+            # carries raw_text_utf8, which migration 006's trigger sets from it)
             supabase_client.table("documents").update({
                 "raw_text": raw_text,
-                "status": "extracted"
-            }).eq("id", str(document_id)).execute()
+                "status": "extracted",
+                "ingest_checkpoint": checkpoint.to_dict()
+            }, returning=ReturnMethod.minimal).eq("id", doc_id).execute()
+            report("chunked", 25)
             
-            # Stage 3: Chunk text
-            chunks_data = self.chunk_text(raw_text, page_content_map)
+            # Stage 3: Generate embeddings and store chunks
+            # Each embedded batch is handed to the writer, which upserts it
+            # (multi-row) in the background while the next batch is embedded
+            chunk_vectors = self.embed_and_store(doc_id, chunks_data, checkpoint, supabase_client, report)
             
-            # Stage 3: Generate embeddings
-            chunk_texts = [chunk["content"] for chunk in chunks_data]
-            embeddings = self.generate_embeddings(chunk_texts)
-            
-            # Store chunks with embeddings in database
-            for i, chunk_data in enumerate(chunks_data):
-                supabase_client.table("doc_chunks").insert({
-                    "document_id": str(document_id),
-                    "content": chunk_data["content"],
-                    "embedding": embeddings[i],  # Supabase will handle vector type
-                    "page_number": chunk_data["page_number"]
-                }).execute()
+            # Stage 4: Representative digest for generate-outline (see digest_services)
+            with span("digest"):
+                digest = build_digest(chunks_data, chunk_vectors)
             
             # Update document status to completed
             supabase_client.table("documents").update({
-                "status": "completed"
-            }).eq("id", str(document_id)).execute()
+                "status": "completed",
+                "chunk_count": len(chunks_data),
+                "digest": digest,
+                "ingest_checkpoint": None
+            }).eq("id", doc_id).execute()
+            self.checkpoints.clear(doc_id)
+            vector_index.invalidate(document_id)
+            INGEST_DOCUMENTS.labels("completed").inc()
+            record_stage("ingest", time.perf_counter() - started)
             
             return {
                 "success": True,
@@ -183,12 +692,33 @@ class PDFProcessingService:
             }
             
         except Exception as e:
-            # Update status to failed
-            supabase_client.table("documents").update({
-                "status": "failed"
-            }).eq("id", str(document_id)).execute()
+            # Update status to failed; the checkpoint says where a retry resumes
+            failure = {"status": "failed"}
+            if checkpoint is not None:
+                checkpoint.error = str(e)
+                failure["ingest_checkpoint"] = checkpoint.to_dict()
+            supabase_client.table("documents").update(failure).eq("id", doc_id).execute()
+            INGEST_DOCUMENTS.labels("failed").inc()
             
             raise Exception(f"PDF processing failed: {str(e)}")
+    
+    def retry_pdf(
+        self,
+        document_id: UUID,
+        supabase_client,
+        progress: Optional[Callable[[str, float], None]] = None
+    ) -> Dict:
+        """
+        Runs process_pdf again on the upload saved by an earlier run
+
+        Raises:
+            CheckpointMissing: No saved upload (completed, expired, or
+                ingested on another worker)
+        """
+        if not self.checkpoints.has_source(str(document_id)):
+            raise CheckpointMissing(f"No saved upload for document {document_id}")
+        source = self.checkpoints.source_path(str(document_id))
+        return self.process_pdf(source, document_id, supabase_client, progress)
 
 # Create singleton instance
 pdf_service = PDFProcessingService()
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""
+Quantization Service - Compact embedding representations
+
+A 768-dimension embedding used to travel through ingestion as a list of
+Python floats (~25 KB in memory, ~10 KB as JSON in the insert payload).
+Here it is:
+- a float32 NumPy row in memory (3 KB)
+- a compact pgvector text literal for doc_chunks.embedding (full
+  precision, what match_doc_chunks searches)
+- optionally float16 (1.5 KB) or int8 plus a scale (772 bytes) in
+  doc_chunks.embedding_q, for the in-process index (RETRIEVAL_BACKEND=local)
+
+int8 is symmetric and per vector: scale = max|x| / 127, code = round(x /
+scale), so x ≈ code * scale. Cosine rankings survive it well; the few
+neighbours it swaps are put back in order by re-scoring the top candidates
+at higher precision (see vector_services).
+
+Wire format of embedding_q (text, so PostgREST needs no bytea handling):
+"f16:<base64>" or "i8:<base64>", where an int8 payload starts with its
+scale as a little-endian float32.
+"""
+
+import base64
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+DTYPES = ("float32", "float16", "int8")
+
+_PREFIXES = {"float16": "f16", "int8": "i8"}
+_DTYPES_BY_PREFIX = {prefix: dtype for dtype, prefix in _PREFIXES.items()}
+# printf formats by significant digits, for pgvector_literal
+_FORMATS = np.array([f"%.{d}g" for d in range(10)])
+
+# Rows per block when upcasting a low-precision matrix for a product, so a
+# query never allocates a float32 copy of the whole document
+_BLOCK_ROWS = 8192
+
+
+def quantize_int8(matrix: np.ndarray):
+    """(n, dim) floats → (int8 codes, float32 scale per row)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127.0 if matrix.size else np.zeros(len(matrix), np.float32)
+    scales = scales.astype(np.float32)
+    safe = np.where(scales == 0, 1.0, scales)[:, None]
+    codes = np.clip(np.rint(matrix / safe), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+class QuantizedMatrix:
+    """
+    A (n, dim) matrix held as float32, float16, or int8 codes with one scale
+    per row. scores() multiplies in float32 block by block.
+    """
+
+    def __init__(self, matrix: np.ndarray, dtype: str = "float32"):
+        dtype = np.dtype(dtype).name
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        self.dtype = dtype
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if dtype == "int8":
+            self.codes, self.scales = quantize_int8(matrix)
+        else:
+            self.codes, self.scales = np.ascontiguousarray(matrix, dtype=dtype), None
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """matrix @ query in float32 (NumPy has no fast float16/int8 matmul)."""
+        query = np.asarray(query, dtype=np.float32)
+        if self.dtype == "float32":
+            return self.codes @ query
+        out = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), _BLOCK_ROWS):
+            block = slice(start, start + _BLOCK_ROWS)
+            out[block] = self.codes[block].astype(np.float32) @ query
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+
+def encode_vector(vector, dtype: str) -> str:
+    """One embedding → "f16:..." / "i8:..." text for doc_chunks.embedding_q."""
+    vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+    if dtype == "float16":
+        payload = vector.astype("<f2").tobytes()
+    elif dtype == "int8":
+        codes, scales = quantize_int8(vector)
+        payload = scales.astype("<f4").tobytes() + codes.tobytes()
+    else:
+        raise ValueError(f"Unsupported compact embedding dtype: {dtype}")
+    return f"{_PREFIXES[dtype]}:{base64.b64encode(payload).decode('ascii')}"
+
+
+def decode_vector(text: str) -> np.ndarray:
+    """Inverse of encode_vector, dequantized to float32."""
+    prefix, _, encoded = text.partition(":")
+    dtype = _DTYPES_BY_PREFIX.get(prefix)
+    if dtype is None:
+        raise ValueError(f"Unknown embedding encoding: {prefix!r}")
+    payload = base64.b64decode(encoded)
+    if dtype == "float16":
+        return np.frombuffer(payload, dtype="<f2").astype(np.float32)
+    scale = np.frombuffer(payload[:4], dtype="<f4")[0]
+    return np.frombuffer(payload[4:], dtype=np.int8).astype(np.float32) * scale
+
+
+def encoded_dtype(text: str) -> str:
+    """The dtype an embedding_q value was encoded with."""
+    return _DTYPES_BY_PREFIX.get(text.partition(":")[0], "float32")
+
+
+def pgvector_literal(vector) -> str:
+    """
+    "[x,y,...]" text for a pgvector column: each value with the fewest
+    significant digits that still read back as the same float32, and no
+    ", " separators (about 8% smaller than the JSON list it replaces).
+    """
+    vector = np.asarray(vector, dtype=np.float32)
+    values = vector.astype(np.float64)
+    magnitude = np.floor(np.log10(np.abs(np.where(values == 0, 1.0, values))))
+    digits = np.full(len(values), 9)
+    for d in (8, 7, 6, 5, 4):
+        step = 10.0 ** (magnitude - (d - 1))
+        digits[(np.round(values / step) * step).astype(np.float32) == vector] = d
+    return "[" + ",".join(_FORMATS[digits].tolist()) % tuple(values.tolist()) + "]"
+
+
+def embedding_columns(
+    vector,
+    compact_dtype: Optional[str] = None,
+    store_full: Optional[bool] = None
+) -> Dict[str, str]:
+    """
+    The embedding columns of one doc_chunks row, per EMBEDDING_COMPACT_DTYPE
+    and EMBEDDING_STORE_FULL. The rpc backend searches the full-precision
+    column, so it is always written unless retrieval is local.
+    """
+    compact_dtype = settings.EMBEDDING_COMPACT_DTYPE if compact_dtype is None else compact_dtype
+    if store_full is None:
+        store_full = settings.EMBEDDING_STORE_FULL or settings.RETRIEVAL_BACKEND != "local"
+    compact = compact_dtype in _PREFIXES
+
+    columns = {}
+    if store_full or not compact:
+        columns["embedding"] = pgvector_literal(vector)
+    if compact:
+        columns["embedding_q"] = encode_vector(vector, compact_dtype)
+    return columns
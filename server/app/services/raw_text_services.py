@@ -0,0 +1,151 @@
+"""
+Raw Text Service - Streams a document's extracted text in byte ranges
+
+documents.raw_text can be megabytes, and GET /documents/{id} used to
+return it inline. GET /documents/{id}/raw_text serves it on its own.
+
+Flow:
+1. parse_range: "Range: bytes=..." → (start, end) bounds, checked against
+   the text's size once it is known
+2. read_slice: The document_raw_text_slice RPC (migration 006) returns
+   the text's size and one slice of its UTF-8 bytes, so only the
+   requested part leaves Postgres. It reads documents.raw_text_utf8,
+   which a trigger sets from raw_text on every insert or raw_text update
+3. RawTextStream: Reads the first slice up front (it also gives the size,
+   and a missing document is a 404 before any byte is sent), then the
+   rest of the range one slice at a time while the response streams
+
+Only single ranges are served; a multi-range or malformed header is
+ignored and the whole text is sent (RFC 9110 allows that).
+"""
+
+import base64
+from typing import AsyncIterator, Optional, Tuple
+
+from app.core.config import settings
+from app.core.executors import run_db
+
+
+class RangeNotSatisfiable(Exception):
+    def __init__(self, total: int):
+        self.total = total
+        super().__init__(f"Range not satisfiable (text is {total} bytes)")
+
+
+def parse_range(header: Optional[str]) -> Optional[Tuple[Optional[int], Optional[int]]]:
+    """
+    "bytes=0-99" → (0, 99), "bytes=100-" → (100, None), "bytes=-500" →
+    (None, 500) (the last 500 bytes); None for no, malformed or multiple
+    ranges.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.strip().partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        start = int(first) if first.strip() else None
+        end = int(last) if last.strip() else None
+    except ValueError:
+        return None
+    if start is None and end is None or (start is not None and start < 0) or (end is not None and end < 0):
+        return None
+    if start is not None and end is not None and end < start:
+        return None
+    return start, end
+
+
+def resolve_range(bounds: Tuple[Optional[int], Optional[int]], total: int) -> Tuple[int, int]:
+    """parse_range bounds → inclusive (start, end) within a text of total bytes."""
+    start, end = bounds
+    if start is None:
+        # Suffix: the last `end` bytes
+        if end == 0 or total == 0:
+            raise RangeNotSatisfiable(total)
+        return max(0, total - end), total - 1
+    if start >= total:
+        raise RangeNotSatisfiable(total)
+    return start, total - 1 if end is None else min(end, total - 1)
+
+
+async def read_slice(client, doc_id: str, user_id: str, start: int, length: int) -> Tuple[int, bytes]:
+    """
+    (total bytes of the text, bytes [start, start + length)).
+
+    Raises:
+        LookupError: if the document does not exist or is not the user's
+    """
+    result = await run_db(client.rpc("document_raw_text_slice", {
+        "p_document_id": str(doc_id),
+        "p_user_id": str(user_id),
+        "p_start": start,
+        "p_length": length
+    }).execute)
+    if not result.data:
+        raise LookupError("Document not found")
+    return int(result.data["total"]), base64.b64decode(result.data["data"] or "")
+
+
+class RawTextStream:
+    """
+    The bytes of one document's raw_text in [start, end], read slice by
+    slice. open() must be awaited before iterating; afterwards total,
+    start and end describe what will be sent.
+    """
+
+    def __init__(
+        self,
+        client,
+        doc_id: str,
+        user_id: str,
+        bounds: Optional[Tuple[Optional[int], Optional[int]]] = None,
+        slice_bytes: int = settings.RAW_TEXT_SLICE_BYTES
+    ):
+        self.client = client
+        self.doc_id = doc_id
+        self.user_id = user_id
+        self.bounds = bounds
+        self.slice_bytes = max(1, slice_bytes)
+        self.total = 0
+        self.start = 0
+        self.end = -1
+        self._first = b""
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start + 1
+
+    async def open(self) -> None:
+        """Reads the first slice. Raises LookupError or RangeNotSatisfiable."""
+        # A suffix range needs the size first; any other range starts at a known offset
+        known_start = 0 if self.bounds is None else self.bounds[0]
+        if known_start is None:
+            self.total, _ = await read_slice(self.client, self.doc_id, self.user_id, 0, 0)
+            self.start, self.end = resolve_range(self.bounds, self.total)
+        else:
+            want = self.slice_bytes
+            if self.bounds is not None and self.bounds[1] is not None:
+                want = min(want, self.bounds[1] - known_start + 1)
+            self.total, self._first = await read_slice(self.client, self.doc_id, self.user_id, known_start, want)
+            if self.bounds is None:
+                self.start, self.end = 0, self.total - 1
+            else:
+                self.start, self.end = resolve_range(self.bounds, self.total)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        position = self.start
+        if self._first:
+            data, self._first = self._first[:self.length], b""
+            yield data
+            position += len(data)
+        while position <= self.end:
+            length = min(self.slice_bytes, self.end - position + 1)
+            _, data = await read_slice(self.client, self.doc_id, self.user_id, position, length)
+            if not data:
+                # The text shrank (the document was re-ingested) mid-stream
+                return
+            yield data
+            position += len(data)
@@ -0,0 +1,203 @@
+"""
+Storage Service - Bulk reads and writes of chunk rows in Supabase
+
+Flow (ChunkWriter):
+1. add(rows): Buffers rows until a full batch is ready
+2. Each full batch becomes ONE multi-row insert, sent on a background writer
+   so the caller can keep embedding the next batch meanwhile
+3. A failed batch is retried with backoff on its own
+4. flush(): Sends the remainder and waits for every batch to land
+
+With upsert_on set, batches are upserts on those columns, so writing a batch
+twice (a retried ingestion) leaves one copy of each row. write_batch() sends
+rows as one numbered batch of their own, and on_batch_written(batch_index)
+is called once a batch has landed.
+
+fetch_chunks() reads all of a document's chunks back, a page at a time,
+for the in-process retrieval indexes.
+"""
+
+import random
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.executors import run_db
+from app.core.metrics import REGISTRY, span
+
+# Rows per request when reading (PostgREST caps responses at 1000 by default)
+FETCH_PAGE_SIZE = 1000
+
+ROWS_WRITTEN = REGISTRY.counter(
+    "storage_rows_written_total", "Rows written by ChunkWriter batches", ("table",)
+)
+WRITE_RETRIES = REGISTRY.counter(
+    "storage_write_retries_total", "ChunkWriter batch writes retried after an error", ("table",)
+)
+
+
+async def fetch_chunks(supabase_client, doc_id: str, columns: str, table: str = "doc_chunks") -> List[Dict]:
+    """All chunk rows of a document, ordered by id (stable across pages)."""
+    rows: List[Dict] = []
+    while True:
+        result = await run_db(supabase_client.table(table) \
+            .select(columns) \
+            .eq("document_id", str(doc_id)) \
+            .order("id") \
+            .range(len(rows), len(rows) + FETCH_PAGE_SIZE - 1) \
+            .execute)
+        rows.extend(result.data)
+        if len(result.data) < FETCH_PAGE_SIZE:
+            return rows
+
+
+class ChunkWriteError(Exception):
+    """Raised when a batch of rows still fails after all of its retries."""
+
+    def __init__(self, batch_index: int, rows_count: int, cause: Exception):
+        self.batch_index = batch_index
+        self.rows_count = rows_count
+        self.cause = cause
+        super().__init__(
+            f"Insert of batch {batch_index} ({rows_count} rows) failed: {cause}"
+        )
+
+
+class ChunkWriter:
+    """
+    Streams rows into a table in multi-row insert batches.
+
+    Usage:
+        with ChunkWriter(supabase_client) as writer:
+            for rows in produce_rows():
+                writer.add(rows)
+        # leaving the block flushes and waits; errors are raised here
+    """
+
+    def __init__(
+        self,
+        supabase_client,
+        table: str = "doc_chunks",
+        batch_size: int = settings.DB_INSERT_BATCH_SIZE,
+        concurrency: int = settings.DB_WRITE_CONCURRENCY,
+        max_retries: int = settings.DB_WRITE_MAX_RETRIES,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        upsert_on: Optional[str] = None,
+        on_batch_written: Optional[Callable[[int], None]] = None
+    ):
+        self.supabase_client = supabase_client
+        self.table = table
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.upsert_on = upsert_on
+        self.on_batch_written = on_batch_written
+        self.rows_written = 0
+
+        self._buffer: List[Dict] = []
+        self._futures: List[Future] = []
+        self._batch_index = 0
+        # Writes happen off the caller's thread so they overlap with embedding
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, concurrency),
+            thread_name_prefix="chunk-writer"
+        )
+
+    def __enter__(self) -> "ChunkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.flush()
+        else:
+            # The pipeline already failed: drop queued batches, keep its error
+            self.close(cancel=True)
+
+    def _insert_batch(self, batch_index: int, rows: List[Dict]) -> int:
+        attempt = 0
+        # One "store" timing per batch, retries and backoff included
+        with span("store"):
+            while True:
+                try:
+                    query = self.supabase_client.table(self.table)
+                    if self.upsert_on:
+                        query.upsert(rows, on_conflict=self.upsert_on).execute()
+                    else:
+                        query.insert(rows).execute()
+                    break
+                except Exception as e:
+                    if attempt >= self.max_retries:
+                        raise ChunkWriteError(batch_index, len(rows), e) from e
+
+                    WRITE_RETRIES.labels(self.table).inc()
+                    delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                    time.sleep(delay * random.uniform(0.5, 1.0))
+                    attempt += 1
+        ROWS_WRITTEN.labels(self.table).inc(len(rows))
+
+        if self.on_batch_written is not None:
+            self.on_batch_written(batch_index)
+        return len(rows)
+
+    def _submit(self, rows: List[Dict], batch_index: Optional[int] = None) -> None:
+        if batch_index is None:
+            batch_index = self._batch_index
+            self._batch_index += 1
+        future = self._executor.submit(self._insert_batch, batch_index, rows)
+        self._futures.append(future)
+
+    def _collect_done(self) -> None:
+        """Surfaces failures early and keeps the futures list short."""
+        still_pending = []
+        for future in self._futures:
+            if future.done():
+                self.rows_written += future.result()
+            else:
+                still_pending.append(future)
+        self._futures = still_pending
+
+    def add(self, rows: List[Dict]) -> None:
+        """
+        Buffers rows and sends every full batch to the background writer
+        """
+        self._buffer.extend(rows)
+
+        while len(self._buffer) >= self.batch_size:
+            batch = self._buffer[:self.batch_size]
+            self._buffer = self._buffer[self.batch_size:]
+            self._submit(batch)
+
+        self._collect_done()
+
+    def write_batch(self, rows: List[Dict], batch_index: int) -> None:
+        """
+        Sends rows as one batch, numbered batch_index, without buffering
+        """
+        self._submit(rows, batch_index)
+        self._collect_done()
+
+    def flush(self) -> int:
+        """
+        Writes any buffered rows and waits for all batches
+
+        Returns:
+            Total number of rows written by this writer
+        """
+        if self._buffer:
+            self._submit(self._buffer)
+            self._buffer = []
+
+        try:
+            for future in self._futures:
+                self.rows_written += future.result()
+            self._futures = []
+        finally:
+            self.close(cancel=True)
+
+        return self.rows_written
+
+    def close(self, cancel: bool = False) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
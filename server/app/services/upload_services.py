@@ -0,0 +1,136 @@
+"""
+Upload Service - Streams uploaded PDFs to disk instead of into memory
+
+upload_pdf used to `await file.read()` the whole PDF, the queued job kept
+those bytes alive until a worker got to it, and extraction wrapped them in
+a BytesIO: under concurrent large uploads every worker held several copies
+of each PDF in RAM.
+
+Flow:
+1. BodySizeLimit (ASGI middleware): Answers 413 as soon as an upload's
+   Content-Length, or the bytes received so far, exceed UPLOAD_MAX_MB
+2. spool_upload(): Copies the UploadFile (Starlette has already spooled it
+   to a temp file) to its destination in UPLOAD_CHUNK_BYTES pieces, hashing
+   (SHA-256) and counting on the way; the file appears only when complete
+3. The pipeline reads the file through a memory map (see pdf_services.open_pdf)
+"""
+
+import hashlib
+import os
+import tempfile
+from typing import NamedTuple, Optional, Sequence
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+# Multipart framing around the file (boundaries, part headers, small fields)
+MULTIPART_SLACK_BYTES = 64 * 1024
+
+
+def max_upload_bytes() -> int:
+    return int(settings.UPLOAD_MAX_MB * 1024 * 1024)
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the size limit while being spooled."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        super().__init__(f"File is larger than the {max_bytes / (1024 * 1024):g} MB limit")
+
+
+class SpooledUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+async def spool_upload(
+    file: UploadFile,
+    path: str,
+    max_bytes: Optional[int] = None,
+    chunk_size: int = settings.UPLOAD_CHUNK_BYTES
+) -> SpooledUpload:
+    """
+    Streams an upload to path, never holding more than one chunk in memory
+
+    Hashing and disk writes run off the event loop. The data goes to a
+    temp file next to path and is renamed into place at the end, so a
+    rejected or interrupted upload leaves nothing behind.
+
+    Raises:
+        UploadTooLarge: the upload exceeds max_bytes (default UPLOAD_MAX_MB)
+    """
+    max_bytes = max_upload_bytes() if max_bytes is None else max_bytes
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".upload.")
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        with os.fdopen(fd, "wb") as out:
+            def write(chunk: bytes) -> None:
+                digest.update(chunk)
+                out.write(chunk)
+
+            while chunk := await file.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                await run_in_threadpool(write, chunk)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        try:
+            os.rmdir(directory)  # only if nothing else is in it
+        except OSError:
+            pass
+        raise
+
+    return SpooledUpload(path, size, digest.hexdigest())
+
+
+class BodySizeLimit:
+    """
+    ASGI middleware: 413 for request bodies over max_bytes on the given path
+    prefixes, decided from Content-Length up front, or while the body is
+    still arriving (before the multipart parser has spooled all of it).
+    """
+
+    def __init__(self, app, max_bytes: int, paths: Sequence[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = tuple(paths)
+
+    def _too_large(self) -> str:
+        return f"Request body is larger than {self.max_bytes} bytes"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse({"detail": self._too_large()}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI re-raises HTTPExceptions from body parsing
+                    raise HTTPException(status_code=413, detail=self._too_large())
+            return message
+
+        await self.app(scope, limited_receive, send)
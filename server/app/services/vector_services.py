@@ -0,0 +1,276 @@
+"""
+Vector Service - In-process retrieval over a document's chunk embeddings
+
+An alternative to the match_doc_chunks RPC (RETRIEVAL_BACKEND=local).
+
+Flow:
+1. load: The first query for a document pulls its chunks (id, content,
+   page_number, embedding) from doc_chunks, page by page
+   (or, where set, the compact embedding_q, see quantization_services)
+2. The embeddings become one contiguous, L2-normalized NumPy matrix
+   (float32, float16 to halve memory, or int8 + a scale per row to quarter it)
+3. search: Cosine similarity for every chunk is one matrix-vector product;
+   the top match_count above match_threshold are returned, shaped like the
+   RPC's rows. Below float32, the best match_count * rescore_factor are
+   re-scored against full-precision vectors kept in a temporary file
+   (memory-mapped, so they cost page cache rather than index budget)
+4. Documents are kept in an LRU and evicted once the index grows past its
+   memory budget
+
+Chunks of a document only change when it is (re)ingested, which calls
+invalidate(). Another process ingesting the same document is not seen
+until this process evicts it or restarts.
+"""
+
+import asyncio
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.quantization_services import QuantizedMatrix, decode_vector, encoded_dtype
+from app.services.storage_services import fetch_chunks
+
+# Precision order, for deciding whether re-scoring can improve on the index
+_PRECISION = {"int8": 0, "float16": 1, "float32": 2}
+
+
+def parse_embedding(value) -> np.ndarray:
+    """
+    pgvector columns come back from PostgREST as text ("[0.1,0.2,...]");
+    rows written by this app in-process may still hold plain lists.
+    """
+    if isinstance(value, str):
+        return np.array(value.strip("[]").split(","), dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def row_embedding(row: Dict):
+    """A row's embedding and its precision: embedding_q if set, else embedding."""
+    compact = row.get("embedding_q")
+    if compact:
+        return decode_vector(compact), encoded_dtype(compact)
+    return parse_embedding(row["embedding"]), "float32"
+
+
+class DocumentVectors:
+    """
+    One document's chunks: row metadata plus a normalized (n, dim) matrix,
+    and the rows' own, more precise vectors for re-scoring when the matrix
+    is lossier than them.
+    """
+
+    def __init__(self, rows: List[Dict], dtype: str = "float32", rescore_factor: int = 1):
+        self.ids = [row["id"] for row in rows]
+        self.contents = [row["content"] for row in rows]
+        self.page_numbers = [row.get("page_number") for row in rows]
+
+        embeddings = [row_embedding(row) for row in rows]
+        matrix = np.vstack([vector for vector, _ in embeddings]) if rows \
+            else np.zeros((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms
+        self.matrix = QuantizedMatrix(matrix, dtype)
+
+        # Re-scoring only pays when the rows are more precise than the index
+        source = min((_PRECISION[d] for _, d in embeddings), default=_PRECISION["float32"])
+        self.rescore_factor = rescore_factor
+        self.exact = None
+        if rows and rescore_factor > 1 and source > _PRECISION[self.matrix.dtype]:
+            self._file = tempfile.TemporaryFile(prefix="vectors-")
+            self.exact = np.memmap(self._file, dtype=np.float32, mode="w+", shape=matrix.shape)
+            self.exact[:] = matrix
+            self.exact.flush()
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held: the matrix plus chunk text."""
+        return self.matrix.nbytes + sum(len(c) for c in self.contents)
+
+    @property
+    def rescore_bytes(self) -> int:
+        """Vectors on disk for re-scoring."""
+        return self.exact.nbytes if self.exact is not None else 0
+
+    def search(self, query_embedding, match_threshold: float, match_count: int) -> List[Dict]:
+        """
+        Same semantics as match_doc_chunks: cosine similarity strictly above
+        match_threshold, best first, at most match_count rows.
+        """
+        if not self.ids or match_count <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        query = query / norm
+        similarities = self.matrix.scores(query)
+
+        # Top-k without sorting every chunk
+        k = min(match_count, len(self.ids))
+        if self.exact is None:
+            top = top_k(similarities, k)
+            scores = similarities[top]
+        else:
+            # Oversample at index precision, then order the candidates on
+            # the exact vectors (sorted indices: sequential memory-map reads)
+            candidates = np.sort(top_k(similarities, min(k * self.rescore_factor, len(self.ids))))
+            exact = self.exact[candidates] @ query
+            best = top_k(exact, k)
+            top, scores = candidates[best], exact[best]
+
+        return [
+            {
+                "id": self.ids[i],
+                "content": self.contents[i],
+                "page_number": self.page_numbers[i],
+                "similarity": float(score),
+            }
+            for i, score in zip(top, scores)
+            if score > match_threshold
+        ]
+
+
+def top_k(similarities: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest values, best first."""
+    top = np.argpartition(-similarities, k - 1)[:k]
+    return top[np.argsort(-similarities[top], kind="stable")]
+
+
+class VectorIndex:
+    """
+    LRU of DocumentVectors bounded by max_bytes. Concurrent first queries
+    for the same document share one load.
+    """
+
+    def __init__(self, max_bytes: int, dtype: str = "float32", supabase_client=None, rescore_factor: int = 1):
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype).name
+        self.rescore_factor = rescore_factor
+        self.supabase_client = supabase_client
+        self.loads = 0
+        self.evictions = 0
+        self._documents: "OrderedDict[str, DocumentVectors]" = OrderedDict()
+        self._bytes = 0
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self.supabase_client is None:
+            from app.core.security import supabase
+            return supabase
+        return self.supabase_client
+
+    def _get(self, doc_id: str) -> Optional[DocumentVectors]:
+        with self._lock:
+            vectors = self._documents.get(doc_id)
+            if vectors is not None:
+                self._documents.move_to_end(doc_id)
+            return vectors
+
+    def _put(self, doc_id: str, vectors: DocumentVectors) -> None:
+        with self._lock:
+            old = self._documents.pop(doc_id, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._documents[doc_id] = vectors
+            self._bytes += vectors.nbytes
+            # Always keep the document just loaded, even if it alone is over budget
+            while self._bytes > self.max_bytes and len(self._documents) > 1:
+                _, evicted = self._documents.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    async def get_document(self, doc_id: str) -> DocumentVectors:
+        doc_id = str(doc_id)
+        vectors = self._get(doc_id)
+        if vectors is not None:
+            return vectors
+
+        future = self._loading.get(doc_id)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[doc_id] = future
+        try:
+            rows = await self._fetch_rows(doc_id)
+            vectors = DocumentVectors(rows, self.dtype, self.rescore_factor)
+            self.loads += 1
+            # A document with no chunks yet may still be ingesting; don't pin that
+            if rows:
+                self._put(doc_id, vectors)
+            future.set_result(vectors)
+            return vectors
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure nobody else awaited isn't logged
+            future.exception()
+            raise
+        finally:
+            self._loading.pop(doc_id, None)
+
+    async def _fetch_rows(self, doc_id: str) -> List[Dict]:
+        """
+        Chunk rows with their embeddings. With compact storage on, only
+        embedding_q is pulled, plus embedding for rows ingested before it
+        was turned on. Re-scoring then works from those compact vectors, so
+        it needs them more precise than the index (e.g. float16 stored, int8
+        in memory).
+        """
+        if settings.EMBEDDING_COMPACT_DTYPE not in ("float16", "int8"):
+            return await fetch_chunks(self.client, doc_id, "id, content, page_number, embedding")
+
+        rows = await fetch_chunks(self.client, doc_id, "id, content, page_number, embedding_q")
+        if any(not row.get("embedding_q") for row in rows):
+            full = {
+                row["id"]: row["embedding"]
+                for row in await fetch_chunks(self.client, doc_id, "id, embedding")
+            }
+            for row in rows:
+                if not row.get("embedding_q"):
+                    row["embedding"] = full.get(row["id"])
+        return rows
+
+    async def search(
+        self,
+        doc_id: str,
+        query_embedding,
+        match_threshold: float,
+        match_count: int
+    ) -> List[Dict]:
+        vectors = await self.get_document(doc_id)
+        return vectors.search(query_embedding, match_threshold, match_count)
+
+    def invalidate(self, doc_id) -> None:
+        """Drops a document so the next query reloads it (call after (re)ingesting)."""
+        with self._lock:
+            vectors = self._documents.pop(str(doc_id), None)
+            if vectors is not None:
+                self._bytes -= vectors.nbytes
+
+    def stats(self) -> Dict:
+        return {
+            "documents": len(self._documents),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "dtype": self.dtype,
+            "rescore_factor": self.rescore_factor,
+            "rescore_bytes": sum(v.rescore_bytes for v in list(self._documents.values())),
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+
+# Create singleton instance
+vector_index = VectorIndex(
+    max_bytes=int(settings.VECTOR_INDEX_MAX_MB * 1024 * 1024),
+    dtype=settings.VECTOR_INDEX_DTYPE,
+    rescore_factor=settings.VECTOR_RESCORE_FACTOR
+)
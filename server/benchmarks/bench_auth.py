@@ -0,0 +1,223 @@
+"""
+Benchmark: per-request auth overhead, auth server round-trip vs local verification
+
+Opening the dashboard is three authenticated GETs (documents, essays, one
+essay) sent together. The auth server is a local stand-in charging
+--auth-latency per get_user call; the project's JWKS is served by a local
+HTTP server. Scenarios (core/tokens.TokenVerifier):
+
+    remote        - supabase.auth.get_user on every request (the old path)
+    remote+cache  - auth server once per token, then the verified-claims cache
+    local HS256   - verified with the project's JWT secret
+    local ES256   - verified with the JWKS signing key (fetched once)
+
+Reports get_current_user time per request and dashboard load time over
+ASGI for --users users opening it --rounds times. Also checks expired and
+tampered tokens are rejected without an auth call, the cache stays within
+its bound and ends at the token's exp, and unknown key ids refetch the
+JWKS at most once per JWKS_MIN_REFRESH_SECONDS.
+
+Usage (from server/):
+    python -m benchmarks.bench_auth --users 20 --rounds 5 --auth-latency 0.04
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from benchmarks.fakes import FakeAuth, FakeGenaiClient, FakeSupabase, install_app_fakes
+
+SECRET = "bench-jwt-secret-0123456789abcdef0123"
+
+
+def serve_jwks(jwks: dict):
+    """JWKS over HTTP on a free local port; returns (url, hit counter, server)."""
+    hits = {"count": 0}
+    body = json.dumps(jwks).encode("utf-8")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits["count"] += 1
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/auth/v1/.well-known/jwks.json", hits, server
+
+
+def mint(user_id: str, key, algorithm: str, kid=None, expires_in: int = 3600) -> str:
+    now = int(time.time())
+    claims = {"sub": user_id, "aud": "authenticated", "role": "authenticated",
+              "email": f"{user_id}@example.com", "iat": now, "exp": now + expires_in}
+    return jwt.encode(claims, key, algorithm=algorithm, headers={"kid": kid} if kid else None)
+
+
+class RemoteEveryTime:
+    """The old get_current_user: one auth server call per request."""
+
+    async def verify(self, token: str):
+        from app.core import security
+        from app.core.executors import run_db
+        response = await run_db(security.supabase.auth.get_user, token)
+        return response.user
+
+
+async def check_behaviour(TokenVerifier, InvalidToken, auth: FakeAuth, ec_key, jwks_url, hits) -> None:
+    import app.core.tokens as tokens
+
+    verifier = TokenVerifier(auth.get_user, jwt_secret=SECRET, jwks_url=jwks_url)
+    calls = auth.calls
+
+    # Expired and tampered tokens: rejected locally, no auth server call
+    expired = mint("user-x", SECRET, "HS256", expires_in=-120)
+    forged = mint("user-x", "not-the-secret-" + "x" * 32, "HS256")
+    for token in (expired, forged, "not.a.jwt"):
+        try:
+            await verifier.verify(token)
+            raise AssertionError("invalid token accepted")
+        except InvalidToken:
+            pass
+    assert auth.calls == calls, "local rejection called the auth server"
+
+    # Unknown key id: one JWKS refetch, then none until JWKS_MIN_REFRESH_SECONDS
+    await verifier.verify(mint("user-x", ec_key, "ES256", kid="kid-1"))
+    fetched = hits["count"]
+    tokens.JWKS_MIN_REFRESH_SECONDS, saved = 0.0, tokens.JWKS_MIN_REFRESH_SECONDS
+    await verifier.verify(mint("user-x", ec_key, "ES256", kid="rotated"))
+    assert hits["count"] == fetched + 1, "unknown kid did not refetch the JWKS"
+    tokens.JWKS_MIN_REFRESH_SECONDS = saved
+    await verifier.verify(mint("user-x", ec_key, "ES256", kid="rotated-again"))
+    assert hits["count"] == fetched + 1, "JWKS refetched within the minimum interval"
+
+    # Remote path: bounded cache, entries end at the token's exp
+    remote = TokenVerifier(auth.get_user, mode="remote", cache_ttl=60, cache_max_entries=50)
+    for i in range(200):
+        await remote.verify(mint(f"user-{i}", "other-project-key-" + "y" * 32, "HS256"))
+    assert len(remote.cache) <= 50, len(remote.cache)
+    # exp is in whole seconds, so allow a margin before the first re-check
+    short = mint("user-short", "other-project-key-" + "y" * 32, "HS256", expires_in=3)
+    await remote.verify(short)
+    calls = auth.calls
+    await remote.verify(short)
+    assert auth.calls == calls, "cached token went to the auth server"
+    time.sleep(max(0.0, jwt.decode(short, options={"verify_signature": False})["exp"] - time.time()) + 0.1)
+    await remote.verify(short)
+    assert auth.calls == calls + 1, "cache outlived the token's exp"
+
+
+async def run(args, db: FakeSupabase, auth: FakeAuth) -> None:
+    import httpx
+    from app.core import security
+    from app.core.tokens import InvalidToken, TokenVerifier
+    from app.main import app
+
+    ec_key = ec.generate_private_key(ec.SECP256R1())
+    jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(ec_key.public_key()))
+    jwks_url, hits, server = serve_jwks({"keys": [{**jwk, "kid": "kid-1", "alg": "ES256", "use": "sig"}]})
+
+    users = [f"user-{i}" for i in range(args.users)]
+    db.tables["documents"] = [
+        {"id": f"doc-{u}", "user_id": u, "file_name": "paper.pdf", "status": "completed", "created_at": "2026-01-01"}
+        for u in users
+    ]
+    db.tables["essays"] = [
+        {"id": f"essay-{u}", "user_id": u, "doc_id": f"doc-{u}", "title": "Essay", "status": "drafting",
+         "created_at": "2026-01-01", "outline": "{}", "content": {}}
+        for u in users
+    ]
+
+    scenarios = {
+        "remote": (RemoteEveryTime(), lambda u: mint(u, SECRET, "HS256")),
+        "remote+cache": (
+            TokenVerifier(auth.get_user, mode="remote"),
+            lambda u: mint(u, SECRET, "HS256")
+        ),
+        "local HS256": (
+            TokenVerifier(auth.get_user, jwt_secret=SECRET, jwks_url=jwks_url),
+            lambda u: mint(u, SECRET, "HS256")
+        ),
+        "local ES256": (
+            TokenVerifier(auth.get_user, jwt_secret=SECRET, jwks_url=jwks_url),
+            lambda u: mint(u, ec_key, "ES256", kid="kid-1")
+        ),
+    }
+
+    print(f"{args.users} users x {args.rounds} dashboard opens (3 requests each), "
+          f"auth server {args.auth_latency * 1000:.0f} ms, database {db.latency * 1000:.0f} ms")
+    print(f"{'scenario':>13} {'auth p50 ms':>12} {'auth p95 ms':>12} {'dashboard ms':>13} {'auth calls':>11}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name, (verifier, make_token) in scenarios.items():
+            security.token_verifier = verifier
+            tokens = {u: make_token(u) for u in users}
+            calls = auth.calls
+
+            # Auth alone: get_current_user per request
+            auth_ms = []
+            for _ in range(args.rounds):
+                for u in users:
+                    start = time.perf_counter()
+                    user = await security.get_current_user(f"Bearer {tokens[u]}")
+                    auth_ms.append((time.perf_counter() - start) * 1000)
+                    assert user.id == u
+
+            # Dashboard: three concurrent requests per open
+            dashboard_ms = []
+            for _ in range(args.rounds):
+                for u in users:
+                    headers = {"Authorization": f"Bearer {tokens[u]}"}
+                    start = time.perf_counter()
+                    responses = await asyncio.gather(
+                        client.get("/documents/", headers=headers),
+                        client.get("/files", headers=headers),
+                        client.get(f"/files/essay-{u}", headers=headers),
+                    )
+                    dashboard_ms.append((time.perf_counter() - start) * 1000)
+                    for response in responses:
+                        assert response.status_code == 200, response.text
+                    assert responses[0].json()["documents"][0]["id"] == f"doc-{u}"
+
+            p95 = statistics.quantiles(auth_ms, n=20)[-1]
+            print(f"{name:>13} {statistics.median(auth_ms):>12.3f} {p95:>12.3f} "
+                  f"{statistics.mean(dashboard_ms):>13.1f} {auth.calls - calls:>11}")
+
+    assert hits["count"] == 1, f"JWKS fetched {hits['count']} times"
+    await check_behaviour(TokenVerifier, InvalidToken, auth, ec_key, jwks_url, hits)
+    server.shutdown()
+    print("checks ok: expired/tampered rejected locally, cache bounded and ends at exp, "
+          "JWKS fetched once, unknown kid refetched once")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--auth-latency", type=float, default=0.04)
+    parser.add_argument("--db-latency", type=float, default=0.005)
+    args = parser.parse_args()
+
+    # Short benchmark-only secrets for the "wrong key" cases
+    warnings.filterwarnings("ignore", category=jwt.warnings.InsecureKeyLengthWarning)
+    db = FakeSupabase(latency=args.db_latency)
+    db.auth = FakeAuth(db, latency=args.auth_latency)
+    install_app_fakes(db, FakeGenaiClient())
+    asyncio.run(run(args, db, db.auth))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark + correctness check: chunk → page attribution
+
+Compares the old substring scan (`chunk[:100] in page_text` over every page,
+page 1 when nothing matches) with offset-based attribution through
+PageBoundaryIndex, on a synthetic document of --pages pages.
+
+Before timing, checks on a document with many short pages that:
+- every chunk's offsets slice back to its content
+- page_number / page_end are the pages holding its first / last character
+- chunks that straddle a page break get page_end > page_number
+
+Usage (from server/):
+    python -m benchmarks.bench_chunk_pages --pages 500
+"""
+
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "fake")
+
+from app.services.pdf_services import PAGE_SEPARATOR, PageBoundaryIndex, PDFProcessingService
+
+WORDS = "method results model data sample effect theory evidence control study".split()
+
+
+def make_pages(count: int, words_per_page: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        (n, f"Page {n}. " + " ".join(rng.choice(WORDS) for _ in range(words_per_page)))
+        for n in range(1, count + 1)
+    ]
+
+
+def legacy_find_chunk_page(chunk, page_content_map):
+    chunk_identifier = chunk[:100]
+    for page_num, page_text in page_content_map.items():
+        if chunk_identifier in page_text:
+            return page_num
+    return 1
+
+
+def index_for(pages) -> PageBoundaryIndex:
+    index, offset = PageBoundaryIndex(), 0
+    for n, text in pages:
+        index.add_page(n, offset)
+        offset += len(text) + len(PAGE_SEPARATOR)
+    return index
+
+
+def expected_page(page_starts, offset):
+    return max(n for n, start in page_starts if start <= offset)
+
+
+def check_correctness(service: PDFProcessingService) -> None:
+    # ~300 chars per page with ~1000+ char chunks: most chunks span pages
+    pages = make_pages(400, words_per_page=45, seed=1)
+    joined = PAGE_SEPARATOR.join(text for _, text in pages)
+
+    page_starts, offset = [], 0
+    for n, text in pages:
+        page_starts.append((n, offset))
+        offset += len(text) + len(PAGE_SEPARATOR)
+
+    chunks = list(service.chunk_pages(iter(pages), {}))
+    spanning = 0
+    for chunk in chunks:
+        assert joined[chunk["start_offset"]:chunk["end_offset"]] == chunk["content"]
+        assert chunk["page_number"] == expected_page(page_starts, chunk["start_offset"])
+        assert chunk["page_end"] == expected_page(page_starts, chunk["end_offset"] - 1)
+        spanning += chunk["page_end"] > chunk["page_number"]
+
+    assert spanning > 0, "expected boundary-spanning chunks"
+
+    legacy_wrong = sum(
+        legacy_find_chunk_page(c["content"], dict(pages)) != c["page_number"]
+        for c in chunks
+    )
+    print(f"correctness ok: {len(chunks)} chunks, {spanning} span pages, "
+          f"legacy scan attributes {legacy_wrong} of them to the wrong page")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--words-per-page", type=int, default=450)
+    args = parser.parse_args()
+
+    service = PDFProcessingService()
+    check_correctness(service)
+
+    pages = make_pages(args.pages, args.words_per_page)
+    page_content_map = dict(pages)
+    raw_text = PAGE_SEPARATOR.join(text for _, text in pages).strip()
+    spans = service.chunker.split(raw_text)
+    chunks = [raw_text[start:end] for start, end in spans]
+
+    start = time.perf_counter()
+    for chunk in chunks:
+        legacy_find_chunk_page(chunk, page_content_map)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    list(service._attribute_chunks(spans, raw_text, 0, index_for(pages)))
+    indexed = time.perf_counter() - start
+
+    print(f"{args.pages} pages, {len(chunks)} chunks")
+    print(f"  substring scan : {legacy * 1000:9.1f} ms")
+    print(f"  offset index   : {indexed * 1000:9.1f} ms  ({legacy / indexed:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: doc_chunks insert throughput, per-row vs bulk
+
+Writes N fake chunk rows (768-dim embeddings) into FakeSupabase, which
+charges 5 ms per request. Compares the old one-insert-per-chunk loop with
+ChunkWriter at a few batch sizes, and prints rows/sec.
+
+Usage (from server/):
+    python -m benchmarks.bench_chunk_writer --sizes 100 1000 10000
+"""
+
+import argparse
+import time
+from uuid import uuid4
+
+from app.services.storage_services import ChunkWriter
+from benchmarks.fakes import FakeSupabase, fake_vector
+
+
+def make_rows(n: int):
+    doc_id = str(uuid4())
+    vector = fake_vector("shared")  # content of the vector does not matter here
+    return [
+        {"document_id": doc_id, "content": f"chunk {i}", "embedding": vector, "page_number": 1}
+        for i in range(n)
+    ]
+
+
+def per_row(db: FakeSupabase, rows) -> None:
+    for row in rows:
+        db.table("doc_chunks").insert(row).execute()
+
+
+def bulk(db: FakeSupabase, rows, batch_size: int, concurrency: int) -> None:
+    with ChunkWriter(db, batch_size=batch_size, concurrency=concurrency, backoff_base=0.01) as writer:
+        # Feed the writer the way process_pdf does: one embedding batch at a time
+        for start in range(0, len(rows), 100):
+            writer.add(rows[start:start + 100])
+
+
+def run(sizes, latency: float, failure_rate: float) -> None:
+    print(f"{'rows':>6} {'mode':>22} {'requests':>9} {'seconds':>8} {'rows/s':>10}")
+    for n in sizes:
+        rows = make_rows(n)
+        modes = [("per-row", lambda db: per_row(db, rows))]
+        for batch_size, concurrency in [(100, 1), (500, 1), (500, 2)]:
+            modes.append((
+                f"bulk b={batch_size} c={concurrency}",
+                lambda db, b=batch_size, c=concurrency: bulk(db, rows, b, c)
+            ))
+
+        for name, fn in modes:
+            db = FakeSupabase(latency=latency, failure_rate=failure_rate if name != "per-row" else 0.0)
+            start = time.perf_counter()
+            fn(db)
+            elapsed = time.perf_counter() - start
+
+            assert len(db.tables["doc_chunks"]) == n
+            print(f"{n:>6} {name:>22} {db.requests:>9} {elapsed:>8.2f} {n / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="inject failures into bulk modes to exercise retries")
+    args = parser.parse_args()
+    run(args.sizes, args.latency, args.failure_rate)
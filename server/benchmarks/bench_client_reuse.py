@@ -0,0 +1,132 @@
+"""
+Microbenchmark: shared pooled genai.Client vs one client per call
+
+Starts a local HTTP/1.1 stand-in for the Gemini API (keep-alive, canned
+embedContent responses, optional server-side delay) and times sequential
+embed calls made:
+
+    per-call  - genai.Client(...) built for every call, as AIService() used
+                to be in every request
+    shared    - one client from the registry settings, reused for all calls
+
+Over plain local HTTP the gap is client construction + TCP connect; against
+the real API each new connection also pays a TLS handshake.
+
+Usage (from server/):
+    python -m benchmarks.bench_client_reuse --calls 200
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from google import genai
+from google.genai import types
+
+from app.core.config import settings
+
+EMBEDDING = {"embeddings": [{"values": [0.01] * 768}]}
+
+
+class GeminiStandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoint
+    disable_nagle_algorithm = True
+    delay = 0.0
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.delay)
+        body = json.dumps(EMBEDDING).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_client(base_url: str) -> genai.Client:
+    return genai.Client(
+        api_key="bench",
+        http_options=types.HttpOptions(
+            base_url=base_url,
+            client_args={
+                "limits": httpx.Limits(
+                    max_connections=settings.GEMINI_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.GEMINI_KEEPALIVE_EXPIRY_SECONDS
+                )
+            }
+        )
+    )
+
+
+def embed(client: genai.Client) -> None:
+    client.models.embed_content(
+        model="gemini-embedding-001",
+        contents="Introduction",
+        config=types.EmbedContentConfig(task_type="RETRIEVAL_QUERY")
+    )
+
+
+def time_calls(calls: int, fn) -> list:
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--server-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    GeminiStandIn.delay = args.server_delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GeminiStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/"
+
+    def per_call():
+        client = make_client(base_url)
+        embed(client)
+        client.close()
+
+    shared_client = make_client(base_url)
+    embed(shared_client)  # warm the pool, as a long-lived process would be
+
+    results = {}
+    for name, fn in (("per-call", per_call), ("shared", lambda: embed(shared_client))):
+        GeminiStandIn.connections = 0
+        latencies = time_calls(args.calls, fn)
+        results[name] = (latencies, GeminiStandIn.connections)
+
+    print(f"{args.calls} sequential embed calls against a local stand-in")
+    print(f"{'mode':>9} {'mean ms':>8} {'p50 ms':>7} {'p99 ms':>7} {'connections':>12}")
+    for name, (latencies, connections) in results.items():
+        ordered = sorted(latencies)
+        print(
+            f"{name:>9} {statistics.mean(latencies) * 1000:>8.2f} "
+            f"{statistics.median(latencies) * 1000:>7.2f} "
+            f"{ordered[int(0.99 * (len(ordered) - 1))] * 1000:>7.2f} {connections:>12}"
+        )
+
+    shared_client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: content-hash deduplication on a corpus with repeat uploads
+
+Corpus (uploaded in this order):
+    - N distinct PDFs
+    - the first half of them uploaded again (exact duplicates)
+    - the first half again with extra pages appended (partial overlap)
+
+Each upload runs the full process_pdf against FakeGenaiClient and
+FakeSupabase, once per cache backend. Reports wall time, embed requests and
+the document / embedding hit rates, and the bytes the memory tier holds
+(bounded by --memory-mb, as CONTENT_CACHE_MAX_MB does in the app).
+
+Usage (from server/):
+    python -m benchmarks.bench_content_cache --docs 6 --pages 40
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from uuid import uuid4
+
+os.environ.setdefault("GEMINI_API_KEY", "fake")
+
+from app.services.cache_services import (
+    ContentCache, DiskBackend, MemoryBackend, TieredBackend
+)
+from app.services.pdf_services import PDFProcessingService
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase, make_pdf
+
+
+def check_byte_bound() -> None:
+    """The memory tier evicts LRU-first by total bytes, and skips oversized values."""
+    memory = MemoryBackend(100, max_bytes=1000)
+    for key in "abc":
+        memory.set(key, b"x" * 400)
+    assert memory.get("a") is None and memory.nbytes == 800, memory.nbytes
+    memory.set("b", b"x" * 100)  # replacing a value re-counts it
+    assert memory.nbytes == 500
+    memory.set("huge", b"x" * 1001)
+    assert memory.get("huge") is None and memory.get("c") is not None
+    memory.delete("c")
+    assert memory.nbytes == 100 and len(memory) == 1
+
+
+def build_corpus(docs: int, pages: int):
+    base = [make_pdf(pages, seed=i) for i in range(docs)]
+    duplicates = base[:docs // 2]
+    # Same seed → the first `pages` pages are identical, then new ones follow
+    extended = [make_pdf(pages + pages // 2, seed=i) for i in range(docs // 2)]
+    return base + duplicates + extended
+
+
+def run(corpus, cache: ContentCache):
+    db = FakeSupabase(latency=0.002)
+    client = FakeGenaiClient(latency=0.05)
+    service = PDFProcessingService(cache=cache)
+    service.embedding_engine.client = client
+    service.embedding_engine.rate_limiter.rate = 0  # measure work, not throttling
+
+    start = time.perf_counter()
+    for pdf in corpus:
+        service.process_pdf(pdf, uuid4(), db)
+    elapsed = time.perf_counter() - start
+    service.shutdown()
+    return elapsed, client.models.calls, len(db.tables["doc_chunks"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=6)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--memory-mb", type=float, default=2)
+    args = parser.parse_args()
+    max_bytes = int(args.memory_mb * 1024 * 1024)
+    check_byte_bound()
+
+    corpus = build_corpus(args.docs, args.pages)
+    tmp = tempfile.mkdtemp()
+
+    backends = {
+        "off": lambda: ContentCache(None),
+        "memory": lambda: ContentCache(MemoryBackend(100000, max_bytes)),
+        "disk": lambda: ContentCache(DiskBackend(os.path.join(tmp, "disk.sqlite3"), 100000)),
+        "tiered": lambda: ContentCache(TieredBackend(
+            MemoryBackend(100000, max_bytes), DiskBackend(os.path.join(tmp, "tiered.sqlite3"), 100000)
+        )),
+    }
+
+    print(f"{len(corpus)} uploads ({args.docs} distinct PDFs, {args.pages}+ pages each)")
+    print(f"{'backend':>8} {'seconds':>8} {'embed reqs':>11} {'rows':>6} {'doc hit':>8} {'emb hit':>8} {'mem KB':>8}")
+    for name, factory in backends.items():
+        cache = factory()
+        elapsed, calls, rows = run(corpus, cache)
+        stats = cache.stats()
+        memory = cache.backend.memory if isinstance(cache.backend, TieredBackend) else cache.backend
+        resident = memory.nbytes if isinstance(memory, MemoryBackend) else 0
+        assert resident <= max_bytes, f"{name}: memory tier holds {resident} bytes"
+        print(
+            f"{name:>8} {elapsed:>8.2f} {calls:>11} {rows:>6} "
+            f"{stats['documents']['hit_rate']:>8.0%} {stats['embeddings']['hit_rate']:>8.0%} "
+            f"{resident / 1024:>8.0f}"
+        )
+
+    # A fresh process would see the disk tier warm: reopen and replay
+    cache = ContentCache(DiskBackend(os.path.join(tmp, "disk.sqlite3"), 100000))
+    elapsed, calls, rows = run(corpus, cache)
+    print(f"{'disk*':>8} {elapsed:>8.2f} {calls:>11} {rows:>6} "
+          f"{cache.stats()['documents']['hit_rate']:>8.0%} {cache.stats()['embeddings']['hit_rate']:>8.0%}"
+          "   (* reopened after restart)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Benchmark: grounding context size before/after merging, dedup and budget
+
+A synthetic paper (hard-wrapped like bench_chunking's) is chunked with the default
+semantic policy and with the old fixed 1000/100-character chunks, and
+indexed with BM25 (lexical_services). For each query, the top
+--match-count chunks are turned into a prompt context:
+
+    plain     - "[Source: Page X]" blocks joined as-is (the old behaviour)
+    merged    - assemble_context without a budget (merge + dedupe only)
+    budgeted  - assemble_context with CONTEXT_TOKEN_BUDGET
+
+The document has 4-page sections, each with its own vocabulary. Queries:
+    headers  - section titles: hits cluster in one section, so neighbouring
+               chunks (and their overlap) come back together
+    spanning - 60 words around a chunk boundary
+
+Reports estimated prompt tokens, assembly time, and generate-section
+latency with a fake model charging --base-latency plus prompt tokens /
+--prefill-tps. Checks (in place of unit tests) that merging restores the
+exact document text, nothing is lost without a budget, the budget holds,
+and passages come out in page order.
+
+Usage (from server/):
+    python -m benchmarks.bench_context_budget --pages 200 --match-count 4
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+from bisect import bisect_right
+import time
+
+from benchmarks.bench_chunking import FILLER, wrap
+from benchmarks.fakes import FakeGenaiClient
+
+
+def invented_word(rng: random.Random) -> str:
+    return "".join(rng.choice("bdfgklmnprstvz") + rng.choice("aeiou") for _ in range(3))
+
+
+def make_document(pages: int, pages_per_section: int = 4, seed: int = 0):
+    """
+    Hard-wrapped paper text whose sections each have their own vocabulary
+    (as real sections do), so a section's chunks resemble each other.
+    Returns (text, section titles, page count).
+    """
+    rng = random.Random(seed)
+    page_texts, titles = [], []
+    for p in range(pages):
+        parts = []
+        if p % pages_per_section == 0:
+            name = [invented_word(rng).capitalize() for _ in range(2)]
+            vocab = [w.lower() for w in name] + [invented_word(rng) for _ in range(20)]
+            titles.append(f"{' '.join(name)} Analysis")
+            parts.append(f"{len(titles)}. {titles[-1]}")
+        for _ in range(3):
+            sentences = []
+            for _ in range(4):
+                words = [rng.choice(vocab if rng.random() < 0.4 else FILLER) for _ in range(rng.randint(10, 28))]
+                sentences.append(words[0].capitalize() + " " + " ".join(words[1:]) + ".")
+            parts.append(wrap(" ".join(sentences)))
+        page_texts.append("\n".join(parts))
+    return "\n\n".join(page_texts), titles, pages
+
+
+def check_invariants(text, spans, assemble_context, estimate_tokens) -> None:
+    # First run of three chunks that share overlap (semantic chunks only
+    # carry overlap when whole sentences fit in it)
+    first = next(
+        i for i in range(len(spans) - 2)
+        if spans[i + 1][0] < spans[i][1] and spans[i + 2][0] < spans[i + 1][1]
+    )
+    spans = spans[first:]
+    chunks = [{"content": text[s:e], "page_number": 1} for s, e in spans[:6]]
+
+    # Overlapping neighbours merge back into the exact document text,
+    # whatever order retrieval returned them in
+    merged = assemble_context([chunks[2], chunks[0], chunks[1]], token_budget=0)
+    assert merged.report.passages == 1, merged.report
+    body = merged.text.split("\n", 1)[1]
+    assert body == text[spans[0][0]:spans[2][1]], "merge did not restore the source text"
+
+    # Without a budget nothing is lost; duplicates collapse
+    shuffled = [chunks[4], chunks[0], chunks[4], chunks[2], chunks[1]]
+    full = assemble_context(shuffled, token_budget=0)
+    for chunk in shuffled:
+        assert chunk["content"] in full.text, "chunk content lost"
+    assert full.report.tokens_after < full.report.tokens_before
+
+    # The budget holds, even when it forces a trimmed passage
+    for budget in (60, 150, 400):
+        fitted = assemble_context(chunks, token_budget=budget)
+        assert estimate_tokens(fitted.text) <= budget, (budget, fitted.report)
+
+    # Page order, labels cover page ranges
+    paged = [
+        {"content": "Later page text about the findings and their limits.", "page_number": 9},
+        {"content": "Earlier page text about the method and the sample.", "page_number": 2, "page_end": 3},
+    ]
+    ordered = assemble_context(paged, token_budget=0).text
+    assert ordered.index("[Source: Pages 2-3]") < ordered.index("[Source: Page 9]"), ordered
+
+
+async def run(args, models) -> None:
+    from app.core.config import settings
+    from app.services.ai_services import AIService
+    from app.services.chunking_services import CharacterChunker, ChunkingPolicy, estimate_tokens
+    from app.services.context_services import SEPARATOR, assemble_context, format_chunk
+    from app.services.lexical_services import BM25Index
+
+    text, titles, pages = make_document(args.pages)
+    # make_document separates pages with blank lines
+    page_starts = [0] + [i + 2 for i in range(len(text)) if text.startswith("\n\n", i)]
+    chunkers = {
+        "semantic": ChunkingPolicy.from_settings().chunker(pages),
+        "char1000": CharacterChunker(1000, 100),
+    }
+
+    check_invariants(text, chunkers["semantic"].split(text), assemble_context, estimate_tokens)
+    check_invariants(text, chunkers["char1000"].split(text), assemble_context, estimate_tokens)
+
+    query_sets = {"headers": titles[:args.queries]}
+
+    ai = AIService(client=models.client)
+    budget = settings.CONTEXT_TOKEN_BUDGET
+    print(f"{pages} pages, match_count={args.match_count}, budget={budget} tokens; "
+          f"mean estimated prompt-context tokens per request")
+    print(f"{'chunks':>9} {'queries':>9} {'plain':>6} {'merged':>7} {'budgeted':>9} {'saved':>6} "
+          f"{'asm ms':>7} {'gen s plain':>12} {'gen s asm':>10}")
+    for chunker_name, chunker in chunkers.items():
+        chunks = [
+            {"content": text[start:end], "page_number": bisect_right(page_starts, start)}
+            for start, end in chunker.split(text)
+        ]
+        index = BM25Index.build(chunks)
+
+        # A topic discussed across a chunk boundary: 60 words around it
+        rng = random.Random(0)
+        boundaries = [end for _, end in chunker.split(text)[:-1]]
+        spanning = []
+        for boundary in rng.sample(boundaries, min(args.queries, len(boundaries))):
+            before_words = text[max(0, boundary - 1500):boundary].split()[-30:]
+            after_words = text[boundary:boundary + 1500].split()[:30]
+            spanning.append(" ".join(before_words + after_words))
+
+        for name, queries in {**query_sets, "spanning": spanning}.items():
+            before, merged, after, assemble_ms = [], [], [], []
+            pairs = []
+            for query in queries:
+                matches = index.search(query, args.match_count)
+                plain = SEPARATOR.join(format_chunk(m) for m in matches)
+                start = time.perf_counter()
+                assembled = assemble_context(matches)
+                assemble_ms.append((time.perf_counter() - start) * 1000)
+                assert assembled.report.tokens_before == estimate_tokens(plain)
+                assert assembled.report.tokens_after <= max(budget, 0) or budget <= 0
+                before.append(assembled.report.tokens_before)
+                after.append(assembled.report.tokens_after)
+                merged.append(assemble_context(matches, token_budget=0).report.tokens_after)
+                pairs.append((plain, assembled.text))
+
+            # Generation latency on a sample of queries
+            gen_plain, gen_assembled = [], []
+            for plain, assembled in pairs[:args.generate]:
+                for context, sink in ((plain, gen_plain), (assembled, gen_assembled)):
+                    start = time.perf_counter()
+                    await ai.generate_grounded_section(header="Header", context=context)
+                    sink.append(time.perf_counter() - start)
+
+            saved = 1 - sum(after) / sum(before)
+            print(f"{chunker_name:>9} {name:>9} {statistics.mean(before):>6.0f} "
+                  f"{statistics.mean(merged):>7.0f} {statistics.mean(after):>9.0f} {saved:>6.1%} "
+                  f"{statistics.mean(assemble_ms):>7.2f} "
+                  f"{statistics.mean(gen_plain):>12.3f} {statistics.mean(gen_assembled):>10.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--match-count", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--generate", type=int, default=10)
+    parser.add_argument("--base-latency", type=float, default=0.3)
+    parser.add_argument("--prefill-tps", type=float, default=2000)
+    args = parser.parse_args()
+
+    genai_client = FakeGenaiClient(generate_latency=args.base_latency)
+    models = genai_client.models
+    models.client = genai_client
+    generate = models.generate_content
+
+    def sized_generate(model, contents, config=None):
+        # Latency grows with prompt size: base + prefill time
+        time.sleep(len(contents) / 4 / args.prefill_tps)
+        return generate(model=model, contents=contents, config=config)
+
+    models.generate_content = sized_generate
+    asyncio.run(run(args, models))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Benchmark: list/detail reads for a heavy user (pagination, projection, raw_text)
+
+A user with --documents documents (each with --text-kb of raw_text) and
+--essays essays, many sharing a created_at, is read through the API:
+
+    list     - GET /documents/ and GET /files page by page, against the
+               single unbounded response the endpoints used to send
+    detail   - GET /documents/{id} (projected, stored chunk_count) against
+               the select("*") + count(*) pair it replaced
+    raw_text - GET /documents/{id}/raw_text whole and in byte ranges
+
+Also checks:
+    - following next_cursor visits every row once, newest first, including
+      runs of equal created_at across page boundaries, and a row created
+      mid-walk does not shift the pages
+    - a bad cursor or unknown field is a 400; raw_text is not a field
+    - ranges (start-end, start-, suffix) return the exact bytes with 206 and
+      Content-Range; past the end is a 416; several ranges give the whole
+      text; ranges joined back equal the text even where they split a
+      multi-byte character
+    - ingestion stores chunk_count, and the detail endpoint reports it
+
+Usage (from server/):
+    python -m benchmarks.bench_document_reads --documents 400 --essays 400
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase, install_app_fakes, make_pdf
+
+AUTH = {"Authorization": "Bearer user-1"}
+WORDS = "analysis méthode résultats données 数据 échantillon effect study théorie".split()
+
+
+def text_of(kb: int, seed: int) -> str:
+    """About kb KB of text with multi-byte characters, so ranges can split them."""
+    rng = random.Random(seed)
+    words, size = [], 0
+    while size < kb * 1024:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word.encode("utf-8")) + 1
+    return " ".join(words)
+
+
+def seed(db: FakeSupabase, documents: int, essays: int, text_kb: int) -> None:
+    # Runs of 7 rows share a timestamp, so ties straddle page boundaries
+    def created(i: int) -> str:
+        return f"2026-01-{1 + (i // 7) % 28:02d}T{(i // 196) % 24:02d}:00:00+00:00"
+
+    db.tables["documents"] = [
+        {"id": f"doc-{i:05d}", "user_id": "user-1", "file_name": f"paper-{i}.pdf", "status": "completed",
+         "raw_text": text_of(text_kb, i), "digest": "digest " * 300, "chunk_count": 40 + i % 60,
+         "created_at": created(i)}
+        for i in range(documents)
+    ]
+    db.tables["doc_chunks"] = [
+        {"id": f"chunk-{i}-{j}", "document_id": f"doc-{i:05d}", "content": "..."}
+        for i in range(min(documents, 20)) for j in range(40 + i % 60)
+    ]
+    db.tables["essays"] = [
+        {"id": f"essay-{i:05d}", "user_id": "user-1", "doc_id": f"doc-{i % max(1, documents):05d}",
+         "title": f"Essay {i}", "status": "drafting", "outline": {"outline": []}, "content": {},
+         "created_at": created(i)}
+        for i in range(essays)
+    ]
+    db.tables["documents"].append(
+        {"id": "doc-other", "user_id": "user-2", "file_name": "x.pdf", "status": "completed",
+         "raw_text": "secret", "created_at": created(0)}
+    )
+
+
+def newest_first(rows):
+    return [r["id"] for r in sorted(rows, key=lambda r: (r["created_at"], r["id"]), reverse=True)]
+
+
+async def walk(client, path: str, key, limit: int, on_page=None):
+    """Follows cursors to the end; returns (ids in order, pages, bytes, seconds)."""
+    ids, pages, size, cursor = [], 0, 0, None
+    start = time.perf_counter()
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = await client.get(path, params=params, headers=AUTH)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        rows = body[key] if key else body
+        ids.extend(r["id"] for r in rows)
+        size += len(response.content)
+        pages += 1
+        cursor = body["next_cursor"] if key else response.headers.get("x-next-cursor")
+        if key:
+            assert cursor == response.headers.get("x-next-cursor")
+        if on_page:
+            on_page(pages)
+        if not cursor:
+            return ids, pages, size, time.perf_counter() - start
+
+
+async def check_lists(client, db: FakeSupabase, args) -> None:
+    from app.core.config import settings
+
+    user_docs = [d for d in db.tables["documents"] if d["user_id"] == "user-1"]
+    before_docs = len(json.dumps({"documents": [
+        {k: d[k] for k in ("id", "file_name", "status", "created_at")} for d in user_docs
+    ]}))
+    expected = newest_first(user_docs)
+    newer = {"id": "doc-new", "user_id": "user-1", "file_name": "new.pdf",
+             "status": "ingested", "created_at": "2027-01-01T00:00:00+00:00"}
+
+    def insert_newer(pages: int) -> None:
+        # Mid-walk when there are more pages; right after the only one otherwise
+        if pages == 1:
+            db.tables["documents"].append(newer)
+
+    ids, pages, size, seconds = await walk(client, "/documents/", "documents", args.limit, insert_newer)
+    assert ids == expected, "pages skipped, repeated or reordered documents"
+    first = await client.get("/documents/", headers=AUTH)
+    now = newest_first(user_docs + [newer])
+    assert [d["id"] for d in first.json()["documents"]] == now[:settings.LIST_PAGE_SIZE]
+    print(f"{'GET /documents/':>18}: before 1 response of {before_docs / 1024:.0f} KB; now first page "
+          f"{len(first.content) / 1024:.1f} KB, all {pages} pages {size / 1024:.0f} KB in {seconds * 1000:.0f} ms")
+
+    before_essays = len(json.dumps([
+        {k: e[k] for k in ("id", "doc_id", "title", "status", "created_at")} for e in db.tables["essays"]
+    ]))
+    ids, pages, size, seconds = await walk(client, "/files", None, args.limit)
+    assert ids == newest_first(db.tables["essays"]), "essay pages skipped, repeated or reordered rows"
+    print(f"{'GET /files':>18}: before 1 response of {before_essays / 1024:.0f} KB; "
+          f"now {pages} pages of {args.limit}, {size / 1024:.0f} KB in {seconds * 1000:.0f} ms")
+
+    for bad in ("garbage", "eyJ4IjoxfQ", "W10"):
+        response = await client.get("/documents/", params={"cursor": bad}, headers=AUTH)
+        assert response.status_code == 400, (bad, response.status_code)
+    response = await client.get("/files", params={"limit": 0}, headers=AUTH)
+    assert response.status_code == 422
+
+
+async def check_detail(client, db: FakeSupabase) -> None:
+    doc = db.tables["documents"][0]
+    before = len(json.dumps({"document": doc, "chunks_count": doc["chunk_count"]}))
+    requests = db.requests
+    start = time.perf_counter()
+    response = await client.get(f"/documents/{doc['id']}", headers=AUTH)
+    seconds = time.perf_counter() - start
+    assert response.status_code == 200
+    body = response.json()
+    assert "raw_text" not in body["document"] and body["chunks_count"] == doc["chunk_count"]
+    assert db.requests - requests == 1, "detail read should be one query"
+    print(f"{'GET /documents/{id}':>18}: before {before / 1024:.0f} KB in 2 queries; "
+          f"now {len(response.content)} B in 1 query, {seconds * 1000:.1f} ms")
+
+    response = await client.get(f"/documents/{doc['id']}", params={"fields": "id,status"}, headers=AUTH)
+    assert set(response.json()["document"]) == {"id", "status"}
+    for fields in ("raw_text", "id,nope", " , "):
+        response = await client.get(f"/documents/{doc['id']}", params={"fields": fields}, headers=AUTH)
+        assert response.status_code == 400, (fields, response.status_code)
+    response = await client.get("/documents/doc-other", headers=AUTH)
+    assert response.status_code == 404
+
+    essay = db.tables["essays"][0]
+    response = await client.get(f"/files/{essay['id']}", params={"fields": "id,title"}, headers=AUTH)
+    assert response.json() == {"id": essay["id"], "title": essay["title"]}
+
+
+async def check_raw_text(client, db: FakeSupabase, args) -> None:
+    doc = db.tables["documents"][1]
+    data = doc["raw_text"].encode("utf-8")
+    path = f"/documents/{doc['id']}/raw_text"
+    slice_bytes = args.slice_kb * 1024
+
+    requests = db.requests
+    start = time.perf_counter()
+    response = await client.get(path, headers=AUTH)
+    seconds = time.perf_counter() - start
+    assert response.status_code == 200 and response.content == data
+    assert response.headers["accept-ranges"] == "bytes" and int(response.headers["content-length"]) == len(data)
+    slices = db.requests - requests
+    assert slices == max(1, -(-len(data) // slice_bytes)), f"{slices} slice reads"
+
+    total = len(data)
+    for header, (lo, hi) in (("bytes=0-99", (0, 99)), ("bytes=100-", (100, total - 1)),
+                             ("bytes=-500", (total - 500, total - 1)),
+                             (f"bytes=5-{total + 1000}", (5, total - 1))):
+        response = await client.get(path, headers={**AUTH, "Range": header})
+        assert response.status_code == 206, (header, response.status_code)
+        assert response.content == data[lo:hi + 1], header
+        assert response.headers["content-range"] == f"bytes {lo}-{hi}/{total}", header
+
+    response = await client.get(path, headers={**AUTH, "Range": f"bytes={total}-"})
+    assert response.status_code == 416 and response.headers["content-range"] == f"bytes */{total}"
+    response = await client.get(path, headers={**AUTH, "Range": "bytes=0-1,5-9"})
+    assert response.status_code == 200 and response.content == data
+
+    # Odd-sized ranges split multi-byte characters; joined, they are the text
+    parts, position, step = [], 0, 65_537
+    while position < total:
+        response = await client.get(path, headers={**AUTH, "Range": f"bytes={position}-{position + step - 1}"})
+        parts.append(response.content)
+        position += step
+    assert b"".join(parts).decode("utf-8") == doc["raw_text"]
+
+    response = await client.get("/documents/doc-other/raw_text", headers=AUTH)
+    assert response.status_code == 404
+    print(f"{'raw_text':>18}: {total / 1024:.0f} KB in {slices} slice reads, {seconds * 1000:.0f} ms; "
+          f"ranges, suffix, 416 and split characters ok")
+
+
+def check_ingest_count() -> None:
+    from app.services.pdf_services import pdf_service
+
+    db = FakeSupabase(latency=0)
+    install_app_fakes(db, FakeGenaiClient(latency=0, per_item_latency=0))
+    db.tables["documents"] = [{"id": "doc-ingest", "user_id": "user-1", "status": "ingested"}]
+    pdf_service.embedding_engine.rate_limiter.rate = 0
+    result = pdf_service.process_pdf(make_pdf(10), "doc-ingest", db)
+    assert db.tables["documents"][0]["chunk_count"] == result["chunks_count"] > 0
+    print(f"ingestion stored chunk_count={result['chunks_count']}")
+
+
+async def run(args, db: FakeSupabase) -> None:
+    import httpx
+
+    from app.main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await check_lists(client, db, args)
+        await check_detail(client, db)
+        await check_raw_text(client, db, args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=400)
+    parser.add_argument("--essays", type=int, default=400)
+    parser.add_argument("--text-kb", type=int, default=300)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--slice-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    os.environ["RAW_TEXT_SLICE_BYTES"] = str(args.slice_kb * 1024)
+    os.environ["CONTENT_CACHE_BACKEND"] = "off"
+    db = FakeSupabase(latency=0.002)
+    install_app_fakes(db, FakeGenaiClient(latency=0))
+    seed(db, args.documents, args.essays, args.text_kb)
+
+    asyncio.run(run(args, db))
+    check_ingest_count()
+
+
+if __name__ == "__main__":
+    main()
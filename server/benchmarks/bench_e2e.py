@@ -0,0 +1,409 @@
+"""
+Benchmark suite: the whole app, end to end, against offline fakes
+
+Runs the real FastAPI app in-process (httpx ASGI transport) with
+FakeSupabase and FakeGenaiClient (see fakes.py) behind it, on a synthetic
+corpus (see corpus.py). Everything is seeded: the same arguments give the
+same PDFs, queries, fake vectors and failure rate on every run (which calls
+fail depends on thread timing), so the numbers of two versions can be
+compared.
+
+Scenarios (in order; later ones use what earlier ones created):
+    ingest     - POST /documents/upload for every corpus PDF at once, then
+                 poll /status until each completes: documents, pages and
+                 chunks per second, time to completion per document
+    retrieval  - get_grounding_context for every document's headers,
+                 --retrieval-concurrency at a time: latency percentiles
+    outline    - POST /files/generate-outline once per document (creates
+                 the essays the next scenario writes into)
+    generation - POST /files/{id}/generate-section, --sections requests at
+                 each --concurrency level: latency percentiles, sections/s
+
+Each scenario also reports the pipeline stage times it caused
+(rag_stage_seconds, see core/metrics). Results are written as JSON; with
+--compare, metrics that regressed by more than --tolerance against an
+earlier result file are listed and the exit status is 1:
+
+    python -m benchmarks.bench_e2e --output base.json
+    ... change something ...
+    python -m benchmarks.bench_e2e --output new.json --compare base.json
+
+Metric names say which way is better: *_ms and *_s are times (lower),
+*_per_s are rates (higher); counts are informational.
+
+Note that fake embeddings are hashes, not meanings, so vector matches are
+rare and grounding comes mostly from the keyword side of hybrid retrieval.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.corpus import make_corpus
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase, install_app_fakes
+
+SCENARIOS = ("ingest", "retrieval", "outline", "generation")
+
+
+def summarize(seconds: List[float]) -> Dict:
+    """Latency percentiles in milliseconds."""
+    if not seconds:
+        return {"count": 0}
+    ms = sorted(s * 1000 for s in seconds)
+
+    def pct(p: float) -> float:
+        return round(ms[min(len(ms) - 1, int(p * len(ms)))], 2)
+
+    return {
+        "count": len(ms),
+        "mean_ms": round(statistics.mean(ms), 2),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": round(ms[-1], 2),
+    }
+
+
+class StageDelta:
+    """rag_stage_seconds accumulated between construction and result()."""
+
+    def __init__(self):
+        from app.core.metrics import STAGE_SECONDS
+        self.histogram = STAGE_SECONDS
+        self.before = STAGE_SECONDS.totals()
+
+    def result(self) -> Dict:
+        stages = {}
+        for (stage,), (count, total) in sorted(self.histogram.totals().items()):
+            count_before, total_before = self.before.get((stage,), (0, 0.0))
+            if count > count_before:
+                stages[stage] = {
+                    "count": count - count_before,
+                    "total_s": round(total - total_before, 4),
+                }
+        return stages
+
+
+async def bounded(concurrency: int, calls) -> List:
+    """Awaits the coroutine factories, at most concurrency at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(call):
+        async with semaphore:
+            return await call()
+
+    return await asyncio.gather(*(one(call) for call in calls))
+
+
+async def scenario_ingest(ctx: Dict) -> Dict:
+    client, corpus = ctx["client"], ctx["corpus"]
+
+    async def upload(i: int, document):
+        # One user per document, so the per-user queue limit isn't what's measured
+        headers = {"Authorization": f"Bearer user-{i}"}
+        start = time.perf_counter()
+        response = await client.post("/documents/upload", headers=headers,
+                                     files={"file": (document.name, document.data, "application/pdf")})
+        if response.status_code != 202:
+            return None, headers, "rejected", time.perf_counter() - start
+        doc_id = response.json()["doc_id"]
+        while True:
+            status = (await client.get(f"/documents/{doc_id}/status", headers=headers)).json()
+            if status["status"] in ("completed", "failed"):
+                return doc_id, headers, status["status"], time.perf_counter() - start
+            await asyncio.sleep(0.02)
+
+    stages = StageDelta()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(upload(i, d) for i, d in enumerate(corpus)))
+    elapsed = time.perf_counter() - start
+
+    db = ctx["db"]
+    ctx["documents"] = []
+    chunks = 0
+    for document, (doc_id, headers, status, _) in zip(corpus, results):
+        if status == "completed":
+            ctx["documents"].append((document, doc_id, headers))
+            chunks += sum(1 for r in db.tables["doc_chunks"] if r["document_id"] == doc_id)
+    completed = len(ctx["documents"])
+    pages = sum(d.pages for d, _, _ in ctx["documents"])
+    return {
+        "documents": len(corpus),
+        "failed": len(corpus) - completed,
+        "pages": pages,
+        "chunks": chunks,
+        "wall_s": round(elapsed, 3),
+        "documents_per_s": round(completed / elapsed, 3),
+        "pages_per_s": round(pages / elapsed, 2),
+        "chunks_per_s": round(chunks / elapsed, 2),
+        "time_to_complete": summarize([r[3] for r in results]),
+        "stages": stages.result(),
+    }
+
+
+async def scenario_retrieval(ctx: Dict) -> Dict:
+    from app.services.essay_services import get_grounding_context
+
+    queries = [(header, doc_id) for document, doc_id, _ in ctx["documents"] for header in document.headers]
+    latencies, empty, failed = [], 0, 0
+
+    async def retrieve(header: str, doc_id: str):
+        nonlocal empty, failed
+        start = time.perf_counter()
+        try:
+            context = await get_grounding_context(header, doc_id)
+        except Exception:
+            failed += 1
+            return
+        latencies.append(time.perf_counter() - start)
+        empty += not context
+
+    stages = StageDelta()
+    start = time.perf_counter()
+    await bounded(ctx["args"].retrieval_concurrency,
+                  [lambda h=h, d=d: retrieve(h, d) for h, d in queries])
+    elapsed = time.perf_counter() - start
+    return {
+        "queries": len(queries),
+        "empty": empty,
+        "failed": failed,
+        "concurrency": ctx["args"].retrieval_concurrency,
+        "queries_per_s": round(len(queries) / elapsed, 2),
+        "latency": summarize(latencies),
+        "stages": stages.result(),
+    }
+
+
+async def scenario_outline(ctx: Dict) -> Dict:
+    client = ctx["client"]
+    latencies, failed = [], 0
+    ctx["essays"] = []
+
+    async def outline(document, doc_id: str, headers: Dict):
+        nonlocal failed
+        start = time.perf_counter()
+        response = await client.post("/files/generate-outline", headers=headers,
+                                     json={"document_id": doc_id, "topic": f"An essay on {document.topic}"})
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            failed += 1
+            return
+        ctx["essays"].append((response.json()["id"], document, doc_id, headers))
+
+    stages = StageDelta()
+    await asyncio.gather(*(outline(*entry) for entry in ctx["documents"]))
+    return {
+        "outlines": len(latencies),
+        "failed": failed,
+        "latency": summarize(latencies),
+        "stages": stages.result(),
+    }
+
+
+async def scenario_generation(ctx: Dict) -> Dict:
+    client, args = ctx["client"], ctx["args"]
+    essays = ctx["essays"]
+    assert essays, "generation needs the essays created by the outline scenario"
+    # Round-robin over essays and their headers
+    requests = [
+        (essay, essay[1].headers[(i // len(essays)) % len(essay[1].headers)])
+        for i, essay in ((i, essays[i % len(essays)]) for i in range(args.sections))
+    ]
+    levels = {}
+
+    for concurrency in args.concurrency:
+        latencies, failed = [], 0
+
+        async def generate(essay, header: str):
+            nonlocal failed
+            essay_id, _, doc_id, headers = essay
+            start = time.perf_counter()
+            response = await client.post(f"/files/{essay_id}/generate-section", headers=headers,
+                                         params={"header": header, "document_id": doc_id})
+            latencies.append(time.perf_counter() - start)
+            failed += response.status_code != 200
+
+        stages = StageDelta()
+        start = time.perf_counter()
+        await bounded(concurrency, [lambda e=e, h=h: generate(e, h) for e, h in requests])
+        elapsed = time.perf_counter() - start
+        levels[f"c{concurrency}"] = {
+            "sections": len(requests),
+            "failed": failed,
+            "sections_per_s": round((len(requests) - failed) / elapsed, 3),
+            "latency": summarize(latencies),
+            "stages": stages.result(),
+        }
+    return levels
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(tree: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in tree.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Metrics worse than baseline by more than tolerance (a fraction)."""
+    regressions = []
+    now, before = flatten(current["scenarios"]), flatten(baseline["scenarios"])
+    for path, value in sorted(now.items()):
+        old = before.get(path)
+        # Stage breakdowns explain a change; they aren't judged on their own
+        if not old or ".stages." in path:
+            continue
+        name = path.rsplit(".", 1)[-1]
+        if name.endswith("_per_s"):
+            change = (old - value) / old
+        elif name.endswith("_ms") or name.endswith("_s"):
+            change = (value - old) / old
+        else:
+            continue
+        if change > tolerance:
+            regressions.append(f"{path}: {old} -> {value} ({change:+.0%} worse)")
+    return regressions
+
+
+SCENARIO_FUNCTIONS = {
+    "ingest": scenario_ingest,
+    "retrieval": scenario_retrieval,
+    "outline": scenario_outline,
+    "generation": scenario_generation,
+}
+
+# What later scenarios build on: ingest creates the documents, outline the essays
+DEPENDS_ON = {
+    "retrieval": ("ingest",),
+    "outline": ("ingest",),
+    "generation": ("ingest", "outline"),
+}
+
+
+def plan(selected: List[str]) -> List[str]:
+    needed = set(selected)
+    for name in selected:
+        needed.update(DEPENDS_ON.get(name, ()))
+    return [name for name in SCENARIOS if name in needed]
+
+
+async def run(args, ctx: Dict) -> Dict:
+    import httpx
+    from app.main import app
+
+    # Unhandled errors become 500s, as behind a real server
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        ctx["client"] = client
+        results = {}
+        for name in plan(args.scenarios):
+            start = time.perf_counter()
+            results[name] = await SCENARIO_FUNCTIONS[name](ctx)
+            print(f"  {name:<10} done in {time.perf_counter() - start:6.2f} s", file=sys.stderr)
+    # Only what was asked for; dependencies ran for their side effects
+    return {name: results[name] for name in SCENARIOS if name in args.scenarios}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda s: [x for x in s.split(",") if x])
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--min-pages", type=int, default=5)
+    parser.add_argument("--max-pages", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--retrieval-concurrency", type=int, default=8)
+    parser.add_argument("--sections", type=int, default=24)
+    parser.add_argument("--concurrency", default=[1, 4, 16],
+                        type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--generate-latency", type=float, default=0.5)
+    parser.add_argument("--db-latency", type=float, default=0.005)
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="fraction of Gemini and Supabase calls that fail")
+    parser.add_argument("--output", default="bench_e2e.json")
+    parser.add_argument("--compare", help="earlier result file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))} (choose from {', '.join(SCENARIOS)})")
+
+    # Settings are read at import: measure the pipeline, not the content cache
+    workdir = tempfile.mkdtemp(prefix="bench-e2e-")
+    os.environ.setdefault("CONTENT_CACHE_BACKEND", "off")
+    os.environ.setdefault("INGEST_CHECKPOINT_DIR", os.path.join(workdir, "ingest"))
+
+    db = FakeSupabase(latency=args.db_latency, failure_rate=args.failure_rate)
+    genai_client = FakeGenaiClient(
+        latency=args.embed_latency,
+        failure_rate=args.failure_rate,
+        generate_latency=args.generate_latency
+    )
+    install_app_fakes(db, genai_client)
+    # Embedding quota is a property of the account, not the code
+    from app.services.pdf_services import pdf_service
+    pdf_service.embedding_engine.rate_limiter.rate = 0
+
+    corpus = make_corpus(args.documents, args.min_pages, args.max_pages, args.seed)
+    print(f"corpus: {len(corpus)} PDFs, {sum(d.pages for d in corpus)} pages", file=sys.stderr)
+    ctx = {"args": args, "db": db, "corpus": corpus}
+    scenarios = asyncio.run(run(args, ctx))
+
+    result = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            "fake_calls": {
+                "supabase_requests": db.requests,
+                "embed_requests": genai_client.models.calls,
+                "generate_requests": genai_client.models.generate_calls,
+            },
+        },
+        "scenarios": scenarios,
+    }
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(scenarios, indent=2))
+    print(f"results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("args") != result["meta"]["args"]:
+            print("warning: baseline was run with different arguments", file=sys.stderr)
+        regressions = compare(result, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        print(f"{len(regressions)} regressions against {args.compare} "
+              f"(tolerance {args.tolerance:.0%})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark: compact embedding storage, and what it costs in recall
+
+    bytes     - one 768-dim embedding as a Python list, JSON, the pgvector
+                literal, float16 and int8 (embedding_q), and in memory
+    payload   - a real ingestion (process_pdf against the fakes) per
+                storage mode: bytes of embedding columns sent to doc_chunks,
+                against the JSON lists sent before
+    recall    - recall@k of the local index at each dtype, with and without
+                re-scoring, against exact float32 search, plus memory per
+                chunk and query latency
+
+Embeddings are clustered (chunks around topic vectors, queries near the
+same topics), so the nearest neighbours of a query are close to each other
+and a lossy index has real ties to get wrong.
+
+Also checks that encode/decode round-trips within the dtype's error, that
+the pgvector literal is lossless, and that int8 with re-scoring keeps
+recall@k at 0.99 or better.
+
+Usage (from server/):
+    python -m benchmarks.bench_embedding_quantization --chunks 5000 --queries 200
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.bench_vector_index import make_chunks
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase, install_app_fakes, make_pdf
+
+KS = (4, 10, 20)
+# (label, index dtype, stored as, rescore factor)
+CONFIGS = (
+    ("float32", "float32", "float32", 1),
+    ("float16", "float16", "float32", 1),
+    ("int8", "int8", "float32", 1),
+    ("int8 rescore x2", "int8", "float32", 2),
+    ("int8 rescore x4", "int8", "float32", 4),
+    ("q:int8 -> int8", "int8", "int8", 4),
+    ("q:f16 -> int8 x4", "int8", "float16", 4),
+)
+
+
+def gemini_list(vector: np.ndarray) -> list:
+    """What the embedding API hands back: float32 values, shortest repr each."""
+    return [float(str(x)) for x in vector.astype(np.float32)]
+
+
+def vector_bytes() -> None:
+    from app.services.quantization_services import decode_vector, encode_vector, pgvector_literal
+
+    rng = np.random.default_rng(1)
+    vector = rng.normal(0, 0.036, 768).astype(np.float32)  # Gemini-like spread
+    as_list = gemini_list(vector)
+
+    f16, i8 = encode_vector(vector, "float16"), encode_vector(vector, "int8")
+    for text, tolerance in ((f16, 1e-3), (i8, np.abs(vector).max() / 127)):
+        assert np.abs(decode_vector(text) - vector).max() <= tolerance, text[:4]
+    assert np.array_equal(np.array(pgvector_literal(vector).strip("[]").split(","), dtype=np.float32), vector)
+
+    print(f"{'one embedding (768)':>26} {'bytes':>7}")
+    for name, size in (
+        ("Python list of floats", sys.getsizeof(as_list) + sum(sys.getsizeof(x) for x in as_list)),
+        ("JSON list (before)", len(json.dumps(as_list))),
+        ("pgvector literal", len(pgvector_literal(vector))),
+        ("float32 ndarray row", vector.nbytes),
+        ("embedding_q f16 (base64)", len(f16)),
+        ("embedding_q i8 (base64)", len(i8)),
+        ("int8 + scale in memory", 768 + 4),
+    ):
+        print(f"{name:>26} {size:>7}")
+
+
+def ingest_payload(pages: int) -> None:
+    from app.core.config import settings
+    from app.services.pdf_services import pdf_service
+
+    pdf_service.embedding_engine.rate_limiter.rate = 0
+    pdf = make_pdf(pages)
+    print(f"\ningestion of a {pages}-page PDF, embedding columns sent to doc_chunks:")
+    print(f"{'mode':>24} {'chunks':>7} {'KB':>8} {'B/chunk':>8} {'vs before':>10}")
+    baseline = None
+    for compact, store_full in (("off", True), ("float16", True), ("int8", True),
+                                ("float16", False), ("int8", False)):
+        settings.EMBEDDING_COMPACT_DTYPE = compact
+        settings.EMBEDDING_STORE_FULL = store_full
+        settings.RETRIEVAL_BACKEND = "rpc" if store_full else "local"
+        db = FakeSupabase(latency=0, per_row_latency=0)
+        install_app_fakes(db, FakeGenaiClient(latency=0, per_item_latency=0))
+        db.tables["documents"] = [{"id": "doc-q", "user_id": "user-1", "status": "processing"}]
+        result = pdf_service.process_pdf(pdf, "doc-q", db)
+        rows = [r for r in db.tables["doc_chunks"] if r["document_id"] == "doc-q"]
+        assert len(rows) == result["chunks_count"] > 0
+
+        columns = [{k: r[k] for k in ("embedding", "embedding_q") if k in r} for r in rows]
+        size = len(json.dumps(columns))
+        if baseline is None:
+            # Before: each row carried the API's float list as a JSON array
+            vectors = [np.array(r["embedding"].strip("[]").split(","), dtype=np.float32) for r in rows]
+            baseline = len(json.dumps([{"embedding": gemini_list(v)} for v in vectors]))
+            print(f"{'JSON lists (before)':>24} {len(rows):>7} {baseline / 1024:>8.0f} "
+                  f"{baseline / len(rows):>8.0f} {'':>10}")
+        label = ("full" if store_full else "") + ("+" if store_full and compact != "off" else "") \
+            + (compact if compact != "off" else "")
+        print(f"{label:>24} {len(rows):>7} {size / 1024:>8.0f} {size / len(rows):>8.0f} "
+              f"{100 * size / baseline:>9.0f}%")
+    settings.EMBEDDING_COMPACT_DTYPE, settings.EMBEDDING_STORE_FULL, settings.RETRIEVAL_BACKEND = "off", True, "rpc"
+
+
+def stored_rows(rows, stored_as: str):
+    from app.services.quantization_services import encode_vector
+
+    if stored_as == "float32":
+        return rows
+    return [{**row, "embedding": None, "embedding_q": encode_vector(row["embedding"], stored_as)} for row in rows]
+
+
+def recall(args) -> None:
+    from app.services.vector_services import DocumentVectors
+
+    rows, centers = make_chunks("doc-r", args.chunks)
+    rng = np.random.default_rng(2)
+    queries = [
+        (centers[i % len(centers)] + rng.normal(0, 0.35, centers.shape[1])).astype(np.float32)
+        for i in range(args.queries)
+    ]
+
+    exact = DocumentVectors(rows, "float32")
+    truth = {k: [{r["id"] for r in exact.search(q, -1.0, k)} for q in queries] for k in KS}
+
+    print(f"\nrecall@k vs exact float32, {args.chunks} chunks, {args.queries} queries:")
+    print(f"{'index':>18} {'B/chunk':>8} " + " ".join(f"{'@' + str(k):>6}" for k in KS) + f" {'p50 ms':>7}")
+    results = {}
+    for label, dtype, stored_as, factor in CONFIGS:
+        vectors = DocumentVectors(stored_rows(rows, stored_as), dtype, factor)
+        scores = []
+        for k in KS:
+            found = [{r["id"] for r in vectors.search(q, -1.0, k)} for q in queries]
+            scores.append(statistics.mean(len(f & t) / k for f, t in zip(found, truth[k])))
+        times = []
+        for q in queries:
+            start = time.perf_counter()
+            vectors.search(q, -1.0, 10)
+            times.append(time.perf_counter() - start)
+        per_chunk = vectors.matrix.nbytes / args.chunks
+        results[label] = (per_chunk, scores)
+        print(f"{label:>18} {per_chunk:>8.0f} " + " ".join(f"{s:>6.3f}" for s in scores)
+              + f" {statistics.median(times) * 1000:>7.3f}")
+
+    assert results["float32"][1] == [1.0] * len(KS)
+    assert results["int8"][0] <= 0.26 * results["float32"][0]
+    assert min(results["float16"][1]) >= 0.98, results["float16"]
+    assert min(results["int8 rescore x4"][1]) >= 0.99, results["int8 rescore x4"]
+    assert min(results["q:f16 -> int8 x4"][1]) >= 0.98, results["q:f16 -> int8 x4"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=40)
+    args = parser.parse_args()
+
+    os.environ["CONTENT_CACHE_BACKEND"] = "off"
+    install_app_fakes(FakeSupabase(latency=0), FakeGenaiClient(latency=0))
+    vector_bytes()
+    ingest_payload(args.pages)
+    recall(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: embedding throughput vs batch size and concurrency
+
+Runs EmbeddingEngine against FakeGenaiClient (50 ms per request plus
+0.5 ms per chunk) and prints chunks/sec for each configuration.
+The first row (batch_size=1, concurrency=1) matches the old serial loop.
+
+Usage (from server/):
+    python -m benchmarks.bench_embeddings --chunks 1000
+"""
+
+import argparse
+import time
+
+from app.services.embedding_services import EmbeddingEngine
+from benchmarks.fakes import FakeGenaiClient
+
+CONFIGS = [
+    (1, 1),
+    (10, 1),
+    (50, 1),
+    (100, 1),
+    (10, 4),
+    (50, 4),
+    (100, 4),
+    (100, 8),
+]
+
+
+def run(chunks: int, latency: float, failure_rate: float) -> None:
+    texts = [f"chunk {i} " + "lorem ipsum " * 80 for i in range(chunks)]
+
+    print(f"{'batch':>6} {'conc':>5} {'requests':>9} {'seconds':>8} {'chunks/s':>10}")
+    for batch_size, concurrency in CONFIGS:
+        client = FakeGenaiClient(latency=latency, failure_rate=failure_rate)
+        engine = EmbeddingEngine(
+            client,
+            batch_size=batch_size,
+            concurrency=concurrency,
+            requests_per_minute=0,  # no throttling: measure raw scaling
+            backoff_base=0.01
+        )
+
+        start = time.perf_counter()
+        vectors = engine.embed(texts)
+        elapsed = time.perf_counter() - start
+
+        assert len(vectors) == chunks
+        print(
+            f"{batch_size:>6} {concurrency:>5} {client.models.calls:>9} "
+            f"{elapsed:>8.2f} {chunks / elapsed:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    run(args.chunks, args.latency, args.failure_rate)
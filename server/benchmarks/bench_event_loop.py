@@ -0,0 +1,130 @@
+"""
+Load test: request latency with blocking vs off-loop SDK calls
+
+Fires N concurrent POST /files/{essay_id}/generate-section requests at the
+app (in-process, over ASGI) with fake Gemini and Supabase backends. All
+requests arrive at t=0, so latency is measured from that common start. A
+canary task sleeps 10 ms in a loop and records how late it wakes up, which
+is how long the event loop was blocked.
+
+Modes:
+    blocking  - run_gemini/run_db call the SDK inline on the event loop
+                (how the routes behaved before core/executors existed)
+    executor  - calls go through the bounded thread pools
+
+Usage (from server/):
+    python -m benchmarks.bench_event_loop --requests 50 --generate-latency 0.5
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase, fake_vector, install_app_fakes
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed(db: FakeSupabase, requests: int) -> str:
+    doc_id = "doc-1"
+    db.tables["doc_chunks"] = [
+        {
+            "id": f"chunk-{i}",
+            "document_id": doc_id,
+            "content": f"Finding {i}: " + "evidence " * 50,
+            "page_number": i + 1,
+            # Same vector as the "Results" query so every request finds context
+            "embedding": fake_vector("Results"),
+        }
+        for i in range(20)
+    ]
+    db.tables["essays"] = [
+        {"id": f"essay-{i}", "user_id": "user-1", "content": {}}
+        for i in range(requests)
+    ]
+    return doc_id
+
+
+async def run_mode(app, mode: str, requests: int) -> dict:
+    import httpx
+    from app.core import executors
+
+    async def inline(fn, *args, timeout=None, **kwargs):
+        return fn(*args, **kwargs)
+
+    originals = (executors.gemini_executor.run, executors.db_executor.run)
+    if mode == "blocking":
+        executors.gemini_executor.run = inline
+        executors.db_executor.run = inline
+
+    latencies = []
+    loop_lag = []
+    done = asyncio.Event()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+        async def one(i: int) -> None:
+            response = await client.post(
+                f"/files/essay-{i}/generate-section",
+                params={"header": "Results", "document_id": "doc-1"},
+                headers={"Authorization": "Bearer user-1"},
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - wall_start)
+
+        async def canary() -> None:
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                loop_lag.append(time.perf_counter() - start - 0.01)
+
+        poller = asyncio.create_task(canary())
+        wall_start = time.perf_counter()
+        try:
+            await asyncio.gather(*(one(i) for i in range(requests)))
+        finally:
+            wall = time.perf_counter() - wall_start
+            done.set()
+            await poller
+
+    executors.gemini_executor.run, executors.db_executor.run = originals
+
+    return {
+        "mode": mode,
+        "wall": wall,
+        "p50": statistics.median(latencies),
+        "p99": percentile(latencies, 99),
+        "max_lag": max(loop_lag) if loop_lag else float("nan"),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--generate-latency", type=float, default=0.5)
+    parser.add_argument("--db-latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    db = FakeSupabase(latency=args.db_latency)
+    genai_client = FakeGenaiClient(latency=0.05, generate_latency=args.generate_latency)
+    install_app_fakes(db, genai_client)
+    seed(db, args.requests)
+
+    from app.main import app
+
+    print(f"{args.requests} concurrent generate-section requests, "
+          f"Gemini generation {args.generate_latency:.2f}s")
+    print(f"{'mode':>9} {'wall s':>8} {'p50 s':>8} {'p99 s':>8} {'max loop lag s':>15}")
+    for mode in ("blocking", "executor"):
+        r = asyncio.run(run_mode(app, mode, args.requests))
+        print(f"{r['mode']:>9} {r['wall']:>8.2f} {r['p50']:>8.2f} {r['p99']:>8.2f} {r['max_lag']:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: PDF text extraction throughput and peak memory
+
+Generates text PDFs of several sizes and extracts them four ways, each in
+a fresh subprocess so peak RSS is not polluted by earlier runs:
+
+    legacy    - the old loop: BytesIO + PdfReader + full_text += page_text
+    stream    - PDFProcessingService.iter_pages with one worker (inline)
+    parallel  - iter_pages over a process pool of --workers processes,
+                started for this document (the first upload after a restart)
+    warm      - the same, timing a second document on the already started
+                pool (every later upload on a long-running server)
+
+Reports pages/sec and peak RSS of the extracting process. In parallel mode
+each pool worker only ever holds one page range. Parallel speedup needs as
+many free cores as workers; on fewer cores, parallel minus stream is the
+pool's overhead (process start-up, and each worker parsing the PDF once).
+Below EXTRACT_PARALLEL_MIN_PAGES the service extracts inline regardless of
+the worker count.
+
+Usage (from server/):
+    python -m benchmarks.bench_extraction --pages 200 500 1000 --workers 4
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+from benchmarks.fakes import make_pdf
+
+MODES = ("legacy", "stream", "parallel", "warm")
+
+
+def legacy_extract(file_bytes: bytes) -> int:
+    from pypdf import PdfReader
+
+    reader = PdfReader(BytesIO(file_bytes))
+    full_text = ""
+    page_content_map = {}
+    for page_num, page in enumerate(reader.pages, start=1):
+        page_text = page.extract_text() or ""
+        page_content_map[page_num] = page_text
+        full_text += page_text + "\n\n"
+    return len(page_content_map)
+
+
+def child(mode: str, path: str, workers: int) -> None:
+    """Runs one extraction and prints a JSON result line."""
+    os.environ.setdefault("GEMINI_API_KEY", "fake")
+    os.environ["EXTRACT_WORKERS"] = str(workers if mode in ("parallel", "warm") else 1)
+    # Measure the pool itself, whatever the page threshold is set to
+    os.environ["EXTRACT_PARALLEL_MIN_PAGES"] = "0" if mode in ("parallel", "warm") else "1000000"
+    from app.services.pdf_services import PDFProcessingService
+
+    with open(path, "rb") as f:
+        file_bytes = f.read()
+
+    service = PDFProcessingService()
+    if mode == "warm":
+        # Starts the workers on a different document first
+        for _ in service.iter_pages(make_pdf(workers * 2, seed=1)):
+            pass
+
+    start = time.perf_counter()
+    if mode == "legacy":
+        pages = legacy_extract(file_bytes)
+    else:
+        pages = 0
+        for _ in service.iter_pages(file_bytes):
+            pages += 1
+    elapsed = time.perf_counter() - start
+    service.shutdown()
+
+    # ru_maxrss is in KiB on Linux
+    print(json.dumps({
+        "pages": pages,
+        "seconds": elapsed,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[200, 500, 1000])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], args.workers)
+        return
+
+    print(f"{'pages':>6} {'mode':>9} {'seconds':>8} {'pages/s':>8} {'peak rss MB':>12}")
+    for pages in args.pages:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+            tmp.write(make_pdf(pages))
+            path = tmp.name
+        try:
+            for mode in MODES:
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_extraction",
+                     "--workers", str(args.workers), "--child", mode, path],
+                    check=True, capture_output=True, text=True
+                ).stdout.strip().splitlines()[-1]
+                r = json.loads(out)
+                print(
+                    f"{pages:>6} {mode:>9} {r['seconds']:>8.2f} "
+                    f"{r['pages'] / r['seconds']:>8.1f} {r['rss_mb']:>12.1f}"
+                )
+        finally:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
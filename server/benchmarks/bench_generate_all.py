@@ -0,0 +1,92 @@
+"""
+Benchmark: generating a whole outline, sequential vs generate-all
+
+Seeds an essay with a 7-section outline and times, over ASGI with fake
+backends (Gemini generation --generate-latency seconds):
+
+    sequential    - one POST /files/{id}/generate-section per header, in turn,
+                    as the client does today
+    generate-all  - a single POST /files/{id}/generate-all
+
+A --failure-rate > 0 shows partial results being returned.
+
+Usage (from server/):
+    python -m benchmarks.bench_generate_all --generate-latency 1.0
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase, install_app_fakes
+
+HEADERS = ["Introduction", "Background", "Methodology", "Results",
+           "Discussion", "Limitations", "Conclusion"]
+
+
+def seed(db: FakeSupabase) -> None:
+    db.tables["doc_chunks"] = [
+        {"id": f"chunk-{i}", "document_id": "doc-1", "content": f"Finding {i}. " * 40,
+         "page_number": i + 1}
+        for i in range(12)
+    ]
+    outline = {"title": "Essay", "outline": [{"header": h, "description": ""} for h in HEADERS]}
+    db.tables["essays"] = [
+        {"id": essay_id, "user_id": "user-1", "doc_id": "doc-1",
+         "outline": json.dumps(outline), "content": {}}
+        for essay_id in ("essay-seq", "essay-all")
+    ]
+    # Retrieval quality is not under test: return the first chunks
+    db.rpcs["match_doc_chunks"] = lambda db, params: [
+        {**row, "similarity": 0.9} for row in db.tables["doc_chunks"][:params["match_count"]]
+    ]
+
+
+async def run(app) -> None:
+    import httpx
+
+    auth = {"Authorization": "Bearer user-1"}
+    # Sequential requests that hit an injected failure come back as 500s
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        failed = 0
+        start = time.perf_counter()
+        for header in HEADERS:
+            response = await client.post(
+                "/files/essay-seq/generate-section",
+                params={"header": header, "document_id": "doc-1"},
+                headers=auth,
+            )
+            failed += response.status_code != 200
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = await client.post("/files/essay-all/generate-all", headers=auth)
+        parallel = time.perf_counter() - start
+        body = response.json()
+
+    print(f"{len(HEADERS)} sections")
+    print(f"  sequential   : {sequential:6.2f} s ({len(HEADERS)} requests, {failed} failed)")
+    print(f"  generate-all : {parallel:6.2f} s (1 request, status {body['status']}, "
+          f"{len(body['sections'])} ok, {len(body['errors'])} failed)")
+    print(f"  speedup      : {sequential / parallel:.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--generate-latency", type=float, default=1.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    db = FakeSupabase(latency=0.01)
+    install_app_fakes(db, FakeGenaiClient(generate_latency=args.generate_latency,
+                                          failure_rate=args.failure_rate))
+    seed(db)
+
+    from app.main import app
+    asyncio.run(run(app))
+
+
+if __name__ == "__main__":
+    main()
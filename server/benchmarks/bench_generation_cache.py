@@ -0,0 +1,156 @@
+"""
+Benchmark: POST /files/{id}/generate-section with the generation cache
+
+A section is generated once (miss), then regenerated --repeats times with
+the same header and chunks (hits), then once with force=true (bypass).
+Gemini charges --generate-latency per call, as in production it is
+seconds, not milliseconds.
+
+Also checks:
+    - hits make no Gemini call and return the same text, "cached": true
+    - different chunks (the document changed) or different instructions
+      miss; force regenerates and replaces the entry
+    - the stream endpoint answers a cached section in one token event
+    - the disk tier survives a restart (a new cache on the same file hits)
+    - entries expire after the TTL, and the memory tier evicts LRU-first
+    - hit rate and tokens / seconds saved appear on GET /metrics
+
+Usage (from server/):
+    python -m benchmarks.bench_generation_cache --repeats 50 --generate-latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase, fake_vector, install_app_fakes
+
+AUTH = {"Authorization": "Bearer user-1"}
+PARAMS = {"header": "Results", "document_id": "doc-1"}
+
+
+def seed(db: FakeSupabase, finding: str = "Finding") -> None:
+    db.tables["doc_chunks"] = [
+        {"id": f"chunk-{i}", "document_id": "doc-1", "content": f"{finding} {i}. " * 40,
+         "page_number": i + 1, "embedding": fake_vector("Results")}
+        for i in range(8)
+    ]
+    db.tables["essays"] = [{"id": "essay-1", "user_id": "user-1", "content": {}}]
+
+
+async def timed_post(client, path: str, params: dict):
+    start = time.perf_counter()
+    response = await client.post(path, params=params, headers=AUTH)
+    assert response.status_code == 200, response.text
+    return time.perf_counter() - start, response
+
+
+def check_tiers(tmp: str) -> None:
+    from app.services.cache_services import DiskBackend, GenerationCache, MemoryBackend, TieredBackend
+
+    path = os.path.join(tmp, "restart.sqlite3")
+    key = GenerationCache.key("model", "Header", "", "context")
+    for other in (("model-2", "Header", "", "context"), ("model", "Header", "Be brief", "context"),
+                  ("model", "Header", "", "context."), ("model", "Header 2", "", "context")):
+        assert GenerationCache.key(*other) != key, f"{other} shares a key"
+    GenerationCache(DiskBackend(path, 100), ttl_seconds=60).put(key, "text", 100, 50, 1.5)
+    # A new process: empty memory tier, same file
+    restarted = GenerationCache(TieredBackend(MemoryBackend(10), DiskBackend(path, 100)), ttl_seconds=60)
+    assert restarted.get(key) == "text", "disk tier lost the entry"
+    assert restarted.saved_output_tokens == 50
+
+    expiring = GenerationCache(MemoryBackend(10), ttl_seconds=0.05)
+    expiring.put(key, "text")
+    time.sleep(0.1)
+    assert expiring.get(key) is None and expiring.expired == 1, "entry outlived its TTL"
+
+    lru = GenerationCache(MemoryBackend(2), ttl_seconds=60)
+    keys = [GenerationCache.key("model", f"Header {i}", "", "context") for i in range(3)]
+    lru.put(keys[0], "a")
+    lru.put(keys[1], "b")
+    lru.get(keys[0])  # keys[1] is now least recently used
+    lru.put(keys[2], "c")
+    assert lru.get(keys[1]) is None and lru.get(keys[0]) == "a", "memory tier did not evict LRU-first"
+    print("keys and tiers ok: key covers model, header, instructions and context; disk entry survived a restart, TTL expiry, LRU eviction")
+
+
+async def run(args, db: FakeSupabase, genai: FakeGenaiClient) -> None:
+    import httpx
+
+    from app.main import app
+    from app.services.cache_services import generation_cache
+
+    assert generation_cache.enabled
+    path = "/files/essay-1/generate-section"
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        miss, first = await timed_post(client, path, PARAMS)
+        assert first.json()["cached"] is False
+
+        calls = genai.models.generate_calls
+        hits = []
+        for _ in range(args.repeats):
+            seconds, response = await timed_post(client, path, PARAMS)
+            assert response.json()["cached"] is True
+            assert response.json()["content"] == first.json()["content"]
+            hits.append(seconds)
+        assert genai.models.generate_calls == calls, "a cache hit called Gemini"
+
+        forced, response = await timed_post(client, path, {**PARAMS, "force": "true"})
+        assert response.json()["cached"] is False and genai.models.generate_calls == calls + 1
+
+        # Same header, but the document's chunks changed → miss
+        seed(db, finding="Revised finding")
+        _, response = await timed_post(client, path, PARAMS)
+        assert response.json()["cached"] is False, "changed context was served from the cache"
+        _, response = await timed_post(client, path, PARAMS)
+        assert response.json()["cached"] is True
+
+        # The stream endpoint shares the entries
+        streams = genai.models.stream_calls
+        response = await client.post(path + "/stream", params=PARAMS, headers=AUTH)
+        assert response.status_code == 200
+        tokens = response.text.count("event: token")
+        assert tokens == 1 and genai.models.stream_calls == streams, f"{tokens} token events from a cached section"
+
+        metrics = (await client.get("/metrics")).text
+
+    stats = generation_cache.stats()
+    assert stats["hits"] == args.repeats + 2 and stats["bypasses"] == 1, stats
+    for line in ('generation_cache_requests_total{result="hit"}',
+                 'generation_cache_saved_tokens_total{kind="output"}',
+                 "generation_cache_saved_seconds_total"):
+        assert line in metrics, f"{line} missing from /metrics"
+
+    print(f"generate-section, Gemini {args.generate_latency:.2f} s per call:")
+    print(f"  miss          : {miss * 1000:8.1f} ms")
+    print(f"  hit  (median) : {statistics.median(hits) * 1000:8.1f} ms  over {args.repeats} repeats "
+          f"(p99 {sorted(hits)[int(0.99 * (len(hits) - 1))] * 1000:.1f} ms)")
+    print(f"  force         : {forced * 1000:8.1f} ms")
+    print(f"cache: hit rate {stats['hit_rate']:.2f}, saved {stats['saved_prompt_tokens']} prompt + "
+          f"{stats['saved_output_tokens']} output tokens, {stats['saved_seconds']:.1f} s of generation")
+    assert statistics.median(hits) < args.generate_latency / 10, "hits are not much faster than generating"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--generate-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["CACHE_DIR"] = tmp
+        os.environ["GENERATION_CACHE_BACKEND"] = "tiered"
+        db = FakeSupabase(latency=0.002)
+        genai = FakeGenaiClient(latency=0.01, generate_latency=args.generate_latency)
+        install_app_fakes(db, genai)
+        seed(db)
+
+        check_tiers(tmp)
+        asyncio.run(run(args, db, genai))
+
+
+if __name__ == "__main__":
+    main()
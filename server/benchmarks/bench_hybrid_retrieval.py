@@ -0,0 +1,209 @@
+"""
+Benchmark: retrieval quality and cost, vector-only vs hybrid (vector + BM25)
+
+Synthetic corpus: --chunks chunks spread over 20 topics. Embeddings encode
+only the topic (topic center + noise), the way real embeddings blur rare
+names. Two query sets:
+
+    entity   - "<Name> <topic word>": the answer is the 2 chunks that
+               mention a made-up proper noun; recall@4
+    topical  - two topic words, embedding near the topic center; any chunk
+               of that topic is relevant; precision@4 (hybrid must not hurt)
+
+Also reports the per-query cost hybrid adds on top of the vector search
+(local NumPy index here, so network time doesn't hide it), index build
+time, and stored index size. A final check runs get_grounding_context
+end to end against the fakes, and a cold backfill / disk load of a large
+index must not stall the event loop.
+
+Usage (from server/):
+    python -m benchmarks.bench_hybrid_retrieval --chunks 500 --queries 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase, install_app_fakes
+
+TOPICS = 20
+MATCH_COUNT = 4
+THRESHOLD = 0.4
+
+
+def pseudo_word(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou") for _ in range(length // 2))
+
+
+def make_corpus(n_chunks: int, n_entities: int, dim: int = 768):
+    rng = random.Random(0)
+    nprng = np.random.default_rng(0)
+    vocab = [[pseudo_word(rng, 8) for _ in range(30)] for _ in range(TOPICS)]
+    common = [pseudo_word(rng, 6) for _ in range(200)]
+    centers = nprng.normal(0, 1, (TOPICS, dim)).astype(np.float32)
+
+    chunks = []
+    for i in range(n_chunks):
+        topic = i % TOPICS
+        words = [rng.choice(vocab[topic]) for _ in range(40)] + [rng.choice(common) for _ in range(120)]
+        rng.shuffle(words)
+        chunks.append({
+            "id": f"chunk-{i:05d}",
+            "document_id": "doc-1",
+            "topic": topic,
+            "words": words,
+            "page_number": i // 3 + 1,
+            "embedding": (centers[topic] + nprng.normal(0, 0.6, dim)).tolist(),
+        })
+
+    # Each entity is mentioned in two chunks of one topic
+    entities = []
+    for e in range(n_entities):
+        name = pseudo_word(rng, 10).capitalize()
+        topic = e % TOPICS
+        members = rng.sample([c for c in chunks if c["topic"] == topic], 2)
+        for chunk in members:
+            chunk["words"].insert(rng.randrange(len(chunk["words"])), name)
+        entities.append((name, topic, {c["id"] for c in members}))
+
+    for chunk in chunks:
+        chunk["content"] = " ".join(chunk.pop("words")) + "."
+    return chunks, centers, vocab, entities
+
+
+def query_embedding(centers, topic: int, rng) -> list:
+    return (centers[topic] + rng.normal(0, 0.6, centers.shape[1])).tolist()
+
+
+async def max_stall(coro) -> float:
+    """Awaits coro while a canary task yields to the loop; its longest gap."""
+    gaps, done = [0.0], False
+
+    async def canary():
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    task = asyncio.create_task(canary())
+    await asyncio.sleep(0)
+    try:
+        await coro
+    finally:
+        done = True
+        await task
+    return max(gaps)
+
+
+async def run(args, db: FakeSupabase) -> None:
+    from app.core.config import settings
+    from app.services.lexical_services import BM25Index, LexicalIndexStore, reciprocal_rank_fusion
+    from app.services.vector_services import VectorIndex
+
+    chunks, centers, vocab, entities = make_corpus(args.chunks, args.queries)
+    by_content = {c["content"]: c for c in chunks}
+    db.tables["doc_chunks"] = chunks
+
+    vectors = VectorIndex(max_bytes=1 << 30, supabase_client=db)
+    await vectors.get_document("doc-1")
+
+    start = time.perf_counter()
+    index = BM25Index.build(chunks)
+    build_time = time.perf_counter() - start
+    stored = index.to_bytes()
+    assert BM25Index.from_bytes(stored).search("x " + entities[0][0], 4) == index.search("x " + entities[0][0], 4)
+
+    rng = np.random.default_rng(1)
+    candidates = max(MATCH_COUNT, settings.HYBRID_CANDIDATES)
+    vector_times, hybrid_extra = [], []
+
+    async def retrieve(text, embedding):
+        start = time.perf_counter()
+        vector_hits = await vectors.search("doc-1", embedding, THRESHOLD, candidates)
+        mid = time.perf_counter()
+        fused = reciprocal_rank_fusion([vector_hits, index.search(text, candidates)], limit=MATCH_COUNT)
+        end = time.perf_counter()
+        vector_times.append(mid - start)
+        hybrid_extra.append(end - mid)
+        return vector_hits[:MATCH_COUNT], fused
+
+    entity_recall = {"vector": [], "hybrid": []}
+    for name, topic, relevant in entities:
+        text = f"{name} {random.Random(name).choice(vocab[topic])}"
+        vector_only, hybrid = await retrieve(text, query_embedding(centers, topic, rng))
+        for mode, rows in (("vector", vector_only), ("hybrid", hybrid)):
+            found = {by_content[r["content"]]["id"] for r in rows}
+            entity_recall[mode].append(len(found & relevant) / len(relevant))
+
+    topical_precision = {"vector": [], "hybrid": []}
+    for q in range(args.queries):
+        topic = q % TOPICS
+        text = " ".join(random.Random(q).sample(vocab[topic], 2))
+        vector_only, hybrid = await retrieve(text, query_embedding(centers, topic, rng))
+        for mode, rows in (("vector", vector_only), ("hybrid", hybrid)):
+            on_topic = sum(by_content[r["content"]]["topic"] == topic for r in rows)
+            topical_precision[mode].append(on_topic / MATCH_COUNT)
+
+    assert statistics.mean(entity_recall["hybrid"]) > statistics.mean(entity_recall["vector"])
+    assert statistics.mean(topical_precision["hybrid"]) >= statistics.mean(topical_precision["vector"]) - 0.05
+
+    # End to end: backfilled index, hybrid get_grounding_context via the RPC path
+    from app.services import essay_services
+
+    with tempfile.TemporaryDirectory() as tmp:
+        essay_services.lexical_index = LexicalIndexStore(os.path.join(tmp, "lexical.sqlite3"), 100, 10, db)
+        name, topic, relevant = entities[0]
+        context = await essay_services.get_grounding_context(f"{name} findings", "doc-1")
+        assert name in context, "hybrid retrieval did not surface the entity chunk"
+        assert essay_services.lexical_index.backfills == 1
+
+        # A cold backfill and a cold load (disk, not the LRU) must not stall
+        # the loop for the length of the build / decompression
+        big = [{**c, "document_id": "doc-big", "content": f"{c['content']} {i}"}
+               for i in range(20) for c in chunks]
+        db.tables["doc_chunks"] = chunks + big
+        start = time.perf_counter()
+        BM25Index.build(big)
+        big_build = time.perf_counter() - start
+        stalls = []
+        for store in (LexicalIndexStore(os.path.join(tmp, "big.sqlite3"), 100, 10, db),
+                      LexicalIndexStore(os.path.join(tmp, "big.sqlite3"), 100, 10, db)):
+            stalls.append(await max_stall(store.search("doc-big", entities[0][0], 4)))
+        assert max(stalls) < big_build / 2, f"loop stalled {max(stalls) * 1000:.1f} ms (build {big_build * 1000:.1f} ms)"
+
+    raw_bytes = sum(len(c["content"].encode()) for c in chunks)
+    mean = statistics.mean
+    print(f"{args.chunks} chunks, {TOPICS} topics, {args.queries} entity + {args.queries} topical queries")
+    print(f"{'':>10} {'entity recall@4':>16} {'topical precision@4':>20}")
+    for mode in ("vector", "hybrid"):
+        print(f"{mode:>10} {mean(entity_recall[mode]):>16.3f} {mean(topical_precision[mode]):>20.3f}")
+    print(f"per query: vector search p50 {statistics.median(vector_times) * 1000:.3f} ms, "
+          f"BM25 + fusion adds p50 {statistics.median(hybrid_extra) * 1000:.3f} ms")
+    print(f"index: built in {build_time * 1000:.1f} ms, stored {len(stored) / 1024:.1f} KiB "
+          f"(chunk text {raw_bytes / 1024:.1f} KiB, embeddings {args.chunks * 768 * 4 / 1024:.1f} KiB)")
+    print("end-to-end get_grounding_context: entity chunk retrieved, index backfilled once")
+    print(f"cold lexical search on {len(big)} chunks: loop stalled at most {stalls[0] * 1000:.1f} ms (backfill), "
+          f"{stalls[1] * 1000:.1f} ms (disk load); the build alone takes {big_build * 1000:.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    db = FakeSupabase(latency=0.0, per_row_latency=0.0)
+    install_app_fakes(db, FakeGenaiClient(latency=0.0))
+    asyncio.run(run(args, db))
+
+
+if __name__ == "__main__":
+    main()
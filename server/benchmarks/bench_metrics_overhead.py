@@ -0,0 +1,195 @@
+"""
+Benchmark: cost of the built-in metrics, and what /metrics reports
+
+    primitives - ns per span(), counter inc and histogram observe, with
+                 metrics on and off
+    requests   - POST /files/{id}/generate-section against zero-latency
+                 fakes (the worst case: the request is nothing but our own
+                 code), metrics off vs on with Server-Timing headers;
+                 rounds alternate so drift hits both modes alike
+
+Also checks:
+    - the Server-Timing header names every generate-section stage
+    - rag_stage_seconds counts one timing per stage per request, and
+      gemini_tokens_total / rag_chunks_retrieved_total add up
+    - an ingestion records extract, chunk, embed, store, digest and ingest,
+      and the chunk and row counters match what was stored
+    - every line of GET /metrics is valid Prometheus text, and histogram
+      buckets are cumulative
+
+Usage (from server/):
+    python -m benchmarks.bench_metrics_overhead --requests 300 --rounds 5
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import time
+
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase, fake_vector, install_app_fakes, make_pdf
+
+AUTH = {"Authorization": "Bearer user-1"}
+PARAMS = {"header": "Results", "document_id": "doc-1"}
+STAGES = ("embed_query", "match_rpc", "lexical_search", "assemble_context", "generate", "essay_write")
+INGEST_STAGES = ("extract", "chunk", "embed", "store", "digest", "ingest")
+
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\]|\\.)*",?)*\})? [-+0-9.eEInf]+$')
+
+
+def seed(db: FakeSupabase) -> None:
+    db.tables["doc_chunks"] = [
+        {"id": f"chunk-{i}", "document_id": "doc-1", "content": f"Finding {i}. " * 40,
+         "page_number": i + 1, "embedding": fake_vector("Results")}
+        for i in range(8)
+    ]
+    db.tables["essays"] = [{"id": "essay-1", "user_id": "user-1", "content": {}}]
+    db.tables["documents"] = [{"id": "doc-ingest", "user_id": "user-1", "status": "ingested"}]
+
+
+def per_op_ns(fn, n: int = 200_000) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e9
+
+
+def primitives() -> None:
+    from app.core.metrics import REGISTRY, span
+
+    counter = REGISTRY.counter("bench_ops_total", "bench", ("kind",)).labels("x")
+    histogram = REGISTRY.histogram("bench_op_seconds", "bench", ("kind",)).labels("x")
+
+    def one_span():
+        with span("bench"):
+            pass
+
+    print(f"{'primitive':>18} {'on ns':>8} {'off ns':>8}")
+    for name, fn in (("span()", one_span), ("counter.inc", counter.inc),
+                     ("histogram.observe", lambda: histogram.observe(0.01))):
+        REGISTRY.enabled = True
+        on = per_op_ns(fn)
+        REGISTRY.enabled = False
+        off = per_op_ns(fn)
+        print(f"{name:>18} {on:>8.0f} {off:>8.0f}")
+    REGISTRY.enabled = True
+
+
+def parse(text: str) -> dict:
+    """metric name + labels → value, validating every line on the way."""
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith("#"):
+            assert re.match(r"^# (HELP|TYPE) [a-zA-Z_:][a-zA-Z0-9_:]* .+$", line), line
+            continue
+        assert SAMPLE.match(line), f"not Prometheus text: {line!r}"
+        key, _, value = line.rpartition(" ")
+        samples[key] = float(value)
+    return samples
+
+
+def check_buckets(samples: dict, name: str) -> None:
+    series = {}
+    for key, value in samples.items():
+        if key.startswith(name + "_bucket{"):
+            labels = re.sub(r',?le="[^"]*"', "", key[len(name + "_bucket"):])
+            series.setdefault(labels, []).append(value)
+    assert series, f"no {name} buckets"
+    for labels, counts in series.items():
+        assert counts == sorted(counts), f"{name}{labels} buckets are not cumulative"
+        assert samples[f"{name}_count{labels}"] == counts[-1], f"{name}{labels} count != +Inf bucket"
+
+
+async def timed_requests(client, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        response = await client.post("/files/essay-1/generate-section", params=PARAMS, headers=AUTH)
+        assert response.status_code == 200, response.text
+    return (time.perf_counter() - start) / n
+
+
+async def run(args, db: FakeSupabase) -> None:
+    import httpx
+
+    from app.core.metrics import REGISTRY
+    from app.main import app
+    from app.services.pdf_services import pdf_service
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        # Server-Timing names every stage of the request
+        response = await client.post("/files/essay-1/generate-section", params=PARAMS, headers=AUTH)
+        timing = response.headers.get("server-timing", "")
+        named = {part.split(";")[0].strip() for part in timing.split(",")}
+        assert set(STAGES) | {"total"} <= named, f"Server-Timing missing stages: {timing}"
+        print(f"Server-Timing: {timing}")
+
+        before = parse((await client.get("/metrics")).text)
+        await timed_requests(client, 20)
+        after = parse((await client.get("/metrics")).text)
+        for stage in STAGES:
+            key = f'rag_stage_seconds_count{{stage="{stage}"}}'
+            assert after[key] - before.get(key, 0) == 20, f"{stage}: {after[key] - before.get(key, 0)} timings"
+        tokens = 'gemini_tokens_total{operation="generate",kind="output"}'
+        assert after[tokens] > before[tokens]
+        assert after["rag_chunks_retrieved_total"] > before["rag_chunks_retrieved_total"]
+        route = 'http_request_duration_seconds_count{method="POST",route="/files/{essay_id}/generate-section",status="200"}'
+        assert after[route] - before[route] == 20, "requests not recorded by route template"
+
+        # Overhead: off vs on, alternating rounds, after a warm-up
+        await timed_requests(client, args.requests // 5)
+        results = {"off": [], "on": []}
+        for _ in range(args.rounds):
+            for mode in ("off", "on"):
+                REGISTRY.enabled = mode == "on"
+                results[mode].append(await timed_requests(client, args.requests))
+        REGISTRY.enabled = True
+
+        # Ingestion stages, off the request path
+        pdf_service.embedding_engine.rate_limiter.rate = 0
+        before = parse((await client.get("/metrics")).text)
+        result = await asyncio.to_thread(pdf_service.process_pdf, make_pdf(30), "doc-ingest", db)
+        text = (await client.get("/metrics")).text
+        after = parse(text)
+
+    for stage in INGEST_STAGES:
+        key = f'rag_stage_seconds_count{{stage="{stage}"}}'
+        assert after.get(key, 0) > before.get(key, 0), f"ingestion stage {stage} not recorded"
+    chunks = 'ingest_chunks_total{source="extracted"}'
+    assert after[chunks] - before.get(chunks, 0) == result["chunks_count"]
+    rows = 'storage_rows_written_total{table="doc_chunks"}'
+    stored = sum(1 for r in db.tables["doc_chunks"] if r["document_id"] == "doc-ingest")
+    assert after[rows] - before.get(rows, 0) == stored == result["chunks_count"]
+    assert after['ingest_documents_total{outcome="completed"}'] >= 1
+    for name in ("rag_stage_seconds", "http_request_duration_seconds", "executor_queue_wait_seconds"):
+        check_buckets(after, name)
+
+    off, on = statistics.median(results["off"]), statistics.median(results["on"])
+    stage_ms = {s: after['rag_stage_seconds_sum{stage="%s"}' % s] * 1000 for s in INGEST_STAGES}
+    print(f"ingestion: {result['chunks_count']} chunks; "
+          + ", ".join(f"{s} {ms:.0f} ms" for s, ms in stage_ms.items()))
+    print(f"/metrics: {len(text.splitlines())} lines, {len(text) / 1024:.1f} KB, all valid")
+    print(f"generate-section, zero-latency fakes, median of {args.rounds} rounds x {args.requests}:")
+    print(f"  metrics off : {off * 1e6:8.0f} us/request")
+    print(f"  metrics on  : {on * 1e6:8.0f} us/request (+{(on - off) * 1e6:.0f} us, {100 * (on - off) / off:+.1f}%)")
+    assert on - off < 0.15 * off, "metrics overhead above 15% even on an all-local request"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ["METRICS_TIMING_HEADERS"] = "true"
+    os.environ["CONTENT_CACHE_BACKEND"] = "off"
+    db = FakeSupabase(latency=0)
+    install_app_fakes(db, FakeGenaiClient(latency=0, per_item_latency=0, generate_latency=0))
+    seed(db)
+
+    primitives()
+    asyncio.run(run(args, db))
+
+
+if __name__ == "__main__":
+    main()
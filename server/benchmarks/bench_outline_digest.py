@@ -0,0 +1,126 @@
+"""
+Benchmark: generate-outline summary, first chunks vs all chunks vs digest
+
+A synthetic --pages page document has --topics chapters in reading order;
+each chunk's text and embedding come from its chapter's topic. The outline
+prompt is built three ways:
+
+    first-5  - the first 5 chunks by page (what create_outline used to send)
+    all      - every chunk (the naive fix)
+    digest   - documents.digest from digest_services.build_digest
+
+Reports prompt size (tokens estimated as chars / 4), chapter coverage (how
+many chapters the summary draws from), and generate_outline latency with a
+fake model charging --base-latency plus prompt tokens / --prefill-tps.
+Also times building the digest at ingest, and checks that
+POST /files/generate-outline sends the stored digest.
+
+Usage (from server/):
+    python -m benchmarks.bench_outline_digest --pages 200 --topics 15
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import numpy as np
+
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase, install_app_fakes
+
+
+def make_document(pages: int, topics: int, chunks_per_page: int = 3, dim: int = 768):
+    rng = random.Random(0)
+    nprng = np.random.default_rng(0)
+    vocab = [[f"t{t}w{w}" for w in range(25)] for t in range(topics)]
+    centers = nprng.normal(0, 1, (topics, dim)).astype(np.float32)
+
+    n = pages * chunks_per_page
+    chunks, embeddings = [], []
+    for i in range(n):
+        chapter = i * topics // n
+        words = [rng.choice(vocab[chapter]) for _ in range(160)]
+        chunks.append({
+            "content": f"[ch{chapter}] " + " ".join(words),
+            "page_number": i // chunks_per_page + 1,
+            "chapter": chapter,
+        })
+        embeddings.append(centers[chapter] + nprng.normal(0, 0.8, dim).astype(np.float32))
+    return chunks, np.array(embeddings)
+
+
+def chapters_in(summary: str, topics: int) -> int:
+    return sum(f"[ch{t}]" in summary for t in range(topics))
+
+
+async def run(args, genai_client: FakeGenaiClient, db: FakeSupabase) -> None:
+    import httpx
+    from app.main import app
+    from app.services.ai_services import AIService
+    from app.services.digest_services import build_digest
+
+    chunks, embeddings = make_document(args.pages, args.topics)
+
+    start = time.perf_counter()
+    digest = build_digest(chunks, embeddings)
+    build_seconds = time.perf_counter() - start
+
+    summaries = {
+        "first-5": "\n".join(c["content"] for c in chunks[:5]),
+        "all": "\n".join(c["content"] for c in chunks),
+        "digest": digest,
+    }
+
+    ai = AIService(client=genai_client)
+    rows = []
+    for name, summary in summaries.items():
+        start = time.perf_counter()
+        await ai.generate_outline("Essay topic", summary)
+        seconds = time.perf_counter() - start
+        rows.append((name, genai_client.models.last_prompt_tokens, chapters_in(summary, args.topics), seconds))
+
+    # The API path sends the stored digest
+    db.tables["documents"] = [{"id": "doc-1", "user_id": "user-1", "digest": digest}]
+    db.tables["essays"] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        response = await client.post("/files/generate-outline",
+                                     json={"document_id": "doc-1", "topic": "Essay topic"},
+                                     headers={"Authorization": "Bearer user-1"})
+        assert response.status_code == 200, response.text
+    assert genai_client.models.last_prompt_tokens == rows[2][1], "API did not use the digest"
+
+    n = len(chunks)
+    print(f"{args.pages} pages, {n} chunks, {args.topics} chapters; "
+          f"digest built at ingest in {build_seconds * 1000:.0f} ms")
+    print(f"{'summary':>8} {'prompt tokens':>14} {'chapters':>9} {'outline s':>10}")
+    for name, tokens, chapters, seconds in rows:
+        print(f"{name:>8} {tokens:>14} {chapters:>6}/{args.topics:<2} {seconds:>10.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--topics", type=int, default=15)
+    parser.add_argument("--base-latency", type=float, default=0.5)
+    parser.add_argument("--prefill-tps", type=float, default=20000)
+    args = parser.parse_args()
+
+    genai_client = FakeGenaiClient(generate_latency=args.base_latency)
+    models = genai_client.models
+    generate = models.generate_content
+
+    def sized_generate(model, contents, config=None):
+        # Latency grows with prompt size: base + prefill time
+        models.last_prompt_tokens = len(contents) // 4
+        time.sleep(models.last_prompt_tokens / args.prefill_tps)
+        return generate(model=model, contents=contents, config=config)
+
+    models.generate_content = sized_generate
+    db = FakeSupabase(latency=0.005)
+    install_app_fakes(db, genai_client)
+    asyncio.run(run(args, genai_client, db))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark: query-embedding cache on the retrieval path
+
+Replays a skewed stream of section headers (a few, like "Introduction",
+are requested far more often than the rest) through AIService.get_embedding,
+in waves of concurrent requests, with FakeGenaiClient charging 100 ms per
+embed call. Compares calling Gemini every time with QueryEmbeddingCache.
+
+Also checks that cancelling the request whose miss started a fetch (the
+client disconnected) leaves the requests coalesced onto it with the
+embedding, from that one API call.
+
+Usage (from server/):
+    python -m benchmarks.bench_query_cache --requests 400 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "fake")
+
+from app.services import ai_services
+from app.services.ai_services import AIService
+from app.services.cache_services import QueryEmbeddingCache
+from benchmarks.fakes import FakeGenaiClient
+
+HEADERS = ["Introduction", "Conclusion", "Methodology", "Results", "Discussion",
+           "Literature Review", "Background", "Limitations", "Future Work"]
+
+
+def header_stream(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(HEADERS))]
+    # Real users vary case and spacing; the cache normalizes these
+    variants = [lambda h: h, str.lower, lambda h: f" {h} "]
+    return [rng.choice(variants)(rng.choices(HEADERS, weights)[0]) for _ in range(n)]
+
+
+async def replay(ai: AIService, headers, concurrency: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(headers), concurrency):
+        await asyncio.gather(*(ai.get_embedding(h) for h in headers[i:i + concurrency]))
+    return time.perf_counter() - start
+
+
+async def uncached(ai: AIService, headers, concurrency: int) -> float:
+    class NoCache:
+        async def get_or_compute(self, model, task_type, text, compute):
+            return await compute()
+
+    original = ai_services.query_embedding_cache
+    ai_services.query_embedding_cache = NoCache()
+    try:
+        return await replay(ai, headers, concurrency)
+    finally:
+        ai_services.query_embedding_cache = original
+
+
+async def check_cancelled_owner(latency: float) -> None:
+    cache = QueryEmbeddingCache(10, 3600)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(latency)
+        return [1.0, 2.0]
+
+    owner = asyncio.create_task(cache.get_or_compute("model", "RETRIEVAL_QUERY", "Results", compute))
+    await asyncio.sleep(0)
+    waiters = [asyncio.create_task(cache.get_or_compute("model", "RETRIEVAL_QUERY", "results ", compute))
+               for _ in range(3)]
+    await asyncio.sleep(0)
+    owner.cancel()
+    results = await asyncio.gather(owner, *waiters, return_exceptions=True)
+    assert isinstance(results[0], asyncio.CancelledError), results[0]
+    assert results[1:] == [[1.0, 2.0]] * 3, f"coalesced waiters got {results[1:]}"
+    assert calls == 1 and cache.stats()["entries"] == 1 and not cache._inflight
+    print("cancelled owner: 3 coalesced waiters got the embedding from 1 call, and it was cached")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    headers = header_stream(args.requests)
+
+    ai = AIService()
+    ai.client = FakeGenaiClient(latency=args.latency)
+    before = asyncio.run(uncached(ai, headers, args.concurrency))
+    before_calls = ai.client.models.calls
+
+    ai.client = FakeGenaiClient(latency=args.latency)
+    ai_services.query_embedding_cache = cache = QueryEmbeddingCache(1000, 3600)
+    after = asyncio.run(replay(ai, headers, args.concurrency))
+
+    print(f"{args.requests} get_embedding calls, {args.concurrency} concurrent, "
+          f"{args.latency * 1000:.0f} ms per embed call")
+    print(f"  no cache : {before:6.2f} s, {before_calls} embed calls")
+    print(f"  cached   : {after:6.2f} s, {ai.client.models.calls} embed calls")
+    for key, value in cache.stats().items():
+        print(f"    {key}: {value}")
+    asyncio.run(check_cancelled_owner(args.latency))
+
+
+if __name__ == "__main__":
+    main()
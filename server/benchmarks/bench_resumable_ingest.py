@@ -0,0 +1,308 @@
+"""
+Benchmark: resuming a failed ingestion vs starting over, with fault injection
+
+A --pages page PDF is ingested with process_pdf against FakeSupabase and
+FakeGenaiClient, and the run is killed at a random point:
+
+    embed        - Gemini starts failing (quota) after K embedding requests
+    store        - doc_chunks upserts start failing after K batches
+    crash        - the worker dies (BaseException: no "failed" status, no
+                   cleanup) at the K-th database or embedding call
+    crash+lossy  - as crash, and half of the checkpoint writes before it
+                   were lost, so some batches are stored twice
+
+The failed document is then retried (retry_pdf) by a fresh
+PDFProcessingService with an empty content cache, i.e. a restarted worker:
+only the checkpoint directory and the database survive. Every third trial
+injects a second fault into the first retry.
+
+Checks (in place of unit tests) after each trial: exactly one doc_chunks
+row per chunk, chunk_index 0..n-1, rows and digest equal to an unfaulted
+run's, status completed, checkpoint cleared. Then once over the API:
+upload, fail, POST /documents/{id}/retry, completed.
+
+Reports how far the failed run got, and embedding requests and seconds of
+the retries against a full run (what re-uploading used to cost).
+
+Usage (from server/):
+    python -m benchmarks.bench_resumable_ingest --pages 100 --trials 12
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from uuid import uuid4
+
+from benchmarks.fakes import FakeGenaiClient, FakeQuery, FakeSupabase, install_app_fakes, make_pdf
+
+
+class Crash(BaseException):
+    """The worker process died: nothing after this point runs."""
+
+
+class Faults:
+    """Counts calls by kind and fails them once a kind's trigger is reached."""
+
+    def __init__(self):
+        self.counts = {}
+        self.triggers = {}   # kind -> (call number, exception class)
+        self.lossy = False
+        self.rng = random.Random(0)
+        self.lock = threading.Lock()
+
+    def arm(self, kind: str, at: int, error=RuntimeError) -> None:
+        self.triggers[kind] = (at, error)
+
+    def disarm(self) -> None:
+        self.triggers.clear()
+        self.lossy = False
+
+    def hit(self, kind: str) -> None:
+        with self.lock:
+            for name in (kind, "any"):
+                self.counts[name] = self.counts.get(name, 0) + 1
+                trigger = self.triggers.get(name)
+                if trigger and self.counts[name] > trigger[0]:
+                    at, error = trigger
+                    if error is Crash:
+                        # A crash happens once; the process is gone afterwards
+                        del self.triggers[name]
+                    raise error(f"{name} fault after {at} calls (injected)")
+
+
+class FaultyQuery(FakeQuery):
+    def execute(self):
+        faults = self.db.faults
+        if self.table_name == "doc_chunks" and self.action == "upsert":
+            faults.hit("store")
+        else:
+            faults.hit("db")
+        if faults.lossy and self.action == "update" and "ingest_checkpoint" in (self.payload or {}) \
+                and self.payload.get("status") is None and faults.rng.random() < 0.5:
+            raise RuntimeError("checkpoint write lost (injected)")
+        return super().execute()
+
+
+class FaultySupabase(FakeSupabase):
+    def __init__(self, faults: Faults, **kwargs):
+        super().__init__(**kwargs)
+        self.faults = faults
+
+    def table(self, name: str) -> FakeQuery:
+        return FaultyQuery(self, name)
+
+
+def faulty_client(faults: Faults, latency: float) -> FakeGenaiClient:
+    client = FakeGenaiClient(latency=latency)
+    embed = client.models.embed_content
+
+    def embed_content(model, contents, config=None):
+        faults.hit("embed")
+        return embed(model=model, contents=contents, config=config)
+
+    client.models.embed_content = embed_content
+    return client
+
+
+def make_service(client, checkpoint_dir: str):
+    """A freshly started worker: empty content cache, same checkpoint directory."""
+    from app.services.cache_services import ContentCache, MemoryBackend
+    from app.services.checkpoint_services import CheckpointStore
+    from app.services.pdf_services import PDFProcessingService
+
+    service = PDFProcessingService(
+        cache=ContentCache(MemoryBackend(100000)),
+        checkpoints=CheckpointStore(checkpoint_dir)
+    )
+    service.embedding_engine.client = client
+    service.embedding_engine.rate_limiter.rate = 0  # measure work, not throttling
+    return service
+
+
+def new_database(faults: Faults, latency: float, doc_id: str) -> FaultySupabase:
+    db = FaultySupabase(faults, latency=latency)
+    db.tables["documents"] = [{"id": doc_id, "user_id": "user-1", "file_name": "paper.pdf", "status": "ingested"}]
+    db.tables["doc_chunks"] = []
+    return db
+
+
+def stored_rows(db: FakeSupabase, doc_id: str):
+    return [r for r in db.tables["doc_chunks"] if r["document_id"] == doc_id]
+
+
+def check_complete(db: FakeSupabase, doc_id: str, reference, checkpoint_dir: str) -> None:
+    rows = stored_rows(db, doc_id)
+    expected_rows, expected_digest = reference
+    assert len(rows) == len(expected_rows), f"{len(rows)} rows, expected {len(expected_rows)}"
+    by_index = {r["chunk_index"]: r for r in rows}
+    assert sorted(by_index) == list(range(len(expected_rows))), "duplicate or missing chunk_index"
+    for i, expected in enumerate(expected_rows):
+        row = by_index[i]
+        for column in ("content", "page_number", "page_end"):
+            assert row[column] == expected[column], (i, column)
+        # Checkpointed vectors are float32, like the in-memory ones, so the
+        # pgvector literals written from either are identical
+        assert row["embedding"] == expected["embedding"], (i, "embedding")
+    document = db.tables["documents"][0]
+    assert document["status"] == "completed", document["status"]
+    assert document["digest"] == expected_digest, "digest differs from an unfaulted run"
+    assert document["ingest_checkpoint"] is None
+    assert not os.path.exists(os.path.join(checkpoint_dir, doc_id)), "checkpoint files left behind"
+
+
+def run_trials(args, pdf: bytes, tmp: str) -> None:
+    faults = Faults()
+
+    # Unfaulted run: reference rows and call counts to pick fault points from
+    doc_id = str(uuid4())
+    db = new_database(faults, args.db_latency, doc_id)
+    client = faulty_client(faults, args.embed_latency)
+    start = time.perf_counter()
+    make_service(client, os.path.join(tmp, "reference")).process_pdf(pdf, doc_id, db)
+    full_seconds = time.perf_counter() - start
+    full_counts = dict(faults.counts)
+    reference_rows = sorted(stored_rows(db, doc_id), key=lambda r: r["chunk_index"])
+    reference = (reference_rows, db.tables["documents"][0]["digest"])
+    chunks = len(reference_rows)
+    print(f"{args.pages} pages -> {chunks} chunks; full run: {full_counts['embed']} embed requests, "
+          f"{full_counts['store']} upserts, {full_seconds:.2f} s")
+
+    rng = random.Random(args.seed)
+    kinds = ["embed", "store", "crash", "crash+lossy"]
+    results = {kind: [] for kind in kinds}
+    print(f"{'fault':>12} {'trials':>7} {'stored at fail':>15} {'retries':>8} "
+          f"{'retry embeds':>13} {'vs full':>8} {'retry s':>8} {'vs full':>8} {'dup rows':>9}")
+
+    for trial in range(args.trials * len(kinds)):
+        kind = kinds[trial % len(kinds)]
+        faults.counts.clear()
+        faults.disarm()
+        doc_id = str(uuid4())
+        checkpoint_dir = os.path.join(tmp, f"trial-{trial}")
+        db = new_database(faults, args.db_latency, doc_id)
+
+        def arm(kind: str) -> None:
+            if kind == "embed":
+                faults.arm("embed", rng.randrange(full_counts["embed"]))
+            elif kind == "store":
+                faults.arm("store", rng.randrange(full_counts["store"]))
+            else:
+                faults.arm("any", rng.randrange(full_counts["any"]), Crash)
+                faults.lossy = kind == "crash+lossy"
+
+        # The run that fails
+        arm(kind)
+        try:
+            make_service(faulty_client(faults, args.embed_latency), checkpoint_dir).process_pdf(pdf, doc_id, db)
+            raise AssertionError("fault did not fire")
+        except (Exception, Crash):
+            pass
+        stored_at_failure = len({r["chunk_index"] for r in stored_rows(db, doc_id)})
+
+        # Retries until it completes (the first one faulted again, sometimes)
+        faults.disarm()
+        faults.counts.clear()
+        if trial % 3 == 2:
+            arm(kind)
+        retries, retry_seconds = 0, 0.0
+        while True:
+            retries += 1
+            assert retries <= 5, "retries do not converge"
+            start = time.perf_counter()
+            try:
+                make_service(faulty_client(faults, args.embed_latency), checkpoint_dir).retry_pdf(doc_id, db)
+                retry_seconds += time.perf_counter() - start
+                break
+            except (Exception, Crash):
+                retry_seconds += time.perf_counter() - start
+                faults.disarm()
+
+        duplicates = len(stored_rows(db, doc_id)) - chunks
+        check_complete(db, doc_id, reference, checkpoint_dir)
+        results[kind].append((stored_at_failure / chunks, retries, faults.counts.get("embed", 0),
+                              retry_seconds, duplicates))
+
+    for kind, rows in results.items():
+        stored, retries, embeds, seconds, duplicates = zip(*rows)
+        print(f"{kind:>12} {len(rows):>7} {statistics.mean(stored):>15.0%} {statistics.mean(retries):>8.2f} "
+              f"{statistics.mean(embeds):>13.1f} {statistics.mean(embeds) / full_counts['embed']:>8.0%} "
+              f"{statistics.mean(seconds):>8.2f} {statistics.mean(seconds) / full_seconds:>8.0%} "
+              f"{sum(duplicates):>9}")
+
+
+async def run_api(pdf: bytes, faults: Faults, db: FaultySupabase) -> None:
+    """Upload → embedding quota error → failed → POST retry → completed."""
+    import httpx
+    from app.main import app
+
+    async def wait_done(client, doc_id: str):
+        for _ in range(600):
+            status = (await client.get(f"/documents/{doc_id}/status", headers=headers)).json()
+            if status["status"] in ("completed", "failed"):
+                return status
+            await asyncio.sleep(0.05)
+        raise AssertionError("ingestion did not finish")
+
+    headers = {"Authorization": "Bearer user-1"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        faults.counts.clear()
+        faults.arm("embed", 2)
+        response = await client.post("/documents/upload", headers=headers,
+                                     files={"file": ("paper.pdf", pdf, "application/pdf")})
+        assert response.status_code == 202, response.text
+        doc_id = response.json()["doc_id"]
+        status = await wait_done(client, doc_id)
+        assert status["status"] == "failed" and "injected" in status["error"], status
+
+        faults.disarm()
+        response = await client.post(f"/documents/{doc_id}/retry", headers=headers)
+        assert response.status_code == 202, response.text
+        status = await wait_done(client, doc_id)
+        assert status["status"] == "completed", status
+
+        rows = stored_rows(db, doc_id)
+        assert sorted(r["chunk_index"] for r in rows) == list(range(status["chunks_count"]))
+        response = await client.post(f"/documents/{doc_id}/retry", headers=headers)
+        assert response.status_code == 409, response.text
+    print(f"api ok: upload failed at embed request 3, retry completed with {len(rows)} rows, "
+          f"second retry refused (409)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--trials", type=int, default=12, help="per fault kind")
+    parser.add_argument("--batch-size", type=int, default=50, help="DB_INSERT_BATCH_SIZE")
+    parser.add_argument("--embed-batch-size", type=int, default=20, help="EMBED_BATCH_SIZE")
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--db-latency", type=float, default=0.005)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    # Before the app reads its settings: batches of this size are the
+    # checkpoint unit, and a fault should fail the run, not be retried away
+    os.environ["DB_INSERT_BATCH_SIZE"] = str(args.batch_size)
+    os.environ["EMBED_BATCH_SIZE"] = str(args.embed_batch_size)
+    os.environ["DB_WRITE_MAX_RETRIES"] = "0"
+    os.environ["EMBED_MAX_RETRIES"] = "0"
+    os.environ["INGEST_CHECKPOINT_DIR"] = os.path.join(tmp, "api")
+    os.environ["EXTRACT_WORKERS"] = "1"
+
+    faults = Faults()
+    db = FaultySupabase(faults, latency=args.db_latency)
+    install_app_fakes(db, faulty_client(faults, args.embed_latency))
+
+    pdf = make_pdf(args.pages)
+    run_trials(args, pdf, tmp)
+    asyncio.run(run_api(pdf, faults, db))
+
+
+if __name__ == "__main__":
+    main()
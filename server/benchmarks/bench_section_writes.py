@@ -0,0 +1,138 @@
+"""
+Concurrency harness: section writes to one essay
+
+Runs concurrent writers against one essay through the fake Supabase (each
+request sleeps --db-latency, so interleavings happen like over a network):
+
+    legacy    - the old read-modify-write of the whole essays.content JSON
+                (select content, set one key, update content)
+    patch     - save_section → patch_essay_sections RPC, one atomic merge
+    optimistic- many writers edit the SAME section with expected_version=0;
+                exactly one may win, the rest get SectionConflictError
+    http      - concurrent POST /files/{id}/generate-section for every header
+
+Asserts no lost updates for patch/http and a single winner for optimistic,
+and reports lost updates for legacy plus bytes sent per write.
+
+Usage (from server/):
+    python -m benchmarks.bench_section_writes --writers 7 --rounds 20
+"""
+
+import argparse
+import asyncio
+import json
+
+from benchmarks.fakes import SECTION_TEXT, FakeGenaiClient, FakeSupabase, fake_vector, install_app_fakes
+
+
+def essay_row(db: FakeSupabase, essay_id: str) -> dict:
+    return next(r for r in db.tables["essays"] if r["id"] == essay_id)
+
+
+async def legacy_save(db: FakeSupabase, essay_id: str, header: str, text: str) -> int:
+    """What generate_section did before: returns bytes sent + received."""
+    from app.core.executors import run_db
+
+    current = await run_db(db.table("essays").select("content").eq("id", essay_id).single().execute)
+    content = current.data.get("content") or {}
+    content[header] = text
+    await run_db(db.table("essays").update({"content": content}).eq("id", essay_id).execute)
+    return len(json.dumps(current.data)) + len(json.dumps({"content": content}))
+
+
+async def run(db: FakeSupabase, app, args) -> None:
+    import httpx
+    from app.services.essay_services import SectionConflictError, save_section
+
+    headers = [f"Section {i}" for i in range(args.writers)]
+
+    legacy_lost, legacy_bytes = 0, []
+    patch_bytes = []
+    for r in range(args.rounds):
+        for mode in ("legacy", "patch"):
+            essay_id = f"{mode}-{r}"
+            db.tables["essays"].append({"id": essay_id, "user_id": "user-1", "content": {}})
+            if mode == "legacy":
+                await asyncio.gather(*(legacy_save(db, essay_id, h, SECTION_TEXT) for h in headers))
+                legacy_lost += len(headers) - len(essay_row(db, essay_id)["content"])
+            else:
+                versions = await asyncio.gather(*(save_section(essay_id, h, SECTION_TEXT) for h in headers))
+                patch_bytes.append(len(json.dumps({"p_essay_id": essay_id, "p_sections": {headers[0]: SECTION_TEXT}})))
+                row = essay_row(db, essay_id)
+                assert set(row["content"]) == set(headers), "patch lost an update"
+                assert versions == [1] * len(headers)
+                assert row["version"] == len(headers)
+
+    # Payload of the last write when an essay is filled one section at a time
+    db.tables["essays"].append({"id": "sizes", "user_id": "user-1", "content": {}})
+    for h in headers:
+        legacy_bytes.append(await legacy_save(db, "sizes", h, SECTION_TEXT))
+
+    # Optimistic versioning: same section, everyone started from version 0
+    db.tables["essays"].append({"id": "optimistic", "user_id": "user-1", "content": {}})
+    results = await asyncio.gather(
+        *(save_section("optimistic", "Intro", f"edit {i}", expected_version=0) for i in range(args.writers)),
+        return_exceptions=True
+    )
+    winners = [i for i, r in enumerate(results) if not isinstance(r, BaseException)]
+    conflicts = [r for r in results if isinstance(r, SectionConflictError)]
+    assert len(winners) == 1 and len(conflicts) == args.writers - 1, results
+    row = essay_row(db, "optimistic")
+    assert row["content"]["Intro"] == f"edit {winners[0]}" and row["section_versions"]["Intro"] == 1
+    # A writer that re-reads the version can then save
+    assert await save_section("optimistic", "Intro", "rebased edit", expected_version=1) == 2
+
+    # Through the API
+    db.tables["essays"].append({"id": "http", "user_id": "user-1", "content": {}})
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        responses = await asyncio.gather(*(
+            client.post("/files/http/generate-section",
+                        params={"header": h, "document_id": "doc-1"},
+                        headers={"Authorization": "Bearer user-1"})
+            for h in headers
+        ))
+        assert all(r.status_code == 200 for r in responses), [r.text for r in responses]
+        assert set(essay_row(db, "http")["content"]) == set(headers), "API lost an update"
+
+        conflict = await client.put("/files/http/sections", json={
+            "header": headers[0], "content": "stale edit", "expected_version": 0
+        }, headers={"Authorization": "Bearer user-1"})
+        assert conflict.status_code == 409, conflict.text
+
+    total = args.rounds * args.writers
+    print(f"{args.writers} concurrent writers per essay, {args.rounds} rounds, "
+          f"db latency {args.db_latency * 1000:.0f} ms")
+    print(f"  legacy     : {legacy_lost}/{total} section updates lost, "
+          f"{legacy_bytes[-1] / 1024:.1f} KiB sent+received for section {args.writers}, 2 round-trips")
+    print(f"  patch      : 0/{total} lost, {max(patch_bytes) / 1024:.1f} KiB sent per write, 1 round-trip")
+    print(f"  optimistic : 1 winner, {len(conflicts)} conflicts for {args.writers} writers of one section")
+    print(f"  http       : {len(headers)} concurrent generate-section calls, all saved; stale edit → 409")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=7)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--db-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    db = FakeSupabase(latency=args.db_latency)
+    install_app_fakes(db, FakeGenaiClient(latency=0.0, generate_latency=0.05))
+    db.tables["essays"] = []
+    db.tables["doc_chunks"] = [
+        {"id": f"chunk-{i}", "document_id": "doc-1", "content": f"Finding {i}. " * 40,
+         "page_number": i + 1, "embedding": fake_vector("x")}
+        for i in range(8)
+    ]
+    # Retrieval is not under test: return the first chunks
+    db.rpcs["match_doc_chunks"] = lambda db, params: [
+        {**row, "similarity": 0.9} for row in db.tables["doc_chunks"][:params["match_count"]]
+    ]
+
+    from app.main import app
+    asyncio.run(run(db, app, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Harness: token-streaming section generation over SSE
+
+Serves the app with uvicorn on a local port (ASGI test transports buffer
+the whole body, which would hide streaming) against fake backends whose
+Gemini stream yields 40 pieces spread over --generate-latency seconds.
+
+Checks and reports:
+    blocking   - POST /files/{id}/generate-section: time to text = total time
+    streaming  - POST /files/{id}/generate-section/stream: time to first
+                 token, total time; the saved section equals the streamed text
+    cancel     - the client disconnects after a few tokens: the upstream
+                 stream is closed early and nothing is saved
+
+Usage (from server/):
+    python -m benchmarks.bench_stream_section --generate-latency 2.0
+"""
+
+import argparse
+import json
+import socket
+import threading
+import time
+
+from benchmarks.fakes import SECTION_TEXT, FakeGenaiClient, FakeSupabase, fake_vector, install_app_fakes
+
+AUTH = {"Authorization": "Bearer user-1"}
+PARAMS = {"header": "Results", "document_id": "doc-1"}
+
+
+def seed(db: FakeSupabase) -> None:
+    db.tables["doc_chunks"] = [
+        {"id": f"chunk-{i}", "document_id": "doc-1", "content": f"Finding {i}. " * 40,
+         "page_number": i + 1, "embedding": fake_vector("Results")}
+        for i in range(8)
+    ]
+    db.tables["essays"] = [
+        {"id": essay_id, "user_id": "user-1", "content": {}}
+        for essay_id in ("essay-blocking", "essay-stream", "essay-cancel")
+    ]
+
+
+def saved_section(db: FakeSupabase, essay_id: str):
+    row = next(r for r in db.tables["essays"] if r["id"] == essay_id)
+    return (row.get("content") or {}).get(PARAMS["header"])
+
+
+def serve(app) -> tuple:
+    import uvicorn
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def read_events(response):
+    """Parses an SSE body into (event, data) pairs as frames arrive."""
+    event, data = None, None
+    for line in response.iter_lines():
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            data = json.loads(line[len("data: "):])
+        elif line == "" and event is not None:
+            yield event, data
+            event, data = None, None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--generate-latency", type=float, default=2.0)
+    args = parser.parse_args()
+
+    import httpx
+
+    db = FakeSupabase(latency=0.01)
+    genai_client = FakeGenaiClient(generate_latency=args.generate_latency)
+    install_app_fakes(db, genai_client)
+    seed(db)
+
+    from app.main import app
+    server, thread, base_url = serve(app)
+
+    try:
+        with httpx.Client(base_url=base_url, timeout=None) as client:
+            start = time.perf_counter()
+            response = client.post("/files/essay-blocking/generate-section", params=PARAMS, headers=AUTH)
+            response.raise_for_status()
+            blocking_total = time.perf_counter() - start
+
+            tokens, first_token, last_event = [], None, None
+            start = time.perf_counter()
+            with client.stream("POST", "/files/essay-stream/generate-section/stream",
+                               params=PARAMS, headers=AUTH) as response:
+                response.raise_for_status()
+                assert response.headers["content-type"].startswith("text/event-stream")
+                for event, data in read_events(response):
+                    if event == "token":
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        tokens.append(data["text"])
+                    last_event = event
+            stream_total = time.perf_counter() - start
+
+            assert last_event == "done", last_event
+            assert "".join(tokens) == SECTION_TEXT
+            assert saved_section(db, "essay-stream") == SECTION_TEXT
+
+            closed_before = genai_client.models.streams_closed_early
+            received = 0
+            with client.stream("POST", "/files/essay-cancel/generate-section/stream",
+                               params=PARAMS, headers=AUTH) as response:
+                for event, _ in read_events(response):
+                    received += event == "token"
+                    if received == 3:
+                        break
+            disconnected_at = time.perf_counter()
+            while genai_client.models.streams_closed_early == closed_before:
+                assert time.perf_counter() - disconnected_at < args.generate_latency + 5, \
+                    "upstream stream was not closed after the client disconnected"
+                time.sleep(0.005)
+            upstream_stop = time.perf_counter() - disconnected_at
+            # Give a late save (the bug this guards against) time to land
+            time.sleep(args.generate_latency / 4)
+            assert saved_section(db, "essay-cancel") is None
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    print(f"Gemini generation {args.generate_latency:.2f}s, 40 streamed pieces")
+    print(f"  blocking   : first text {blocking_total:6.3f} s, total {blocking_total:6.3f} s")
+    print(f"  streaming  : first text {first_token:6.3f} s, total {stream_total:6.3f} s "
+          f"({len(tokens)} token events, saved text matches)")
+    print(f"  cancel     : upstream closed {upstream_stop * 1000:.0f} ms after disconnect, "
+          f"nothing saved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Benchmark: server memory under concurrent large uploads, buffered vs streamed
+
+The app runs under uvicorn in a child process (FakeSupabase, FakeGenaiClient)
+and --uploads clients each upload a --size-mb PDF at the same time (a few
+pages of text plus an image-sized stream), then wait for ingestion to
+finish. Modes:
+
+    buffered  - the old handler: await file.read(), the bytes handed to
+                the queued job, extraction from a BytesIO
+    streamed  - POST /documents/upload: spool_upload to disk in chunks
+                (hashed on the way), extraction through a memory map
+
+The client streams each file from disk in its own process, so only the
+server's memory is measured: peak RSS (VmHWM) and the peak of its
+anonymous part (RssAnon, sampled; file-backed pages can be reclaimed).
+
+Also checks that both modes store the same chunks, and that an upload over
+UPLOAD_MAX_MB gets 413, with and without Content-Length, leaving no files.
+
+Usage (from server/):
+    python -m benchmarks.bench_upload_memory --uploads 20 --size-mb 50
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fakes import make_pdf
+
+MODES = {"buffered": "/legacy/upload", "streamed": "/documents/upload"}
+
+
+def serve(port: int) -> None:
+    """Child process: the app on uvicorn, plus the old upload handler at /legacy/upload."""
+    import uvicorn
+    from uuid import uuid4
+    from fastapi import Depends, File, UploadFile
+
+    from benchmarks.fakes import FakeGenaiClient, FakeSupabase, install_app_fakes
+
+    db = FakeSupabase(latency=0.002)
+    install_app_fakes(db, FakeGenaiClient(latency=0.05))
+
+    from app.core.security import get_current_user
+    from app.main import app
+    from app.services.job_services import ingestion_queue
+    from app.services.pdf_services import pdf_service
+
+    pdf_service.embedding_engine.rate_limiter.rate = 0
+
+    @app.post("/legacy/upload", status_code=202)
+    async def legacy_upload(file: UploadFile = File(...), current_user=Depends(get_current_user)):
+        doc_id = uuid4()
+        db.table("documents").insert({"id": str(doc_id), "user_id": current_user.id,
+                                      "file_name": file.filename, "status": "ingested"}).execute()
+        file_bytes = await file.read()
+        job = ingestion_queue.submit(
+            user_id=current_user.id,
+            document_id=str(doc_id),
+            task=lambda progress: pdf_service.process_pdf(file_bytes, doc_id, db, progress)
+        )
+        return {"doc_id": str(doc_id), "job_id": job.id, "status": "ingested"}
+
+    @app.get("/bench/chunks/{doc_id}")
+    async def chunks(doc_id: str):
+        rows = [r for r in db.tables.get("doc_chunks", []) if r["document_id"] == doc_id]
+        return sorted(r["content"] for r in rows)
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def memory(pid: int) -> dict:
+    fields = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmHWM", "VmRSS", "RssAnon", "RssFile"):
+                fields[key] = int(value.split()[0]) / 1024  # kB -> MB
+    return fields
+
+
+async def run_mode(args, mode: str, pdf_path: str, env: dict) -> dict:
+    import httpx
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_upload_memory", "--serve", str(port)],
+        env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    peak_anon = 0.0
+    sampling = True
+
+    async def sample():
+        nonlocal peak_anon
+        while sampling:
+            peak_anon = max(peak_anon, memory(server.pid).get("RssAnon", 0.0))
+            await asyncio.sleep(0.02)
+
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+            for _ in range(200):
+                try:
+                    await client.get("/")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            idle = memory(server.pid)["VmRSS"]
+            sampler = asyncio.create_task(sample())
+            headers = {"Authorization": "Bearer user-1"}
+
+            # One user per upload (INGEST_MAX_JOBS_PER_USER would queue-limit one)
+            async def upload(i: int):
+                with open(pdf_path, "rb") as f:
+                    response = await client.post(MODES[mode], headers={"Authorization": f"Bearer user-{i}"},
+                                                 files={"file": (f"paper-{i}.pdf", f, "application/pdf")})
+                assert response.status_code == 202, response.text
+                return f"user-{i}", response.json()["doc_id"]
+
+            start = time.perf_counter()
+            doc_ids = await asyncio.gather(*(upload(i) for i in range(args.uploads)))
+            accepted = time.perf_counter() - start
+
+            for user, doc_id in doc_ids:
+                while True:
+                    status = (await client.get(f"/documents/{doc_id}/status",
+                                               headers={"Authorization": f"Bearer {user}"})).json()
+                    if status["status"] == "completed":
+                        break
+                    assert status["status"] != "failed", status
+                    await asyncio.sleep(0.05)
+            finished = time.perf_counter() - start
+            sampling = False
+            await sampler
+            chunks = (await client.get(f"/bench/chunks/{doc_ids[0][1]}")).json()
+
+            if mode == "streamed":
+                await check_size_limit(client, headers, env)
+
+            peak = memory(server.pid)["VmHWM"]
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {"idle": idle, "peak": peak, "peak_anon": peak_anon,
+            "accepted": accepted, "finished": finished, "chunks": chunks}
+
+
+async def check_size_limit(client, headers: dict, env: dict) -> None:
+    """
+    Over the limit: 413 up front (Content-Length) or mid-stream (chunked),
+    with CORS headers, so a browser on another origin can read the message.
+    """
+    import httpx
+
+    origin = "http://localhost:8080"
+    headers = {**headers, "Origin": origin}
+
+    def rejected(response) -> None:
+        assert response.status_code == 413, response.text
+        assert response.headers.get("access-control-allow-origin") == origin, "413 without CORS headers"
+
+    limit = int(float(env["UPLOAD_MAX_MB"]) * 1024 * 1024)
+    checkpoint_dir = env["INGEST_CHECKPOINT_DIR"]
+    before = set(os.listdir(checkpoint_dir)) if os.path.isdir(checkpoint_dir) else set()
+    # Well over: rejected from Content-Length, before the body is read
+    oversized = make_pdf(2, padding_bytes=2 * limit)
+    response = await client.post("/documents/upload", headers=headers,
+                                 files={"file": ("big.pdf", oversized, "application/pdf")})
+    rejected(response)
+
+    # Just over (within the multipart allowance): rejected by spool_upload
+    response = await client.post("/documents/upload", headers=headers,
+                                 files={"file": ("big.pdf", oversized[:limit + 1024], "application/pdf")})
+    rejected(response)
+
+    # No Content-Length (chunked): rejected while the body streams in
+    boundary = "benchboundary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.pdf\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n").encode() + oversized + f"\r\n--{boundary}--\r\n".encode()
+
+    async def chunked():
+        for i in range(0, len(body), 256 * 1024):
+            yield body[i:i + 256 * 1024]
+
+    try:
+        response = await client.post("/documents/upload", content=chunked(),
+                                     headers={**headers, "Content-Type": f"multipart/form-data; boundary={boundary}"})
+        rejected(response)
+    except httpx.TransportError:
+        # The server may answer and close before the client finished sending
+        pass
+
+    after = set(os.listdir(checkpoint_dir)) if os.path.isdir(checkpoint_dir) else set()
+    assert after == before, f"rejected uploads left files: {after - before}"
+    print("size limit ok: 413 from Content-Length, from the spooler, and while streaming, each with CORS "
+          "headers; no files left")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--size-mb", type=float, default=50)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    tmp = tempfile.mkdtemp()
+    pdf_path = os.path.join(tmp, "upload.pdf")
+    with open(pdf_path, "wb") as f:
+        f.write(make_pdf(args.pages, padding_bytes=int(args.size_mb * 1024 * 1024)))
+
+    print(f"{args.uploads} concurrent uploads of {os.path.getsize(pdf_path) / 2**20:.0f} MB "
+          f"({args.pages} pages of text); server memory in MB")
+    print(f"{'mode':>9} {'idle RSS':>9} {'peak RSS':>9} {'peak anon':>10} {'accepted s':>11} {'done s':>7}")
+    results = {}
+    for mode in MODES:
+        env = {
+            **os.environ,
+            "GEMINI_API_KEY": "fake",
+            "UPLOAD_MAX_MB": str(args.size_mb * 1.5),
+            "INGEST_CHECKPOINT_DIR": os.path.join(tmp, f"ingest-{mode}"),
+            "CONTENT_CACHE_BACKEND": "off",
+        }
+        result = asyncio.run(run_mode(args, mode, pdf_path, env))
+        results[mode] = result
+        print(f"{mode:>9} {result['idle']:>9.0f} {result['peak']:>9.0f} {result['peak_anon']:>10.0f} "
+              f"{result['accepted']:>11.2f} {result['finished']:>7.2f}")
+
+    assert results["buffered"]["chunks"] == results["streamed"]["chunks"], "modes stored different chunks"
+    assert os.listdir(os.path.join(tmp, "ingest-streamed")) == [], "checkpoints left after completion"
+
+
+if __name__ == "__main__":
+    main()
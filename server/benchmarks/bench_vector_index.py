@@ -0,0 +1,160 @@
+"""
+Benchmark: retrieval latency, match_doc_chunks RPC vs in-process index
+
+A document of --chunks 768-dim chunks is searched with --queries query
+vectors two ways:
+
+    rpc    - supabase.rpc("match_doc_chunks") against a local stand-in that
+             charges --rpc-latency per call (network + Postgres) and scores
+             with NumPy, so only the round-trip differs
+    local  - VectorIndex.search (first query loads the document)
+
+Correctness: for every query both paths must return the same chunk ids as
+the pure-Python port of the SQL function. float16 is checked for recall@k
+against float32. A small memory budget checks LRU eviction.
+
+Usage (from server/):
+    python -m benchmarks.bench_vector_index --chunks 500 --queries 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.fakes import FakeSupabase, fake_vector, match_doc_chunks
+
+MATCH_COUNT = 4
+THRESHOLD = 0.4
+
+
+def make_chunks(doc_id: str, n: int, topics: int = 20):
+    """Chunks clustered around a few topic vectors, so queries have real matches."""
+    rng = np.random.default_rng(0)
+    centers = np.array([fake_vector(f"topic {t}") for t in range(topics)], dtype=np.float32)
+    rows = []
+    for i in range(n):
+        vector = centers[i % topics] + rng.normal(0, 0.35, centers.shape[1]).astype(np.float32)
+        rows.append({
+            "id": f"{doc_id}-{i:05d}",
+            "document_id": doc_id,
+            "content": f"Chunk {i} " * 80,
+            "page_number": i // 3 + 1,
+            "embedding": vector.tolist(),
+        })
+    return rows, centers
+
+
+_rpc_tables = {}
+
+
+def numpy_rpc(db: FakeSupabase, params: dict):
+    """Same results as match_doc_chunks, scored the way Postgres would (fast)."""
+    doc_id = params["filter_document_id"]
+    if doc_id not in _rpc_tables:
+        rows = [r for r in db.tables["doc_chunks"] if r["document_id"] == doc_id]
+        _rpc_tables[doc_id] = rows, np.array([r["embedding"] for r in rows], dtype=np.float32)
+    rows, matrix = _rpc_tables[doc_id]
+    query = np.asarray(params["query_embedding"], dtype=np.float32)
+    sims = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+    order = np.argsort(-sims)[:params["match_count"]]
+    return [
+        {"id": rows[i]["id"], "content": rows[i]["content"],
+         "page_number": rows[i]["page_number"], "similarity": float(sims[i])}
+        for i in order if sims[i] > params["match_threshold"]
+    ]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run(args) -> None:
+    from app.core.executors import run_db
+    from app.services.vector_services import DocumentVectors, VectorIndex, parse_embedding
+
+    db = FakeSupabase(latency=args.rpc_latency, per_row_latency=0.0)
+    rows, centers = make_chunks("doc-1", args.chunks)
+    db.tables["doc_chunks"] = rows
+    db.rpcs["match_doc_chunks"] = numpy_rpc
+
+    rng = np.random.default_rng(1)
+    queries = [
+        (centers[q % len(centers)] + rng.normal(0, 0.5, centers.shape[1])).tolist()
+        for q in range(args.queries)
+    ]
+
+    # pgvector text form parses to the same vector
+    text_form = "[" + ",".join(repr(x) for x in rows[0]["embedding"]) + "]"
+    assert np.allclose(parse_embedding(text_form), rows[0]["embedding"])
+
+    expected = [
+        [r["id"] for r in match_doc_chunks(db, {
+            "query_embedding": q, "filter_document_id": "doc-1",
+            "match_threshold": THRESHOLD, "match_count": MATCH_COUNT})]
+        for q in queries[:20]
+    ]
+    assert any(expected), "queries found no matches; adjust the corpus"
+
+    rpc_times = []
+    for i, q in enumerate(queries):
+        start = time.perf_counter()
+        response = await run_db(db.rpc("match_doc_chunks", {
+            "query_embedding": q, "filter_document_id": "doc-1",
+            "match_threshold": THRESHOLD, "match_count": MATCH_COUNT}).execute)
+        rpc_times.append(time.perf_counter() - start)
+        if i < len(expected):
+            assert [r["id"] for r in response.data] == expected[i]
+
+    results = {}
+    for dtype in ("float32", "float16"):
+        index = VectorIndex(max_bytes=1 << 30, dtype=dtype, supabase_client=db)
+        times, found = [], []
+        for q in queries:
+            start = time.perf_counter()
+            matches = await index.search("doc-1", q, THRESHOLD, MATCH_COUNT)
+            times.append(time.perf_counter() - start)
+            found.append([m["id"] for m in matches])
+        results[dtype] = (times, found, index.stats()["bytes"])
+
+    f32_found = results["float32"][1]
+    for i, ids in enumerate(expected):
+        assert f32_found[i] == ids, (i, f32_found[i], ids)
+    hits = sum(len(set(a) & set(b)) for a, b in zip(results["float16"][1], f32_found))
+    recall_f16 = hits / max(1, sum(len(ids) for ids in f32_found))
+
+    # LRU: a budget for ~2 documents keeps the 2 most recently used
+    db.tables["doc_chunks"] = rows + make_chunks("doc-2", args.chunks)[0] + make_chunks("doc-3", args.chunks)[0]
+    one_doc = DocumentVectors(rows).nbytes
+    index = VectorIndex(max_bytes=int(one_doc * 2.5), supabase_client=db)
+    for doc_id in ("doc-1", "doc-2", "doc-1", "doc-3"):
+        await index.search(doc_id, queries[0], THRESHOLD, MATCH_COUNT)
+    assert set(index._documents) == {"doc-1", "doc-3"}, list(index._documents)
+    assert index.stats()["evictions"] == 1
+
+    print(f"{args.chunks} chunks x 768 dims, {args.queries} queries, "
+          f"RPC round-trip {args.rpc_latency * 1000:.0f} ms")
+    print(f"{'path':>14} {'first ms':>9} {'p50 ms':>8} {'p99 ms':>8} {'index MB':>9}")
+    print(f"{'rpc':>14} {rpc_times[0] * 1000:>9.2f} {statistics.median(rpc_times) * 1000:>8.3f} "
+          f"{percentile(rpc_times, 99) * 1000:>8.3f} {'-':>9}")
+    for dtype, (times, _, nbytes) in results.items():
+        print(f"{'local ' + dtype:>14} {times[0] * 1000:>9.2f} {statistics.median(times[1:]) * 1000:>8.3f} "
+              f"{percentile(times[1:], 99) * 1000:>8.3f} {nbytes / 2**20:>9.2f}")
+    print(f"float16 recall@{MATCH_COUNT} vs float32: {recall_f16:.3f}; "
+          f"results match match_doc_chunks; LRU eviction ok")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--rpc-latency", type=float, default=0.015)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
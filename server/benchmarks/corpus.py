@@ -0,0 +1,105 @@
+"""
+Synthetic PDF corpus for the end-to-end benchmarks
+
+Deterministic: the same (documents, pages, seed) always gives byte-identical
+PDFs and the same queries, so two versions of the app are measured on
+exactly the same input. Page counts are spread between min_pages and
+max_pages (a few short papers, some long reports). Each document has a
+topic whose terms are mixed into its prose and into its queries, so
+retrieval has something specific to find.
+
+Usage (from server/), to keep a copy of the PDFs:
+    python -m benchmarks.corpus --documents 12 --out /tmp/corpus
+"""
+
+import argparse
+import json
+import os
+import random
+from typing import List, NamedTuple
+
+from benchmarks.fakes import _WORDS, make_pdf
+
+TOPICS = {
+    "climate": "emissions carbon warming temperature glacier rainfall drought adaptation",
+    "medicine": "patients clinical trial dosage placebo symptoms diagnosis cohort",
+    "economics": "inflation market labour wages monetary fiscal demand supply",
+    "education": "students curriculum teachers assessment literacy classroom learning school",
+    "energy": "solar battery grid turbine storage renewable capacity efficiency",
+    "ecology": "species habitat biodiversity predator forest wetland migration pollinator",
+    "computing": "algorithm latency network compiler processor memory cache throughput",
+    "history": "empire treaty revolution archive century dynasty colonial trade",
+}
+
+SECTION_TEMPLATES = (
+    "Introduction to {term}",
+    "Background on {term} and {other}",
+    "Methods for measuring {term}",
+    "Results on {term}",
+    "Effect of {term} on {other}",
+    "Discussion of {term}",
+    "Limitations of {term} studies",
+    "Conclusion on {term} and {other}",
+)
+
+
+class CorpusDocument(NamedTuple):
+    name: str
+    topic: str
+    pages: int
+    data: bytes
+    headers: List[str]  # section headers to retrieve / generate for
+
+
+def make_corpus(documents: int = 8, min_pages: int = 5, max_pages: int = 60, seed: int = 0) -> List[CorpusDocument]:
+    rng = random.Random(seed)
+    topics = sorted(TOPICS)
+    corpus = []
+    for i in range(documents):
+        topic = topics[i % len(topics)]
+        terms = TOPICS[topic].split()
+        # Topic terms make up about a third of the words
+        words = _WORDS + terms * max(1, len(_WORDS) // (2 * len(terms)))
+        # Evenly spread sizes, shuffled so big and small documents interleave
+        pages = min_pages + (max_pages - min_pages) * i // max(1, documents - 1)
+        headers = [
+            template.format(term=rng.choice(terms), other=rng.choice(terms))
+            for template in SECTION_TEMPLATES
+        ]
+        data = make_pdf(pages, seed=seed * 1000 + i, words=words)
+        corpus.append(CorpusDocument(f"{topic}-{i:02d}.pdf", topic, pages, data, headers))
+    rng.shuffle(corpus)
+    return corpus
+
+
+def write_corpus(corpus: List[CorpusDocument], directory: str) -> None:
+    """The PDFs plus a manifest.json of names, topics, pages and headers."""
+    os.makedirs(directory, exist_ok=True)
+    for document in corpus:
+        with open(os.path.join(directory, document.name), "wb") as f:
+            f.write(document.data)
+    manifest = [
+        {"name": d.name, "topic": d.topic, "pages": d.pages, "bytes": len(d.data), "headers": d.headers}
+        for d in corpus
+    ]
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--min-pages", type=int, default=5)
+    parser.add_argument("--max-pages", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.documents, args.min_pages, args.max_pages, args.seed)
+    write_corpus(corpus, args.out)
+    total = sum(len(d.data) for d in corpus)
+    print(f"{len(corpus)} PDFs, {sum(d.pages for d in corpus)} pages, {total / 1024:.0f} KB -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
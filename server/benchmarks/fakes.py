@@ -0,0 +1,559 @@
+"""
+Offline stand-ins for the external services used by the app
+
+Each fake mimics only the slice of the real client API the app calls, and
+sleeps to simulate network latency so benchmarks measure request patterns
+rather than CPU work.
+"""
+
+import base64
+import hashlib
+import importlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import List, Optional, Union
+
+
+def fake_vector(text: str, dim: int = 768) -> List[float]:
+    """Deterministic pseudo-embedding derived from the text hash."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    return [rng.uniform(-1.0, 1.0) for _ in range(dim)]
+
+
+SECTION_SENTENCE = "Generated section text. "
+STREAM_CHUNKS = 40
+SECTION_TEXT = SECTION_SENTENCE * STREAM_CHUNKS
+
+
+class FakeModels:
+    def __init__(
+        self,
+        latency: float,
+        per_item_latency: float,
+        failure_rate: float,
+        dim: int,
+        generate_latency: float
+    ):
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.failure_rate = failure_rate
+        self.dim = dim
+        self.generate_latency = generate_latency
+        self.calls = 0
+        self.generate_calls = 0
+        self.stream_calls = 0
+        self.streams_closed_early = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(0)
+
+    def embed_content(self, model: str, contents: Union[str, List[str]], config=None):
+        texts = [contents] if isinstance(contents, str) else list(contents)
+
+        with self._lock:
+            self.calls += 1
+            fail = self._rng.random() < self.failure_rate
+
+        time.sleep(self.latency + self.per_item_latency * len(texts))
+        if fail:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED (injected)")
+
+        return SimpleNamespace(
+            embeddings=[SimpleNamespace(values=fake_vector(t, self.dim)) for t in texts]
+        )
+
+    def generate_content(self, model: str, contents: str, config=None):
+        with self._lock:
+            self.generate_calls += 1
+            fail = self._rng.random() < self.failure_rate
+
+        time.sleep(self.generate_latency)
+        if fail:
+            raise RuntimeError("503 UNAVAILABLE (injected)")
+
+        if config is not None and getattr(config, "response_mime_type", None) == "application/json":
+            text = '{"title": "Generated", "outline": [' + ", ".join(
+                f'{{"header": "Section {i}", "description": "..."}}' for i in range(1, 8)
+            ) + "]}"
+        else:
+            text = SECTION_TEXT
+        return SimpleNamespace(text=text)
+
+    def generate_content_stream(self, model: str, contents: str, config=None):
+        """
+        Yields SECTION_TEXT in STREAM_CHUNKS pieces spread evenly over
+        generate_latency. Counts streams the caller closed before the end.
+        """
+        with self._lock:
+            self.stream_calls += 1
+            fail = self._rng.random() < self.failure_rate
+
+        pieces = [SECTION_SENTENCE] * STREAM_CHUNKS
+        try:
+            for i, piece in enumerate(pieces):
+                time.sleep(self.generate_latency / len(pieces))
+                if fail and i == len(pieces) // 2:
+                    raise RuntimeError("503 UNAVAILABLE (injected)")
+                yield SimpleNamespace(text=piece)
+        except GeneratorExit:
+            with self._lock:
+                self.streams_closed_early += 1
+            raise
+
+
+class FakeGenaiClient:
+    """Stand-in for genai.Client with configurable latency and failures."""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        per_item_latency: float = 0.0005,
+        failure_rate: float = 0.0,
+        dim: int = 768,
+        generate_latency: float = 1.0
+    ):
+        self.models = FakeModels(latency, per_item_latency, failure_rate, dim, generate_latency)
+
+    def close(self) -> None:
+        pass
+
+
+_OPERATORS = {
+    "eq": lambda a, b: a == b, "neq": lambda a, b: a != b,
+    "lt": lambda a, b: a < b, "lte": lambda a, b: a <= b,
+    "gt": lambda a, b: a > b, "gte": lambda a, b: a >= b,
+}
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Splits on commas outside parentheses and double quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == "\\" and quoted:
+            current.append(text[i:i + 2])
+            i += 2
+            continue
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append("".join(current))
+            current = []
+            i += 1
+            continue
+        current.append(ch)
+        i += 1
+    parts.append("".join(current))
+    return parts
+
+
+def _parse_logic(kind: str, filters: str):
+    """PostgREST logic filter ("a.lt.1,and(b.eq.2,c.gt.\"x\")") → row predicate (values compared as text)."""
+    conditions = []
+    for part in _split_top_level(filters):
+        part = part.strip()
+        if part.startswith(("and(", "or(")):
+            inner_kind, _, inner = part.partition("(")
+            conditions.append(_parse_logic(inner_kind, inner[:-1]))
+            continue
+        column, op, value = part.split(".", 2)
+        if value.startswith('"') and value.endswith('"'):
+            value = value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+        compare = _OPERATORS[op]
+        conditions.append(lambda row, c=column, f=compare, v=value: row.get(c) is not None and f(str(row.get(c)), v))
+    combine = all if kind == "and" else any
+    return lambda row: combine(condition(row) for condition in conditions)
+
+
+class FakeQuery:
+    """Chainable query builder covering the PostgREST calls the app makes."""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table_name = table
+        self.action = "select"
+        self.payload = None
+        self.columns = "*"
+        self.count = None
+        self.filters = []
+        self.predicates = []
+        self.order_by = []
+        self.limit_n = None
+        self.offset_n = 0
+        self.is_single = False
+
+    def select(self, columns: str = "*", count=None):
+        self.action, self.columns, self.count = "select", columns, count
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict: str = "id"):
+        self.action, self.payload = "upsert", rows
+        self.conflict_columns = [c.strip() for c in on_conflict.split(",")]
+        return self
+
+    def update(self, values, returning="representation"):
+        self.action, self.payload, self.returning = "update", values, str(getattr(returning, "value", returning))
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by.append((column, desc))
+        return self
+
+    def or_(self, filters: str):
+        self.predicates.append(_parse_logic("or", filters))
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def range(self, start, end):
+        self.offset_n, self.limit_n = start, end - start + 1
+        return self
+
+    def single(self):
+        self.is_single = True
+        return self
+
+    def _matches(self, row) -> bool:
+        return all(str(row.get(c)) == str(v) for c, v in self.filters) \
+            and all(predicate(row) for predicate in self.predicates)
+
+    def _project(self, row):
+        if self.columns.strip() == "*":
+            return dict(row)
+        cols = [c.strip() for c in self.columns.split(",")]
+        return {c: row.get(c) for c in cols}
+
+    def execute(self):
+        payload_rows = 1
+        if self.action in ("insert", "upsert") and isinstance(self.payload, list):
+            payload_rows = len(self.payload)
+        self.db._simulate(payload_rows)
+
+        with self.db.lock:
+            rows = self.db.tables.setdefault(self.table_name, [])
+
+            if self.action == "insert":
+                new_rows = self.payload if isinstance(self.payload, list) else [self.payload]
+                inserted = []
+                for row in new_rows:
+                    row = dict(row)
+                    row.setdefault("id", str(self.db.next_id()))
+                    rows.append(row)
+                    inserted.append(row)
+                return SimpleNamespace(data=inserted, count=None)
+
+            if self.action == "upsert":
+                new_rows = self.payload if isinstance(self.payload, list) else [self.payload]
+                existing = {
+                    tuple(str(r.get(c)) for c in self.conflict_columns): r for r in rows
+                }
+                written = []
+                for row in new_rows:
+                    match = existing.get(tuple(str(row.get(c)) for c in self.conflict_columns))
+                    if match is not None:
+                        match.update(row)
+                        written.append(match)
+                    else:
+                        row = dict(row)
+                        row.setdefault("id", str(self.db.next_id()))
+                        rows.append(row)
+                        existing[tuple(str(row.get(c)) for c in self.conflict_columns)] = row
+                        written.append(row)
+                return SimpleNamespace(data=[dict(r) for r in written], count=None)
+
+            matched = [r for r in rows if self._matches(r)]
+
+            if self.action == "update":
+                for r in matched:
+                    r.update(self.payload)
+                if self.returning == "minimal":
+                    return SimpleNamespace(data=[], count=None)
+                return SimpleNamespace(data=[dict(r) for r in matched], count=None)
+
+            if self.action == "delete":
+                self.db.tables[self.table_name] = [r for r in rows if not self._matches(r)]
+                return SimpleNamespace(data=matched, count=None)
+
+            # Stable sorts, last key first, give a multi-column order
+            for column, desc in reversed(self.order_by):
+                matched.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+            count = len(matched) if self.count == "exact" else None
+            matched = matched[self.offset_n:]
+            if self.limit_n is not None:
+                matched = matched[:self.limit_n]
+            data = [self._project(r) for r in matched]
+
+            if self.is_single:
+                if len(data) != 1:
+                    raise RuntimeError("JSON object requested, multiple (or no) rows returned")
+                return SimpleNamespace(data=data[0], count=count)
+            return SimpleNamespace(data=data, count=count)
+
+
+class FakeSupabase:
+    """
+    In-memory stand-in for the Supabase client (tables + rpc).
+
+    `latency` is charged once per request and `per_row_latency` per row
+    written, which is the shape of a real PostgREST round-trip.
+    `failure_rate` makes a fraction of requests raise.
+    """
+
+    def __init__(self, latency: float = 0.005, per_row_latency: float = 0.00002, failure_rate: float = 0.0):
+        self.latency = latency
+        self.per_row_latency = per_row_latency
+        self.failure_rate = failure_rate
+        self.tables = {}
+        self.rpcs = {}
+        self.requests = 0
+        self.lock = threading.RLock()
+        self.auth = FakeAuth(self)
+        self.rpcs["match_doc_chunks"] = match_doc_chunks
+        self.rpcs["patch_essay_sections"] = patch_essay_sections
+        self.rpcs["document_raw_text_slice"] = document_raw_text_slice
+        self._ids = 0
+        self._rng = random.Random(0)
+
+    def next_id(self) -> int:
+        self._ids += 1
+        return self._ids
+
+    def _simulate(self, rows: int = 1) -> None:
+        with self.lock:
+            self.requests += 1
+            fail = self._rng.random() < self.failure_rate
+        time.sleep(self.latency + self.per_row_latency * rows)
+        if fail:
+            raise RuntimeError("503 Service Unavailable (injected)")
+
+    def table(self, name: str) -> "FakeQuery":
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: dict):
+        db = self
+
+        class _Rpc:
+            def execute(self_inner):
+                db._simulate()
+                return SimpleNamespace(data=db.rpcs[name](db, params), count=None)
+
+        return _Rpc()
+
+
+class FakeAuth:
+    """
+    Accepts any token; the token text doubles as the user id (for a JWT,
+    its unverified sub claim). `latency` overrides the database latency for
+    get_user round-trips.
+    """
+
+    def __init__(self, db: FakeSupabase, latency: Optional[float] = None):
+        self.db = db
+        self.latency = latency
+        self.calls = 0
+
+    def get_user(self, token: str):
+        with self.db.lock:
+            self.calls += 1
+        if self.latency is None:
+            self.db._simulate()
+        else:
+            time.sleep(self.latency)
+        user_id = token
+        if token.count(".") == 2:
+            payload = token.split(".")[1]
+            user_id = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))["sub"]
+        return SimpleNamespace(user=SimpleNamespace(id=user_id, email=f"{user_id}@example.com"))
+
+
+def _vector(value) -> List[float]:
+    """pgvector input: a list, or "[x,y,...]" text as the app sends it."""
+    if isinstance(value, str):
+        return [float(x) for x in value.strip("[]").split(",")]
+    return value
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def match_doc_chunks(db: FakeSupabase, params: dict):
+    """Python port of the match_doc_chunks SQL function (cosine similarity)."""
+    with db.lock:
+        rows = [
+            r for r in db.tables.get("doc_chunks", [])
+            if str(r.get("document_id")) == str(params["filter_document_id"])
+        ]
+    scored = []
+    for row in rows:
+        if row.get("embedding") is None:
+            continue  # compact-only row: NULL similarity, never matched
+        similarity = _cosine(params["query_embedding"], _vector(row["embedding"]))
+        if similarity > params["match_threshold"]:
+            scored.append({
+                "id": row["id"],
+                "content": row["content"],
+                "page_number": row.get("page_number"),
+                "similarity": similarity,
+            })
+    scored.sort(key=lambda r: r["similarity"], reverse=True)
+    return scored[:params["match_count"]]
+
+
+def document_raw_text_slice(db: FakeSupabase, params: dict):
+    """Python port of the document_raw_text_slice SQL function."""
+    with db.lock:
+        documents = [
+            d for d in db.tables.get("documents", [])
+            if str(d.get("id")) == params["p_document_id"] and str(d.get("user_id")) == params["p_user_id"]
+        ]
+    if not documents:
+        return None
+    text = (documents[0].get("raw_text") or "").encode("utf-8")
+    start, length = params["p_start"], max(0, params["p_length"])
+    return {"total": len(text), "data": base64.b64encode(text[start:start + length]).decode("ascii")}
+
+
+def patch_essay_sections(db: FakeSupabase, params: dict):
+    """Python port of the patch_essay_sections SQL function (one atomic step)."""
+    with db.lock:
+        essay = next((r for r in db.tables.get("essays", []) if str(r["id"]) == str(params["p_essay_id"])), None)
+        if essay is None:
+            return {"status": "not_found"}
+
+        current = dict(essay.get("section_versions") or {})
+        for header, expected in (params.get("p_expected_versions") or {}).items():
+            if current.get(header, 0) != expected:
+                return {"status": "conflict", "versions": current}
+
+        new_versions = {header: current.get(header, 0) + 1 for header in params["p_sections"]}
+        essay["content"] = {**(essay.get("content") or {}), **params["p_sections"]}
+        essay["section_versions"] = {**current, **new_versions}
+        essay["version"] = essay.get("version", 0) + 1
+        return {"status": "ok", "versions": new_versions}
+
+
+def install_app_fakes(db: FakeSupabase, genai_client: FakeGenaiClient) -> None:
+    """
+    Points the app's module-level clients at the fakes.
+
+    Call before importing app modules that build clients at import time
+    (genai.Client is swapped globally so those pick up the fake too).
+    """
+    os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+    os.environ.setdefault("SUPABASE_ANON_KEY", "fake.fake.fake")
+    os.environ.setdefault("GEMINI_API_KEY", "fake")
+
+    from google import genai
+    genai.Client = lambda *args, **kwargs: genai_client
+
+    for module in (
+        "app.core.security",
+        "app.api.auth",
+        "app.api.documents",
+        "app.api.essays",
+        "app.services.essay_services",
+    ):
+        importlib.import_module(module).supabase = db
+
+    # Benchmark tokens are plain user ids, not JWTs: validate them "remotely"
+    # (FakeAuth), through the same verifier and claims cache
+    from app.core import security
+    from app.core.tokens import TokenVerifier
+    security.token_verifier = TokenVerifier(lambda token: db.auth.get_user(token), mode="remote")
+
+
+_WORDS = (
+    "analysis method results model data sample effect study measure theory "
+    "significant evidence approach framework population variable control "
+    "experiment observed suggests however therefore findings literature"
+).split()
+
+
+def make_pdf(
+    pages: int,
+    lines_per_page: int = 45,
+    seed: int = 0,
+    padding_bytes: int = 0,
+    words: Optional[List[str]] = None
+) -> bytes:
+    """
+    Builds a valid text PDF with `pages` pages of pseudo-random prose
+    (drawn from `words`, default a generic academic vocabulary).
+
+    Hand-assembled (catalog, page tree, one Helvetica font, one content
+    stream per page) so benchmarks need no PDF-writing dependency.
+    padding_bytes adds an incompressible stream object no page uses (the
+    bulk of a scanned or image-heavy PDF), to reach a file size cheaply.
+    """
+    rng = random.Random(seed)
+    words = words or _WORDS
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+
+    for p in range(pages):
+        content_id, page_id = 4 + 2 * p, 5 + 2 * p
+        lines = [f"Page {p + 1}."] + [
+            " ".join(rng.choice(words) for _ in range(12)) + "."
+            for _ in range(lines_per_page)
+        ]
+        ops = " T* ".join(f"({line}) Tj" for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 800 Td {ops} ET".encode("latin-1")
+        objects[content_id] = (
+            b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream"
+        )
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode()
+        kids.append(f"{page_id} 0 R")
+
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+    if padding_bytes:
+        objects[4 + 2 * pages] = (
+            b"<< /Length " + str(padding_bytes).encode() + b" >>\nstream\n"
+            + rng.randbytes(padding_bytes) + b"\nendstream"
+        )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += f"{obj_id} 0 obj\n".encode() + objects[obj_id] + b"\nendobj\n"
+
+    xref_at = len(out)
+    size = max(objects) + 1
+    out += f"xref\n0 {size}\n0000000000 65535 f \n".encode()
+    for obj_id in range(1, size):
+        out += f"{offsets[obj_id]:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode()
+    return bytes(out)
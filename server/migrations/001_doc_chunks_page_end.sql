@@ -0,0 +1,4 @@
+-- Chunks can straddle a page break: page_number is the first page the chunk
+-- covers, page_end the last. Older rows keep page_end NULL (single page).
+alter table doc_chunks
+    add column if not exists page_end integer;
@@ -0,0 +1,61 @@
+-- Section-level writes for essays.content (header → text).
+--
+-- patch_essay_sections merges only the given sections into content in one
+-- statement under a row lock, so concurrent writers of different sections
+-- never lose each other's updates and the payload is just the new text.
+--
+-- Each section carries a version in section_versions (header → integer,
+-- bumped on every write). A writer that passes p_expected_versions only
+-- succeeds if those sections are still at the versions it read; otherwise
+-- nothing is written and the current versions are returned ("conflict").
+-- essays.version counts all writes to the essay.
+
+alter table essays
+    add column if not exists version integer not null default 0,
+    add column if not exists section_versions jsonb not null default '{}'::jsonb;
+
+create or replace function patch_essay_sections(
+    p_essay_id uuid,
+    p_sections jsonb,
+    p_expected_versions jsonb default null
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    current_versions jsonb;
+    new_versions jsonb := '{}'::jsonb;
+    section_header text;
+    expected_version integer;
+begin
+    select coalesce(section_versions, '{}'::jsonb) into current_versions
+      from essays
+     where id = p_essay_id
+       for update;
+    if not found then
+        return jsonb_build_object('status', 'not_found');
+    end if;
+
+    for section_header, expected_version in
+        select key, value::integer from jsonb_each_text(coalesce(p_expected_versions, '{}'::jsonb))
+    loop
+        if coalesce((current_versions ->> section_header)::integer, 0) <> expected_version then
+            return jsonb_build_object('status', 'conflict', 'versions', current_versions);
+        end if;
+    end loop;
+
+    for section_header in select jsonb_object_keys(p_sections) loop
+        new_versions := new_versions || jsonb_build_object(
+            section_header, coalesce((current_versions ->> section_header)::integer, 0) + 1
+        );
+    end loop;
+
+    update essays
+       set content = coalesce(content, '{}'::jsonb) || p_sections,
+           section_versions = current_versions || new_versions,
+           version = version + 1
+     where id = p_essay_id;
+
+    return jsonb_build_object('status', 'ok', 'versions', new_versions);
+end;
+$$;
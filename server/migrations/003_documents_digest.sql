@@ -0,0 +1,6 @@
+-- Representative summary of the document, built at ingestion from the
+-- chunk embeddings (see app/services/digest_services.py) and used as the
+-- research summary for generate-outline. NULL for documents ingested
+-- before it existed; those fall back to their first chunks.
+alter table documents
+    add column if not exists digest text;
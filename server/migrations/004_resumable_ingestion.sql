@@ -0,0 +1,15 @@
+-- Resumable ingestion (see app/services/checkpoint_services.py).
+-- Each chunk row records its position in the document, and a document has
+-- at most one row per position: storing a batch again after a failed run
+-- upserts on (document_id, chunk_index) instead of duplicating rows.
+-- Rows ingested before this have NULL chunk_index and are unaffected.
+alter table doc_chunks
+    add column if not exists chunk_index integer;
+
+create unique index if not exists doc_chunks_document_id_chunk_index_key
+    on doc_chunks (document_id, chunk_index);
+
+-- Progress of an unfinished ingestion (stored batches, last error);
+-- NULL once the document completes
+alter table documents
+    add column if not exists ingest_checkpoint jsonb;
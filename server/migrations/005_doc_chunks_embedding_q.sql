@@ -0,0 +1,12 @@
+-- Compact chunk embeddings (see app/services/quantization_services.py).
+-- With EMBEDDING_COMPACT_DTYPE set, each row also carries its embedding as
+-- float16 or int8 + scale ("f16:<base64>" / "i8:<base64>"), which the
+-- in-process index (RETRIEVAL_BACKEND=local) loads instead of the pgvector
+-- column: about a quarter of the bytes per chunk for int8.
+alter table doc_chunks
+    add column if not exists embedding_q text;
+
+-- With the local backend and EMBEDDING_STORE_FULL=false only embedding_q is
+-- written; match_doc_chunks skips such rows (their similarity is NULL).
+alter table doc_chunks
+    alter column embedding drop not null;
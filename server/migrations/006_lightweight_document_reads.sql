@@ -0,0 +1,81 @@
+-- Lighter list and detail reads (see app/services/pagination_services.py
+-- and app/services/raw_text_services.py).
+
+-- Chunk count written once at ingestion, so GET /documents/{id} needs no
+-- count(*) over doc_chunks. Existing documents are backfilled here.
+alter table documents
+    add column if not exists chunk_count integer;
+
+update documents d
+   set chunk_count = c.n
+  from (select document_id, count(*) as n from doc_chunks group by document_id) c
+ where c.document_id = d.id
+   and d.chunk_count is null;
+
+-- Keyset pagination of the list endpoints: newest first, id breaking ties
+create index if not exists documents_user_id_created_at_id_idx
+    on documents (user_id, created_at desc, id desc);
+
+create index if not exists essays_user_id_created_at_id_idx
+    on essays (user_id, created_at desc, id desc);
+
+-- raw_text as UTF-8 bytes, set from raw_text by a trigger on every insert
+-- or raw_text update, and stored uncompressed out of line (EXTERNAL) so
+-- that substring() on it detoasts only the TOAST chunks a slice covers,
+-- and octet_length() reads the size from the TOAST pointer. Converting
+-- raw_text on every call would detoast and re-encode the whole text once
+-- per slice, O(n^2) over a stream. Costs one uncompressed copy of the text
+-- per document. (Not a generated column: convert_to() is only STABLE.)
+alter table documents
+    add column if not exists raw_text_utf8 bytea;
+
+alter table documents
+    alter column raw_text_utf8 set storage external;
+
+create or replace function documents_set_raw_text_utf8()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.raw_text_utf8 := convert_to(new.raw_text, 'UTF8');
+    return new;
+end;
+$$;
+
+drop trigger if exists documents_raw_text_utf8 on documents;
+create trigger documents_raw_text_utf8
+    before insert or update of raw_text on documents
+    for each row execute function documents_set_raw_text_utf8();
+
+-- Existing documents (written after SET STORAGE, so stored EXTERNAL)
+update documents
+   set raw_text_utf8 = convert_to(raw_text, 'UTF8')
+ where raw_text is not null
+   and raw_text_utf8 is null;
+
+-- One byte range of a document's raw_text (UTF-8), base64 encoded, with
+-- the text's total size. GET /documents/{id}/raw_text streams the text a
+-- slice at a time through this, so only the requested bytes leave the
+-- database. NULL when the document does not exist or is not the user's.
+create or replace function document_raw_text_slice(
+    p_document_id uuid,
+    p_user_id uuid,
+    p_start integer,
+    p_length integer
+)
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'total', coalesce(octet_length(raw_text_utf8), 0),
+        -- encode() wraps base64 every 76 characters; the newlines are dropped
+        'data', replace(encode(
+            coalesce(substring(raw_text_utf8 from p_start + 1 for greatest(p_length, 0)), ''::bytea),
+            'base64'
+        ), E'\n', '')
+    )
+      from documents
+     where id = p_document_id
+       and user_id = p_user_id
+$$;